@@ -0,0 +1,32 @@
+"""Time one tick of the particle filter for different particle counts.
+The sensor update runs on every tick, as it would while the robot moves."""
+import sys
+import time
+
+from roboutils.localization import ParticleFilter
+from roboutils.utils import kinematics as kine, Transform, Vec2
+from roboutils.worldsimulator import World, Line
+
+world = World([Line([Vec2(-0.7, 0), Vec2(0,0), Vec2(0.0, 0.7), Vec2(0.7, 0.7), Vec2(0.6, -0.7), Vec2(-0.8, -0.9)], 0.10)])
+counts = [int(count) for count in sys.argv[1:]] or [1000, 5000, 10000]
+ticks = 200
+dt = 0.03
+
+for count in counts:
+    particles = ParticleFilter(world, count = count, seed = 1)
+    particles.update_distance = 0.0
+    particles.initialize(Transform(0.0, Vec2(-0.7, 0.0)))
+    true_pose = Transform(0.0, Vec2(-0.7, 0.0))
+    command = kine.Command(0.2, 0.5)
+    durations = []
+    for _ in range(ticks):
+        true_pose = kine.predictPose(true_pose, command, dt)
+        line_sensor = world.isOnLine(true_pose.applyTo(Vec2(0.05, 0)))
+        begin = time.perf_counter()
+        particles.predict(command, dt)
+        particles.correct(line_sensor)
+        particles.estimate()
+        durations.append(time.perf_counter() - begin)
+    durations.sort()
+    print("%6d particles: mean %.2f ms, p99 %.2f ms, max %.2f ms per tick" % (count,
+        sum(durations) / ticks * 1000, durations[int(ticks * 0.99) - 1] * 1000, durations[-1] * 1000))
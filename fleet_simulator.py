@@ -0,0 +1,119 @@
+import sys
+import math
+import random
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtProperty, QTimer
+from PyQt5.QtQml import QQmlApplicationEngine
+from PyQt5.QtWidgets import QApplication
+
+from roboutils.utils import Transform, Vec2
+import roboutils.utils.kinematics as kine
+from roboutils import hal
+from roboutils.hal import simulation
+from roboutils.hal.differential_drive import DrivePipeline
+from roboutils import behavior
+from roboutils.behavior.robot import ValheFollowLine
+from roboutils.fleet import FleetBuffer
+
+from roboutils.worldsimulator import World, Line
+
+class GuiFleet(QObject):
+    """View of the whole fleet for QML.
+
+The simulation thread packs the fleet after every update and publishes the
+packed frame, sample() takes the newest frame on the GUI thread and
+notifies QML once for all the robots."""
+    changed = pyqtSignal()
+    def __init__(self, fleet, parent=None):
+        super().__init__(parent)
+        self.fleet = fleet
+        self.frame = None
+        self._frame = ([], [])
+
+    def publish(self):
+        """Called on the simulation thread"""
+        self.fleet.pack()
+        self.frame = (self.fleet.values.tolist(),
+            self.fleet.packed_trails() if self.fleet.trail_length else [])
+
+    def sample(self):
+        frame = self.frame
+        if frame is not None and frame is not self._frame:
+            self._frame = frame
+            self.changed.emit()
+
+    @pyqtProperty('QVariantList', notify=changed)
+    def robots(self):
+        return self._frame[0]
+
+    @pyqtProperty('QVariantList', notify=changed)
+    def trails(self):
+        return self._frame[1]
+
+@behavior.task
+def SimulateLineSensor(state, world:World):
+    state.line_sensor = world.isOnLine(state.true_pose.applyTo(Vec2(0.05, 0)))
+    return False #Never complete
+
+@behavior.task
+def PublishFleet(gui):
+    gui.publish()
+    return False #Never complete
+
+def packLines(world):
+    """The line segments of the world as a flat list
+    of begin x, begin y, end x, end y and width"""
+    packed = []
+    for line in world.lines:
+        for segment in line.segmentList:
+            packed.extend((segment.beg.x, segment.beg.y, segment.end.x, segment.end.y, segment.width))
+    return packed
+
+def randomPoseOnLine(world):
+    segment = random.choice([segment for line in world.lines for segment in line.segmentList])
+    fraction = random.random()
+    return Transform(random.uniform(-math.pi, math.pi), Vec2(
+        segment.beg.x + (segment.end.x - segment.beg.x) * fraction,
+        segment.beg.y + (segment.end.y - segment.beg.y) * fraction))
+
+robot_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+app = QApplication(sys.argv)
+
+world = World([Line([Vec2(-0.7, 0), Vec2(0,0), Vec2(0.0, 0.7), Vec2(0.7, 0.7), Vec2(0.6, -0.7), Vec2(-0.8, -0.9)], 0.10)])
+
+kinematics = kine.KinematicModel(axel_width = 0.2, left_wheel_r = 0.03, right_wheel_r = 0.03)
+robots = [hal.RobotInterface(kinematics) for _ in range(robot_count)]
+fleet = GuiFleet(FleetBuffer(robots, trail_length = 50, trail_spacing = 0.03))
+
+simulation_tree = behavior.ParallelAll(*[
+    behavior.ParallelAll(
+        DrivePipeline(robot,
+            simulation.SimulateDrive(robot, step = 0.005, substeps = 6,
+                start_pose = randomPoseOnLine(world))),
+        SimulateLineSensor(robot, world),
+        ValheFollowLine(robot))
+    for robot in robots] + [PublishFleet(fleet)])
+
+engine = QQmlApplicationEngine()
+engine.rootContext().setContextProperty("fleet", fleet)
+engine.rootContext().setContextProperty("worldLines", packLines(world))
+engine.load('qml/FleetWindow.qml')
+
+win = engine.rootObjects()[0]
+win.show()
+
+stop = threading.Event()
+simulation_thread = threading.Thread(target = behavior.run_periodic,
+    args = (simulation_tree, 0.03, stop), daemon = True)
+simulation_thread.start()
+
+timer = QTimer()
+timer.timeout.connect(fleet.sample)
+timer.setSingleShot(False)
+timer.start(16)
+
+app.exec_()
+stop.set()
+simulation_thread.join()
@@ -0,0 +1,181 @@
+import QtQuick 2.5
+import QtQuick.Controls 1.1
+
+Item
+{
+    width: 600;
+    height: 600;
+    id: fleetview;
+
+    // x, y, heading and sensor flags of every robot, see roboutils.fleet
+    property var robots: [];
+    // number of points followed by the points of every trail
+    property var trails: [];
+    // begin x, begin y, end x, end y and width of every line segment
+    property var lines: [];
+    property real robotRadius: 0.05;
+    property bool showTrails: true;
+
+    property real mapXMin: -1.5;
+    property real mapXMax: 1.5;
+    property real mapYMin: -1.5;
+    property real mapYMax: 1.5;
+
+    property bool showFrameTime: true;
+    property real paintTime: 0;
+    property real frameInterval: 0;
+    property real lastFrame: 0;
+
+    readonly property int stride: 4;
+    readonly property int lineSensorFlag: 4;
+    readonly property int bumperFlags: 3;
+
+    function applyMapTransform(ctx)
+    {
+        var x_scale = width/(mapXMax - mapXMin)
+        var y_scale = -height/(mapYMax - mapYMin)
+        ctx.scale(x_scale, y_scale);
+        ctx.translate(-mapXMin, mapYMin);
+    }
+
+    Canvas
+    {
+        id: mapLayer;
+        anchors.fill: parent;
+        renderTarget: Canvas.FramebufferObject;
+
+        Connections
+        {
+            target: fleetview;
+            onLinesChanged: mapLayer.requestPaint();
+            onMapXMinChanged: mapLayer.requestPaint();
+            onMapXMaxChanged: mapLayer.requestPaint();
+            onMapYMinChanged: mapLayer.requestPaint();
+            onMapYMaxChanged: mapLayer.requestPaint();
+        }
+
+        onPaint:
+        {
+            var ctx = getContext("2d");
+            ctx.reset();
+            ctx.save();
+            applyMapTransform(ctx);
+            ctx.strokeStyle = "pink";
+            for(var i=0; i+4<lines.length; i+=5)
+            {
+                ctx.lineWidth = lines[i+4];
+                ctx.beginPath();
+                ctx.moveTo(lines[i], lines[i+1]);
+                ctx.lineTo(lines[i+2], lines[i+3]);
+                ctx.stroke();
+            }
+            ctx.restore();
+        }
+    }
+
+    // All the robots of a kind go into one path that is filled and stroked
+    // once, so the cost per robot is only that of adding its shape
+    Canvas
+    {
+        id: fleetLayer;
+        anchors.fill: parent;
+
+        Connections
+        {
+            target: fleetview;
+            onRobotsChanged: fleetLayer.requestPaint();
+        }
+
+        function drawTrails(ctx)
+        {
+            ctx.beginPath();
+            var i = 0;
+            while (i < trails.length)
+            {
+                var count = trails[i];
+                i++;
+                for (var j=0; j<count; j++, i+=2)
+                {
+                    if (j == 0)
+                        ctx.moveTo(trails[i], trails[i+1]);
+                    else
+                        ctx.lineTo(trails[i], trails[i+1]);
+                }
+            }
+            ctx.lineWidth = 1 / width;
+            ctx.strokeStyle = "light gray";
+            ctx.stroke();
+        }
+
+        function addBodies(ctx, flag, set)
+        {
+            ctx.beginPath();
+            for (var i=0; i+stride-1<robots.length; i+=stride)
+            {
+                if (((robots[i+3] & flag) != 0) != set)
+                    continue;
+                ctx.moveTo(robots[i] + robotRadius, robots[i+1]);
+                ctx.arc(robots[i], robots[i+1], robotRadius, 0, Math.PI * 2.0, false);
+            }
+        }
+
+        function drawRobots(ctx)
+        {
+            ctx.lineWidth = 1 / width;
+            ctx.strokeStyle = "blue";
+            addBodies(ctx, lineSensorFlag, false);
+            ctx.fillStyle = "light blue";
+            ctx.fill();
+            ctx.stroke();
+            addBodies(ctx, lineSensorFlag, true);
+            ctx.fillStyle = "pink";
+            ctx.fill();
+            ctx.stroke();
+
+            ctx.beginPath();
+            for (var i=0; i+stride-1<robots.length; i+=stride)
+            {
+                ctx.moveTo(robots[i], robots[i+1]);
+                ctx.lineTo(robots[i] + Math.cos(robots[i+2]) * robotRadius,
+                    robots[i+1] + Math.sin(robots[i+2]) * robotRadius);
+            }
+            ctx.lineWidth = 3 / width;
+            ctx.stroke();
+
+            addBodies(ctx, bumperFlags, true);
+            ctx.strokeStyle = "red";
+            ctx.stroke();
+        }
+
+        onPaint:
+        {
+            var begin = Date.now();
+            var ctx = getContext("2d");
+            ctx.reset();
+            ctx.save();
+            applyMapTransform(ctx);
+            if (showTrails)
+                drawTrails(ctx);
+            drawRobots(ctx);
+            ctx.restore();
+            if (lastFrame > 0)
+            {
+                frameInterval += (begin - lastFrame - frameInterval) / 8;
+            }
+            lastFrame = begin;
+            paintTime += (Date.now() - begin - paintTime) / 8;
+        }
+    }
+
+    Text
+    {
+        visible: showFrameTime;
+        anchors.top: parent.top;
+        anchors.right: parent.right;
+        anchors.margins: 4;
+        color: "gray";
+        font.pixelSize: 11;
+        text: (robots.length / stride) + " robots, paint " + paintTime.toFixed(1) +
+            " ms, frame " + frameInterval.toFixed(1) + " ms";
+    }
+}
@@ -0,0 +1,17 @@
+import QtQuick 2.5
+import QtQuick.Controls 1.1
+
+ApplicationWindow {
+    id: window
+    visible: true
+    width: 600
+    height: 600
+
+	FleetView
+	{
+		anchors.fill: parent;
+		robots: fleet.robots;
+		trails: fleet.trails;
+		lines: worldLines;
+	}
+}
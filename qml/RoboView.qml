@@ -1,11 +1,11 @@
 import QtQuick 2.5
 import QtQuick.Controls 1.1
 
-Canvas
+Item
 {
     width: 400;
     height: 400;
-    id: robocanvas;
+    id: roboview;
 
     property real robotX: 0;
     property real robotY: 0;
@@ -21,110 +21,167 @@ Canvas
 
     property var lines: [];
 
-    onRobotHeadingChanged:
-    {
-        robocanvas.requestPaint();
-    }
+    property bool showFrameTime: true;
+    property real paintTime: 0;
+    property real frameInterval: 0;
+    property real lastFrame: 0;
 
-    onRobotXChanged:
+    function applyMapTransform(ctx)
     {
-        robocanvas.requestPaint();
+        var x_scale = width/(mapXMax - mapXMin)
+        var y_scale = -height/(mapYMax - mapYMin)
+        ctx.scale(x_scale, y_scale);
+        ctx.translate(-mapXMin, mapYMin);
     }
 
-    onRobotYChanged:
+    // The world geometry never changes while the robot moves, so it is
+    // painted once into a layer of its own and only repainted when the map
+    // or the view transform changes
+    Canvas
     {
-        robocanvas.requestPaint();
-    }
+        id: mapLayer;
+        anchors.fill: parent;
+        renderTarget: Canvas.FramebufferObject;
 
-    function drawBackground(ctx)
-    {
-        ctx.save()
-
-        ctx.lineWidth = 2 / width;
-        ctx.strokeStyle = "gray";
-        ctx.beginPath();
-        ctx.moveTo(0, -1);
-        ctx.lineTo(0, 1);
-        ctx.stroke();
-        ctx.moveTo(-1, 0);
-        ctx.lineTo(1, 0);
-        ctx.stroke();
-        ctx.restore();
-    }
+        Connections
+        {
+            target: roboview;
+            onLinesChanged: mapLayer.requestPaint();
+            onMapXMinChanged: mapLayer.requestPaint();
+            onMapXMaxChanged: mapLayer.requestPaint();
+            onMapYMinChanged: mapLayer.requestPaint();
+            onMapYMaxChanged: mapLayer.requestPaint();
+        }
 
-    function drawLines(ctx)
-    {
-        ctx.save();
-        ctx.strokeStyle = "pink";
-        for(var i=0; i<lines.length; i++)
+        function drawBackground(ctx)
         {
-            ctx.lineWidth = lines[i].width;
+            ctx.save()
+
+            ctx.lineWidth = 2 / width;
+            ctx.strokeStyle = "gray";
             ctx.beginPath();
-            ctx.moveTo(lines[i].beg.x, lines[i].beg.y);
-            ctx.lineTo(lines[i].end.x, lines[i].end.y);
+            ctx.moveTo(0, -1);
+            ctx.lineTo(0, 1);
+            ctx.stroke();
+            ctx.moveTo(-1, 0);
+            ctx.lineTo(1, 0);
             ctx.stroke();
-            //todo: piirrä viiva s.e. kulmiin ei jää koloja
+            ctx.restore();
+        }
+
+        function drawLines(ctx)
+        {
+            ctx.save();
+            ctx.strokeStyle = "pink";
+            for(var i=0; i<lines.length; i++)
+            {
+                ctx.lineWidth = lines[i].width;
+                ctx.beginPath();
+                ctx.moveTo(lines[i].beg.x, lines[i].beg.y);
+                ctx.lineTo(lines[i].end.x, lines[i].end.y);
+                ctx.stroke();
+                //todo: piirrä viiva s.e. kulmiin ei jää koloja
+            }
+            ctx.restore();
+        }
+
+        onPaint:
+        {
+            var ctx = getContext("2d");
+            ctx.reset();
+            ctx.save();
+            applyMapTransform(ctx);
+            drawBackground(ctx);
+            drawLines(ctx);
+            ctx.restore();
         }
-        ctx.restore();
     }
 
-    function drawRobot(ctx, x, y, h)
+    Canvas
     {
-        ctx.save();
-        ctx.translate(robotX, robotY);
-        ctx.rotate(robotHeading);
-        ctx.scale(robotRadius, robotRadius);
+        id: robotLayer;
+        anchors.fill: parent;
+
+        Connections
+        {
+            target: roboview;
+            onRobotXChanged: robotLayer.requestPaint();
+            onRobotYChanged: robotLayer.requestPaint();
+            onRobotHeadingChanged: robotLayer.requestPaint();
+            onSeesLineChanged: robotLayer.requestPaint();
+        }
 
-        if (seesLine)
+        function drawRobot(ctx, x, y, h)
         {
-            ctx.fillStyle = "pink";
+            ctx.save();
+            ctx.translate(x, y);
+            ctx.rotate(h);
+            ctx.scale(robotRadius, robotRadius);
+
+            if (seesLine)
+            {
+                ctx.fillStyle = "pink";
+            }
+            else
+            {
+                ctx.fillStyle = "light blue";
+            }
+                
+            ctx.lineWidth = 2 / width / robotRadius;
+            ctx.strokeStyle = "blue";
+
+            ctx.beginPath();
+            ctx.rect(-0.75, -1.25, 1.5, 0.5);
+            ctx.fill();
+            ctx.stroke()
+
+            ctx.beginPath();
+            ctx.rect(-0.75, 0.75, 1.5, 0.5);
+            ctx.fill();
+            ctx.stroke()
+
+            ctx.beginPath();
+            ctx.arc(0, 0, 1.0, 0, Math.PI * 2.0, false);
+            ctx.fill();
+            ctx.stroke()
+
+            ctx.beginPath();
+            ctx.moveTo( 0.75, 0 );
+            ctx.lineTo( 0.6, 0.15);
+            ctx.lineTo( 0.6, -0.15);
+            ctx.closePath();
+            ctx.fillStyle = "blue";
+            ctx.fill();
+
+            ctx.restore();        
         }
-        else
+
+        onPaint:
         {
-            ctx.fillStyle = "light blue";
+            var begin = Date.now();
+            var ctx = getContext("2d");
+            ctx.reset();
+            ctx.save();
+            applyMapTransform(ctx);
+            drawRobot(ctx, robotX, robotY, robotHeading);
+            ctx.restore();
+            if (lastFrame > 0)
+            {
+                frameInterval += (begin - lastFrame - frameInterval) / 8;
+            }
+            lastFrame = begin;
+            paintTime += (Date.now() - begin - paintTime) / 8;
         }
-            
-        ctx.lineWidth = 2 / width / robotRadius;
-        ctx.strokeStyle = "blue";
-
-        ctx.beginPath();
-        ctx.rect(-0.75, -1.25, 1.5, 0.5);
-        ctx.fill();
-        ctx.stroke()
-
-        ctx.beginPath();
-        ctx.rect(-0.75, 0.75, 1.5, 0.5);
-        ctx.fill();
-        ctx.stroke()
-
-        ctx.beginPath();
-        ctx.arc(0, 0, 1.0, 0, Math.PI * 2.0, false);
-        ctx.fill();
-        ctx.stroke()
-
-        ctx.beginPath();
-        ctx.moveTo( 0.75, 0 );
-        ctx.lineTo( 0.6, 0.15);
-        ctx.lineTo( 0.6, -0.15);
-        ctx.closePath();
-        ctx.fillStyle = "blue";
-        ctx.fill();
-
-        ctx.restore();        
     }
 
-    onPaint:
+    Text
     {
-        var ctx = getContext("2d");
-        ctx.reset();
-        ctx.save();
-        var x_scale = width/(mapXMax - mapXMin)
-        var y_scale = -height/(mapYMax - mapYMin)
-        ctx.scale(x_scale, y_scale);
-        ctx.translate(-mapXMin, mapYMin);
-        drawBackground(ctx);
-        drawLines(ctx);
-        drawRobot(ctx, robotX, robotY, robotHeading);
-        ctx.restore();
+        visible: showFrameTime;
+        anchors.top: parent.top;
+        anchors.right: parent.right;
+        anchors.margins: 4;
+        color: "gray";
+        font.pixelSize: 11;
+        text: "paint " + paintTime.toFixed(1) + " ms, frame " + frameInterval.toFixed(1) + " ms";
     }
-}
\ No newline at end of file
+}
@@ -10,10 +10,10 @@ ChartView
     height: 200
     antialiasing: true
 
+    // GuiSignals holding the recorded history of the signals
+    property var history: null;
     property string name1: "";
     property string name2: "";
-    property real value1: 0;
-    property real value2: 0;
     property real timeWindow: 10.0;
     property real refreshInterval: 0.5;
 
@@ -49,23 +49,21 @@ ChartView
     Timer
     {
         interval: refreshInterval * 1000.0
-        running: true
+        running: history !== null
         repeat: true
-        property real startTime: new Date().getTime();
 
+        // The series are refilled with at most two points per pixel of the
+        // plot area, never more than the time window holds
         onTriggered: 
         {
-            var time = new Date().getTime();
-            var deltaTime = (time - startTime)/1000.0;
-            myseries.append(deltaTime, value1);
-            myseries2.append(deltaTime, value2);
+            var pixels = Math.round(plotArea.width);
+            var range1 = history.fill(myseries, name1, timeWindow, pixels);
+            var range2 = history.fill(myseries2, name2, timeWindow, pixels);
 
-            axisX.max=deltaTime;
-            axisX.min=deltaTime - timeWindow;
-            axisY.max=Math.max(value1, axisY.max);
-            axisY.min=Math.min(value1, axisY.min);
-            axisY.max=Math.max(value2, axisY.max);
-            axisY.min=Math.min(value2, axisY.min);
+            axisX.max = Math.max(range1[1], range2[1]);
+            axisX.min = axisX.max - timeWindow;
+            axisY.min = Math.min(range1[2], range2[2]);
+            axisY.max = Math.max(range1[3], range2[3], axisY.min + 0.01);
         }
     }
-}
\ No newline at end of file
+}
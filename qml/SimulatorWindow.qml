@@ -6,7 +6,7 @@ ApplicationWindow {
     id: window
     visible: true
     width: 600
-    height: 600
+    height: 650
 
 	Row
 	{
@@ -39,6 +39,14 @@ ApplicationWindow {
 				lines: world.lines;
 				seesLine: robot.line_sensor;
 			}
+
+			SignalPlot
+			{
+				width: 400;
+				history: signalHistory;
+				name1: "velocity_command";
+				name2: "turn_command";
+			}
 		}
 	}
 }
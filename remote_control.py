@@ -7,6 +7,7 @@ from PyQt5.QtQml import QQmlApplicationEngine
 from PyQt5.QtWidgets import QApplication
 from collections import defaultdict
 from roboutils.remote import RemoteControlSocket
+from roboutils.reliable import ReliableChannel
 
 manual = False
 release = False
@@ -16,6 +17,9 @@ ip = 'localhost'
 
 # Create a TCP/IP socket
 sock = RemoteControlSocket(port = 8004, remote_address = (ip, 8002))
+# Mode changes must not be lost, the robot acknowledges them. The mode is
+# also repeated in every command, so a robot that restarts picks it up again
+sock.reliable = ReliableChannel()
 
 class Backend(QObject):
     def __init__(self, parent=None):
@@ -33,6 +37,7 @@ class Backend(QObject):
     def releaseManual(self, challenge_id):
         print("Go to challenge %d"%challenge_id)
         self.robot_state = challenge_id
+        sock.reliable.post({"state": challenge_id})
 
     def get_command(self):
         forward = self.keys['w'] and not self.keys['s']
@@ -58,6 +63,8 @@ class Backend(QObject):
         command = self.get_command()
         #print("Sending: %s"%str(command))
         sock.send(command)
+        # Take in the acknowledgements
+        sock.receive_all()
 
 app = QApplication(sys.argv)
 backend = Backend()
@@ -1,6 +1,47 @@
+import asyncio
+from time import monotonic, sleep
 from .behavior import *
+# The package attribute 'time' is always the submodule of timed behaviors,
+# the runners below take what they need from the standard time module
+from . import time
 
 def run(tree):
     tree.start()
     while tree.update() == State.Running:
-        pass
\ No newline at end of file
+        pass
+
+async def run_async(tree, period = None, wakeup = None):
+    """Run the tree in the asyncio event loop.
+    The tree is updated every 'period' seconds and whenever the asyncio.Event
+    'wakeup' is set, e.g. RemoteControlProtocol.received. Without either,
+    it yields to the loop between updates."""
+    tree.start()
+    while tree.update() == State.Running:
+        if wakeup is None:
+            await asyncio.sleep(period or 0)
+            continue
+        try:
+            await asyncio.wait_for(wakeup.wait(), period)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+
+def run_periodic(tree, period, stop = None):
+    """Run the tree at a fixed rate of one update every 'period' seconds,
+    e.g. on a thread of its own. Ticks that are missed are skipped rather
+    than run back to back. Returns when the tree completes or when the
+    threading.Event 'stop' is set."""
+    tree.start()
+    next_time = monotonic()
+    while stop is None or not stop.is_set():
+        if tree.update() != State.Running:
+            return
+        next_time += period
+        delay = next_time - monotonic()
+        if delay < 0:
+            next_time -= delay // period * period
+            continue
+        if stop is None:
+            sleep(delay)
+        elif stop.wait(delay):
+            return
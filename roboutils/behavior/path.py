@@ -0,0 +1,147 @@
+import math
+from typing import List
+
+from . import behavior
+from .behavior import Behavior
+from ..utils import kinematics as kine
+from ..utils.vec2 import Vec2
+
+class PathIndex:
+    """Polyline path with the arc length at each waypoint.
+A PathCursor keeps the progress of a follower along the path, so the
+nearest point and the lookahead point are found by moving forward from
+where they were on the previous tick, not by scanning the whole path."""
+    __slots__ = ("xs", "ys", "arc_lengths")
+    def __init__(self, points:List[Vec2]):
+        if len(points) < 2:
+            raise ValueError("A path needs at least two points")
+        self.xs = [p.x for p in points]
+        self.ys = [p.y for p in points]
+        self.arc_lengths = [0.0]
+        for i in range(1, len(points)):
+            self.arc_lengths.append(self.arc_lengths[-1] +
+                math.hypot(self.xs[i] - self.xs[i - 1], self.ys[i] - self.ys[i - 1]))
+
+    def __len__(self):
+        return len(self.xs)
+
+    @property
+    def length(self) -> float:
+        return self.arc_lengths[-1]
+
+    def project(self, segment:int, x:float, y:float):
+        """Nearest point on the segment to (x, y),
+        returns (arc length, squared distance)"""
+        x0 = self.xs[segment]
+        y0 = self.ys[segment]
+        dx = self.xs[segment + 1] - x0
+        dy = self.ys[segment + 1] - y0
+        length_sq = dx * dx + dy * dy
+        t = 0.0
+        if length_sq > 0:
+            t = min(max(((x - x0) * dx + (y - y0) * dy) / length_sq, 0.0), 1.0)
+        px = x0 + t * dx - x
+        py = y0 + t * dy - y
+        return self.arc_lengths[segment] + t * math.sqrt(length_sq), px * px + py * py
+
+    def pointAt(self, segment:int, arc_length:float) -> Vec2:
+        """Point at the arc length, which must be on the segment"""
+        segment_length = self.arc_lengths[segment + 1] - self.arc_lengths[segment]
+        t = 0.0
+        if segment_length > 0:
+            t = (arc_length - self.arc_lengths[segment]) / segment_length
+        return Vec2(
+            self.xs[segment] + t * (self.xs[segment + 1] - self.xs[segment]),
+            self.ys[segment] + t * (self.ys[segment + 1] - self.ys[segment]))
+
+class PathCursor:
+    """Progress along a PathIndex.
+The nearest segment only moves forward and is searched at most
+'search_window' segments ahead, so each update is O(1) amortized over the
+path. The segments after the current one are only considered up to
+'search_distance' meters of arc length ahead of the progress, so a path
+that passes near itself is not short cut."""
+    __slots__ = ("path", "search_window", "search_distance",
+        "segment", "progress", "lookahead_segment")
+    def __init__(self, path:PathIndex, search_window:int = 16, search_distance:float = 0.25):
+        self.path = path
+        self.search_window = search_window
+        self.search_distance = search_distance
+        self.reset()
+
+    def reset(self):
+        self.segment = 0
+        self.progress = 0.0
+        self.lookahead_segment = 0
+
+    def update(self, x:float, y:float) -> float:
+        """Advance to the nearest point to (x, y), returns its arc length"""
+        path = self.path
+        last_segment = len(path) - 2
+        max_progress = self.progress + self.search_distance
+        best_segment = self.segment
+        best_progress, best_distance = path.project(best_segment, x, y)
+        end = min(self.segment + self.search_window, last_segment)
+        for segment in range(self.segment + 1, end + 1):
+            if path.arc_lengths[segment] > max_progress:
+                break
+            progress, distance = self.projectWithin(segment, x, y, max_progress)
+            if distance < best_distance:
+                best_segment, best_progress, best_distance = segment, progress, distance
+        self.segment = best_segment
+        self.progress = max(self.progress, best_progress)
+        return self.progress
+
+    def projectWithin(self, segment:int, x:float, y:float, max_progress:float):
+        """Project on the segment, cut at the arc length 'max_progress'"""
+        progress, distance = self.path.project(segment, x, y)
+        if progress > max_progress:
+            point = self.path.pointAt(segment, max_progress)
+            progress = max_progress
+            distance = (point.x - x) ** 2 + (point.y - y) ** 2
+        return progress, distance
+
+    def lookahead(self, distance:float) -> Vec2:
+        """Point 'distance' further along the path than the current progress,
+        or the end of the path"""
+        path = self.path
+        arc_lengths = path.arc_lengths
+        target = self.progress + distance
+        if target >= path.length:
+            return Vec2(path.xs[-1], path.ys[-1])
+        segment = max(self.lookahead_segment, self.segment)
+        while arc_lengths[segment + 1] < target:
+            segment += 1
+        self.lookahead_segment = segment
+        return path.pointAt(segment, target)
+
+class FollowPath(Behavior):
+    """Pure pursuit along a polyline path of Vec2 points.
+Every tick the robot steers on an arc through the point 'lookahead' meters
+further along the path than the nearest point to the robot. Succeeds and
+stops when the robot is within 'accuracy' of the end of the path.
+The pose is read from 'pose' of the robot, e.g. the odometry or
+'localized_pose' with pose_field."""
+    __slots__ = ("robot", "cursor", "speed", "lookahead", "accuracy", "pose_field")
+    def __init__(self, robot, points:List[Vec2], speed:float = 0.14,
+            lookahead:float = 0.1, accuracy:float = 0.02, pose_field:str = "pose"):
+        path = points if isinstance(points, PathIndex) else PathIndex(points)
+        self.robot = robot
+        self.cursor = PathCursor(path)
+        self.speed = speed
+        self.lookahead = lookahead
+        self.accuracy = accuracy
+        self.pose_field = pose_field
+    def start(self):
+        self.cursor.reset()
+    def update(self):
+        pose = getattr(self.robot, self.pose_field)
+        path = self.cursor.path
+        self.cursor.update(pose.x, pose.y)
+        to_end = math.hypot(path.xs[-1] - pose.x, path.ys[-1] - pose.y)
+        if to_end < self.accuracy and path.length - self.cursor.progress < self.lookahead:
+            self.robot.command = kine.Command(0, 0)
+            return behavior.State.Success
+        target = self.cursor.lookahead(self.lookahead)
+        self.robot.command = kine.Command.arc_to(pose, target, self.speed)
+        return behavior.State.Running
@@ -0,0 +1,66 @@
+import pytest
+
+from roboutils import hal
+from roboutils.behavior import State
+from roboutils.behavior.path import PathIndex, PathCursor, FollowPath
+from roboutils.utils import kinematics as kine, Vec2
+
+
+def test_cursor_only_moves_forward():
+    # The path comes back next to its start
+    path = PathIndex([Vec2(0, 0), Vec2(1, 0), Vec2(1, 0.1), Vec2(0, 0.1)])
+    cursor = PathCursor(path)
+    assert cursor.update(0.5, 0.06) == pytest.approx(0.5)
+    target = cursor.lookahead(0.2)
+    assert (target.x, target.y) == pytest.approx((0.7, 0.0))
+    assert cursor.update(0.9, 0.0) == pytest.approx(0.9)
+    # Next to the way back, which is further along than search_distance
+    assert cursor.update(0.5, 0.1) == pytest.approx(0.9)
+    assert cursor.segment == 0
+    assert cursor.lookahead(10.0) == Vec2(0, 0.1)
+
+def test_cursor_moves_to_next_segment_by_search_distance():
+    path = PathIndex([Vec2(0, 0), Vec2(1, 0), Vec2(2, 0)])
+    cursor = PathCursor(path, search_distance = 0.2)
+    assert cursor.update(1.5, 0.0) == pytest.approx(1.0)
+    assert cursor.update(1.5, 0.0) == pytest.approx(1.2)
+    assert cursor.segment == 1
+    assert cursor.update(1.5, 0.0) == pytest.approx(1.5)
+
+def test_arc_to_the_pose_itself_is_straight():
+    pose = kine.Transform(0.3, Vec2(1.0, 2.0))
+    assert kine.Command.arc_to(pose, Vec2(1.0, 2.0), 0.2) == kine.Command(0.2, 0.0)
+
+class CountingPath(PathIndex):
+    __slots__ = ("projections",)
+    def project(self, segment, x, y):
+        self.projections += 1
+        return super().project(segment, x, y)
+
+def test_update_cost_does_not_depend_on_path_length():
+    path = CountingPath([Vec2(i * 0.001, 0.0) for i in range(50000)])
+    path.projections = 0
+    cursor = PathCursor(path, search_window = 4)
+    updates = 0
+    for i in range(0, 50000, 3):
+        cursor.update(i * 0.001, 0.01)
+        cursor.lookahead(0.1)
+        updates += 1
+    assert cursor.segment >= 49990
+    assert path.projections <= updates * 5
+
+def test_follows_path_to_the_end():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    points = [Vec2(0, 0), Vec2(0.5, 0), Vec2(0.5, 0.5)]
+    follow = FollowPath(robot, points, speed = 0.2, lookahead = 0.1)
+    follow.start()
+    state = State.Running
+    for _ in range(1000):
+        state = follow.update()
+        if state != State.Running:
+            break
+        robot.pose = kine.predictPose(robot.pose, robot.command, 0.02)
+    assert state == State.Success
+    assert robot.pose.x == pytest.approx(0.5, abs = 0.03)
+    assert robot.pose.y == pytest.approx(0.5, abs = 0.03)
+    assert robot.command == kine.Command(0, 0)
@@ -0,0 +1,134 @@
+"""Record/replay regression harness for behavior trees
+
+RecordTicks wraps the behavior of a robot and logs, for every tick, the
+time, the sensor fields of the RobotInterface before the update and the
+command fields after it. replay() feeds the logged sensors to a new tree
+tick by tick on a VirtualClock, as fast as the tree runs, and reports
+every tick where the commands differ from the logged ones.
+
+    log = TickLog()
+    tree = ParallelAll(UDPReceive(robot, sock), RecordTicks(robot, log, behavior), ...)
+    ...
+    log.save("run.ticks")
+    divergences = replay(TickLog.load("run.ticks"), robot, makeBehavior(robot))
+"""
+import json
+from array import array
+from collections import namedtuple
+
+from . import time as behavior_time
+from .behavior import Behavior
+
+INPUT_FIELDS = (
+    "travelled_distance",
+    "heading_rad",
+    "has_left_bumper",
+    "has_right_bumper",
+    "left_bumper_hit",
+    "right_bumper_hit",
+    "line_sensor")
+
+OUTPUT_FIELDS = ("velocity_command", "turn_command")
+
+MAGIC = b"RBTICK\x00\x01"
+
+Divergence = namedtuple("Divergence", ("tick", "time", "field", "expected", "actual"))
+
+class VirtualClock:
+    """Clock that only moves when it is set"""
+    __slots__ = ("now",)
+    def __init__(self, now = 0.0):
+        self.now = now
+    def __call__(self):
+        return self.now
+
+class TickLog:
+    """Ticks as rows of time, the inputs and the outputs, all stored as
+doubles in one flat array"""
+    def __init__(self, inputs = INPUT_FIELDS, outputs = OUTPUT_FIELDS):
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.row_size = 1 + len(self.inputs) + len(self.outputs)
+        self.values = array("d")
+
+    def __len__(self):
+        return len(self.values) // self.row_size
+
+    def row(self, tick):
+        begin = tick * self.row_size
+        return self.values[begin:begin + self.row_size]
+
+    def record_inputs(self, now, state):
+        self.values.append(now)
+        for name in self.inputs:
+            self.values.append(float(getattr(state, name)))
+
+    def record_outputs(self, state):
+        for name in self.outputs:
+            self.values.append(float(getattr(state, name)))
+
+    def save(self, path):
+        header = json.dumps({"inputs": self.inputs, "outputs": self.outputs}).encode()
+        with open(path, "wb") as file:
+            file.write(MAGIC)
+            file.write(len(header).to_bytes(4, "little"))
+            file.write(header)
+            self.values.tofile(file)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is not a tick log" % path)
+            header = json.loads(file.read(int.from_bytes(file.read(4), "little")).decode())
+            log = TickLog(header["inputs"], header["outputs"])
+            log.values.frombytes(file.read())
+        return log
+
+class RecordTicks(Behavior):
+    """Update the child and log the inputs it read and the outputs it wrote"""
+    __slots__ = ("robot", "log", "child", "clock")
+    def __init__(self, robot, log, child, clock = None):
+        self.robot = robot
+        self.log = log
+        self.child = child
+        self.clock = clock
+    def start(self):
+        self.child.start()
+    def update(self):
+        self.log.record_inputs((self.clock or behavior_time.now)(), self.robot)
+        state = self.child.update()
+        self.log.record_outputs(self.robot)
+        return state
+
+def replay(log, robot, tree, tolerance = 1e-9, max_divergences = 100):
+    """Run the tree on the logged inputs and compare its outputs
+    to the logged ones, returns the list of Divergences.
+    The timed behaviors of the tree run on the logged times."""
+    clock = VirtualClock(log.values[0] if len(log) else 0.0)
+    inputs = log.inputs
+    outputs = log.outputs
+    first_output = 1 + len(inputs)
+    divergences = []
+    with behavior_time.useClock(clock):
+        tree.start()
+        for tick in range(len(log)):
+            row = log.row(tick)
+            clock.now = row[0]
+            for i, name in enumerate(inputs):
+                setattr(robot, name, _restore(getattr(robot, name), row[1 + i]))
+            tree.update()
+            for i, name in enumerate(outputs):
+                expected = row[first_output + i]
+                actual = float(getattr(robot, name))
+                if abs(actual - expected) > tolerance:
+                    divergences.append(Divergence(tick, row[0], name, expected, actual))
+                    if len(divergences) >= max_divergences:
+                        return divergences
+    return divergences
+
+def _restore(current, value):
+    # Booleans are logged as 0.0 and 1.0
+    if isinstance(current, bool):
+        return value != 0.0
+    return value
@@ -0,0 +1,47 @@
+from roboutils import hal
+from roboutils.behavior import Sequence, Selector, ParallelAny
+from roboutils.behavior.decorator import Repeat
+from roboutils.behavior.replay import TickLog, RecordTicks, VirtualClock, replay
+from roboutils.behavior.robot import SeesLine, DriveWithVelocity, DriveWithVelocityAndRotation
+from roboutils.behavior.time import Delay, useClock
+from roboutils.utils import kinematics as kine
+
+
+def makeBehavior(robot, delay = 0.3):
+    return Repeat(Selector(
+        Sequence(SeesLine(robot),
+            ParallelAny(DriveWithVelocityAndRotation(robot, 0.1, 1.0), Delay(delay))),
+        DriveWithVelocity(robot, 0.2)))
+
+def record(ticks):
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    log = TickLog()
+    clock = VirtualClock(100.0)
+    with useClock(clock):
+        tree = RecordTicks(robot, log, makeBehavior(robot))
+        tree.start()
+        for tick in range(ticks):
+            clock.now = 100.0 + tick * 0.03
+            robot.line_sensor = tick % 40 == 10
+            tree.update()
+    return log
+
+def test_same_tree_replays_without_divergence(tmp_path):
+    log = record(200)
+    assert len(log) == 200
+    log.save(str(tmp_path / "run.ticks"))
+    loaded = TickLog.load(str(tmp_path / "run.ticks"))
+    assert loaded.values == log.values
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    assert replay(loaded, robot, makeBehavior(robot)) == []
+
+def test_changed_tree_diverges_at_the_changed_decision():
+    log = record(200)
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    divergences = replay(log, robot, makeBehavior(robot, delay = 0.15))
+    assert divergences
+    first = divergences[0]
+    at_first = {d.field: (d.expected, d.actual) for d in divergences if d.tick == first.tick}
+    assert at_first == {"velocity_command": (0.1, 0.2), "turn_command": (1.0, 0.0)}
+    # The delay starts at tick 10 and the logged one is 0.3 s
+    assert 10 + 0.15 / 0.03 <= first.tick <= 10 + 0.3 / 0.03
@@ -4,7 +4,7 @@ from . import decorator
 from ..utils import kinematics as kine
 from ..utils.math_utils import deg2rad, rad2deg, sign, normalizeAngle
 import math
-import time
+from . import time
 from ..hal import RobotInterface
 from .terminator import DoNothing
 from typing import Callable
@@ -105,10 +105,10 @@ def ReverseCurrentCommand(robot):
 def PavelFollowLine(robot, on_the_line, curvature = 1.9, speed = 0.033, min_duration = 1.5, max_dir_change = deg2rad(15)):
         previous_measurement = on_the_line()
         line_dir = robot.heading_rad
-        start_time = time.time()
+        start_time = time.now()
         yield 
         while abs(line_dir - robot.heading_rad) < max_dir_change \
-            or time.time() - start_time < min_duration:
+            or time.now() - start_time < min_duration:
             on_the_line_now = on_the_line()
             if on_the_line_now:
                 robot.command = kine.Command.arc(speed, curvature)
@@ -0,0 +1,25 @@
+import threading
+
+from roboutils.behavior import run_periodic, State
+
+
+class CountTicks:
+    def __init__(self, ticks):
+        self.ticks = ticks
+    def start(self):
+        self.count = 0
+    def update(self):
+        self.count += 1
+        return State.Running if self.count < self.ticks else State.Success
+
+def test_runs_until_tree_completes():
+    tree = CountTicks(3)
+    run_periodic(tree, 0.001)
+    assert tree.count == 3
+
+def test_stops_when_event_is_set():
+    tree = CountTicks(1000000)
+    stop = threading.Event()
+    stop.set()
+    run_periodic(tree, 0.001, stop)
+    assert tree.count == 0
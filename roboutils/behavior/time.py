@@ -1,15 +1,34 @@
 import time
+from contextlib import contextmanager
 from .behavior import State, Behavior
 
+# The clock of the timed behaviors, replaced with a virtual one
+# to run a tree deterministically, see useClock
+clock = time.time
+
+def now():
+    return clock()
+
+@contextmanager
+def useClock(new_clock):
+    """Run the timed behaviors on 'new_clock' within the with block"""
+    global clock
+    old_clock = clock
+    clock = new_clock
+    try:
+        yield new_clock
+    finally:
+        clock = old_clock
+
 class Delay(Behavior):
     """Delay for 'duration' seconds then return success"""
     __slots__ = ("duration", "start_time", "completed")
     def __init__(self, duration):
         self.duration = duration
     def start(self):
-        self.start_time = time.time()
+        self.start_time = now()
     def update(self):
-        if (time.time() - self.start_time) >= self.duration:
+        if (now() - self.start_time) >= self.duration:
             return State.Success
         return State.Running
 
@@ -21,10 +40,10 @@ return 'Running' otherwise"""
         self.duration = duration
         self.child = child
     def start(self):
-        self.start_time = time.time()
+        self.start_time = now()
         self.child.start()
     def update(self):
-        if (time.time() - self.start_time) >= self.duration:
-            self.start_time = time.time()
+        if (now() - self.start_time) >= self.duration:
+            self.start_time = now()
             return self.child.update()
         return State.Running
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""Calibration of the kinematic model from logged wheel positions and poses
+
+Between two samples the wheels turn by dl and dr radians and the reference
+pose, e.g. from a motion capture or the simulator, moves a distance d and
+turns by dh. The kinematic model says
+
+    d = left_wheel_r / 2 * dl + right_wheel_r / 2 * dr
+    dh * axel_width = right_wheel_r * dr - left_wheel_r * dl
+
+The first is linear in the wheel radii, the second in the axel width once
+the radii are known. Both are fitted by least squares over sums that are
+accumulated chunk by chunk, so the memory use does not depend on the
+length of the log.
+
+    python -m roboutils.calibration drive.csv
+
+with the columns left wheel position, right wheel position, x, y and heading.
+"""
+import argparse
+import itertools
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from .utils.kinematics import KinematicModel
+
+CalibrationResult = namedtuple("CalibrationResult",
+    ("model", "samples", "distance_rms", "heading_rms"))
+
+class KinematicCalibration:
+    """Streaming least squares fit of the wheel radii and the axel width.
+Intervals where the reference turns more than 'max_turn' radians are
+skipped, they are most likely gaps in the log. The log must have both
+straight and turning segments, with different ratios between the wheels,
+or the fit is not determined and result() raises ValueError."""
+    max_turn = 0.5
+    # Largest condition number of the distance fit that is solved
+    max_condition = 1e8
+    # Smallest correlation of the heading change with the wheels
+    min_turn_correlation = 1e-3
+    def __init__(self):
+        self.last = None
+        self.samples = 0
+        # Normal equations of the distance fit, d = a . (dl, dr)
+        self.distance_xtx = np.zeros((2, 2))
+        self.distance_xty = np.zeros(2)
+        self.distance_yty = 0.0
+        # Sums for the heading fit
+        self.heading_sums = np.zeros(6)
+
+    def add(self, left, right, x, y, heading):
+        """Add a chunk of samples, arrays of the same length.
+        The interval from the previous chunk to this one is included."""
+        columns = np.array([left, right, x, y, heading], dtype = float).reshape(5, -1)
+        if self.last is not None:
+            columns = np.concatenate((self.last[:, None], columns), axis = 1)
+        if columns.shape[1] == 0:
+            return
+        self.last = columns[:, -1].copy()
+        if columns.shape[1] < 2:
+            return
+        left, right, x, y, heading = columns
+        dl = np.diff(left)
+        dr = np.diff(right)
+        dh = (np.diff(heading) + math.pi) % (2.0 * math.pi) - math.pi
+        dx = np.diff(x)
+        dy = np.diff(y)
+        # Signed arc length along the start heading turned by half the turn
+        middle = heading[:-1] + dh / 2
+        chord = dx * np.cos(middle) + dy * np.sin(middle)
+        half = dh / 2
+        safe_half = np.where(np.abs(half) < 1e-9, 1.0, half)
+        distance = np.where(np.abs(half) < 1e-9, chord, chord * half / np.sin(safe_half))
+        keep = np.abs(dh) <= self.max_turn
+        dl = dl[keep]
+        dr = dr[keep]
+        dh = dh[keep]
+        distance = distance[keep]
+        wheels = np.stack((dl, dr), axis = 1)
+        self.distance_xtx += wheels.T @ wheels
+        self.distance_xty += wheels.T @ distance
+        self.distance_yty += float(distance @ distance)
+        self.heading_sums += (dh @ dh, dh @ dr, dh @ dl, dr @ dr, dr @ dl, dl @ dl)
+        self.samples += len(dh)
+
+    def result(self):
+        """The fitted KinematicModel and the RMS residuals of the
+        distance and the heading change per sample"""
+        if self.samples < 2:
+            raise ValueError("Not enough samples to calibrate")
+        if not np.linalg.cond(self.distance_xtx) < self.max_condition:
+            raise ValueError("The wheel radii can not be told apart, "
+                "the log needs both straight and turning segments")
+        a = np.linalg.solve(self.distance_xtx, self.distance_xty)
+        left_r = 2.0 * a[0]
+        right_r = 2.0 * a[1]
+        distance_rss = self.distance_yty - 2.0 * a @ self.distance_xty + a @ self.distance_xtx @ a
+        hh, hr, hl, rr, rl, ll = self.heading_sums
+        # axel_width * dh = u, u = right_r * dr - left_r * dl
+        hu = right_r * hr - left_r * hl
+        uu = right_r * right_r * rr - 2.0 * right_r * left_r * rl + left_r * left_r * ll
+        if not hu > self.min_turn_correlation * math.sqrt(hh * uu):
+            raise ValueError("The axel width can not be fitted, "
+                "the log needs both straight and turning segments")
+        axel_width = uu / hu
+        # Residual of dh = u / axel_width
+        heading_rss = hh - 2.0 * hu / axel_width + uu / (axel_width * axel_width)
+        return CalibrationResult(
+            model = KinematicModel(axel_width = float(axel_width),
+                left_wheel_r = float(left_r), right_wheel_r = float(right_r)),
+            samples = self.samples,
+            distance_rms = math.sqrt(max(float(distance_rss), 0.0) / self.samples),
+            heading_rms = math.sqrt(max(float(heading_rss), 0.0) / self.samples))
+
+def calibrate(chunks):
+    """Fit the model to an iterable of chunks of
+    (left, right, x, y, heading) arrays"""
+    calibration = KinematicCalibration()
+    for chunk in chunks:
+        calibration.add(*chunk)
+    return calibration.result()
+
+def readChunks(path, chunk_size = 10000, delimiter = ","):
+    with open(path) as file:
+        lines = (line for line in file if line.strip() and not line.startswith("#"))
+        while True:
+            block = list(itertools.islice(lines, chunk_size))
+            if not block:
+                return
+            yield np.loadtxt(block, delimiter = delimiter, ndmin = 2).T
+
+def main():
+    parser = argparse.ArgumentParser(description = "Fit the kinematic model to a log of "
+        "left wheel position, right wheel position, x, y and heading")
+    parser.add_argument("log")
+    parser.add_argument("--chunk", type = int, default = 10000, help = "rows read at a time")
+    args = parser.parse_args()
+    result = calibrate(readChunks(args.log, args.chunk))
+    print("axel_width = %.5f, left_wheel_r = %.5f, right_wheel_r = %.5f" % (
+        result.model.axel_width, result.model.left_wheel_r, result.model.right_wheel_r))
+    print("%d samples, distance rms %.3g m, heading rms %.3g rad" % (
+        result.samples, result.distance_rms, result.heading_rms))
+
+if __name__ == "__main__":
+    main()
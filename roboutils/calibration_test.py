@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from roboutils.calibration import KinematicCalibration, calibrate, readChunks
+from roboutils.utils import kinematics as kine, Transform
+
+
+def simulateLog(model, steps = 3000, dt = 0.02, seed = 1):
+    """Wheel positions and true poses of a robot driving random arcs"""
+    rng = np.random.default_rng(seed)
+    pose = Transform.identity()
+    left = right = 0.0
+    rows = []
+    for step in range(steps):
+        if step % 100 == 0:
+            wheels = kine.WheelCommand(rng.uniform(-4, 8), rng.uniform(-4, 8))
+        rows.append((left, right, pose.x, pose.y, pose.heading))
+        left += wheels.left_angular_vel * dt
+        right += wheels.right_angular_vel * dt
+        pose = kine.predictPose(pose, model.computeCommand(wheels), dt)
+    return np.array(rows)
+
+def test_recovers_model_from_chunks():
+    true_model = kine.KinematicModel(axel_width = 0.21, left_wheel_r = 0.031, right_wheel_r = 0.029)
+    log = simulateLog(true_model)
+    result = calibrate(log[i:i + 257].T for i in range(0, len(log), 257))
+    assert result.model.axel_width == pytest.approx(0.21, rel = 1e-6)
+    assert result.model.left_wheel_r == pytest.approx(0.031, rel = 1e-6)
+    assert result.model.right_wheel_r == pytest.approx(0.029, rel = 1e-6)
+    assert result.samples == len(log) - 1
+    assert result.distance_rms < 1e-9
+    assert result.heading_rms < 1e-9
+
+def test_residuals_reflect_noise():
+    model = kine.KinematicModel(0.2, 0.03, 0.03)
+    log = simulateLog(model)
+    log[:, 2:4] += np.random.default_rng(2).normal(0, 0.001, (len(log), 2))
+    result = calibrate([log.T])
+    assert result.model.axel_width == pytest.approx(0.2, rel = 0.05)
+    assert 1e-4 < result.distance_rms < 0.01
+
+def test_reads_csv_in_chunks(tmp_path):
+    log = simulateLog(kine.KinematicModel(0.2, 0.03, 0.03), steps = 50)
+    path = tmp_path / "drive.csv"
+    np.savetxt(str(path), log, delimiter = ",", header = "left,right,x,y,heading")
+    chunks = list(readChunks(str(path), chunk_size = 20))
+    assert [chunk.shape for chunk in chunks] == [(5, 20), (5, 20), (5, 10)]
+
+def test_needs_samples():
+    with pytest.raises(ValueError):
+        KinematicCalibration().result()
+
+def driveLog(wheel_commands, model, steps = 200, dt = 0.02):
+    pose = Transform.identity()
+    left = right = 0.0
+    rows = []
+    for wheels in wheel_commands:
+        for _ in range(steps):
+            rows.append((left, right, pose.x, pose.y, pose.heading))
+            left += wheels.left_angular_vel * dt
+            right += wheels.right_angular_vel * dt
+            pose = kine.predictPose(pose, model.computeCommand(wheels), dt)
+    return np.array(rows)
+
+@pytest.mark.parametrize("wheel_commands", [
+    # Only straight
+    [kine.WheelCommand(4, 4), kine.WheelCommand(6, 6)],
+    # Only turning, at one ratio
+    [kine.WheelCommand(2, 4), kine.WheelCommand(3, 6)]])
+def test_needs_straight_and_turning_segments(wheel_commands):
+    log = driveLog(wheel_commands, kine.KinematicModel(0.2, 0.03, 0.03))
+    with pytest.raises(ValueError, match = "straight and turning"):
+        calibrate([log.T])
+
+def test_needs_turns_for_axel_width():
+    # Different ratios but the reference never turns, e.g. a stuck tracker
+    log = driveLog([kine.WheelCommand(4, 4), kine.WheelCommand(2, 6)],
+        kine.KinematicModel(0.2, 0.03, 0.03))
+    log[:, 4] = 0.0
+    with pytest.raises(ValueError, match = "axel width"):
+        calibrate([log.T])
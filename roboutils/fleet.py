@@ -0,0 +1,94 @@
+"""Packed state of a fleet of simulated robots
+
+Drawing hundreds of robots must not take an object and a signal per robot.
+FleetBuffer packs the poses and the sensor states of all robots into one
+flat array per frame, and optionally keeps a motion trail per robot.
+"""
+from array import array
+
+LEFT_BUMPER = 1
+RIGHT_BUMPER = 2
+LINE_SENSOR = 4
+
+# x, y, heading, sensor flags
+STRIDE = 4
+
+class FleetBuffer:
+    """Poses and sensor states of the robots, STRIDE values per robot.
+The pose is 'true_pose' of the RobotInterface if the simulation sets it,
+the odometry 'pose' otherwise. The trail of a robot holds its last
+'trail_length' positions, a position is added only after the robot has
+moved 'trail_spacing' meters from the previous one, so standing still or
+crawling does not push the older positions out."""
+    def __init__(self, robots, trail_length = 0, trail_spacing = 0.02):
+        self.robots = list(robots)
+        self.values = array("d", bytes(8 * STRIDE * len(self.robots)))
+        self.trail_length = trail_length
+        self.trail_spacing_sq = trail_spacing * trail_spacing
+        self.trails = array("d", bytes(16 * trail_length * len(self.robots)))
+        self.trail_start = [0] * len(self.robots)
+        self.trail_size = [0] * len(self.robots)
+
+    def __len__(self):
+        return len(self.robots)
+
+    def pack(self):
+        """Copy the current state of every robot into the buffer"""
+        values = self.values
+        offset = 0
+        for i, robot in enumerate(self.robots):
+            pose = robot.true_pose if robot.true_pose is not None else robot.pose
+            flags = 0
+            if robot.left_bumper_hit:
+                flags |= LEFT_BUMPER
+            if robot.right_bumper_hit:
+                flags |= RIGHT_BUMPER
+            if robot.line_sensor:
+                flags |= LINE_SENSOR
+            values[offset] = pose.x
+            values[offset + 1] = pose.y
+            values[offset + 2] = pose.heading
+            values[offset + 3] = flags
+            offset += STRIDE
+            if self.trail_length:
+                self.extend_trail(i, pose.x, pose.y)
+
+    def extend_trail(self, i, x, y):
+        length = self.trail_length
+        trails = self.trails
+        base = 2 * length * i
+        start = self.trail_start[i]
+        size = self.trail_size[i]
+        if size > 0:
+            last = base + 2 * ((start + size - 1) % length)
+            dx = x - trails[last]
+            dy = y - trails[last + 1]
+            if dx * dx + dy * dy < self.trail_spacing_sq:
+                return
+        if size < length:
+            index = (start + size) % length
+            self.trail_size[i] = size + 1
+        else:
+            index = start
+            self.trail_start[i] = (start + 1) % length
+        trails[base + 2 * index] = x
+        trails[base + 2 * index + 1] = y
+
+    def trail(self, i):
+        """Trail of robot i, oldest first, as a flat list x0, y0, x1, y1..."""
+        length = self.trail_length
+        base = 2 * length * i
+        start = self.trail_start[i]
+        size = self.trail_size[i]
+        first = self.trails[base + 2 * start:base + 2 * min(start + size, length)]
+        wrapped = self.trails[base:base + 2 * max(start + size - length, 0)]
+        return first.tolist() + wrapped.tolist()
+
+    def packed_trails(self):
+        """All the trails in one flat list, each trail prefixed
+        by the number of its points"""
+        packed = []
+        for i in range(len(self.robots)):
+            packed.append(self.trail_size[i])
+            packed.extend(self.trail(i))
+        return packed
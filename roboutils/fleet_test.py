@@ -0,0 +1,34 @@
+import pytest
+
+from roboutils import hal
+from roboutils.fleet import FleetBuffer, STRIDE, LINE_SENSOR, LEFT_BUMPER
+from roboutils.utils import kinematics as kine, Transform, Vec2
+
+
+def test_packs_poses_and_sensor_flags():
+    robots = [hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03)) for _ in range(2)]
+    robots[0].true_pose = Transform(0.5, Vec2(1.0, 2.0))
+    robots[1].true_pose = Transform(0.0, Vec2(-1.0, 0.0))
+    robots[0].line_sensor = True
+    robots[1].left_bumper_hit = True
+    fleet = FleetBuffer(robots)
+    fleet.pack()
+    assert len(fleet.values) == 2 * STRIDE
+    assert fleet.values.tolist() == [1.0, 2.0, 0.5, LINE_SENSOR, -1.0, 0.0, 0.0, LEFT_BUMPER]
+
+def test_trails_are_decimated_and_bounded():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    fleet = FleetBuffer([robot], trail_length = 3, trail_spacing = 0.095)
+    for step in range(50):
+        robot.true_pose = Transform(0.0, Vec2(step * 0.01, 0.0))
+        fleet.pack()
+    assert fleet.trail(0) == pytest.approx([0.2, 0.0, 0.3, 0.0, 0.4, 0.0])
+    assert fleet.packed_trails() == [3] + fleet.trail(0)
+
+def test_falls_back_to_odometry_pose_without_true_pose():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    robot.pose = Transform(0.25, Vec2(3.0, -1.0))
+    robot.true_pose = None
+    fleet = FleetBuffer([robot])
+    fleet.pack()
+    assert fleet.values.tolist() == [3.0, -1.0, 0.25, 0]
@@ -1 +1 @@
-from .robot_interface import RobotInterface, Motor
\ No newline at end of file
+from .robot_interface import RobotInterface, Motor, FieldCursor
\ No newline at end of file
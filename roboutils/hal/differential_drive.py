@@ -5,6 +5,20 @@ from ..behavior import State
 from ..utils import kinematics as kine
 
 
+def limitWheelCommand(wheel_command, left_wheel, right_wheel):
+    """Scale the wheel command so that neither wheel exceeds its
+    max_angular_vel, keeping the ratio between the wheels"""
+    limiting_speed = max(
+        abs(wheel_command.left_angular_vel),
+        abs(wheel_command.right_angular_vel))
+    speed_limit = min(
+        left_wheel.max_angular_vel,
+        right_wheel.max_angular_vel)
+    scale = speed_limit / limiting_speed if limiting_speed > speed_limit else 1.0
+    return kine.WheelCommand(
+        wheel_command.left_angular_vel * scale,
+        wheel_command.right_angular_vel * scale)
+
 # tasks
 
 class ComputeWheelCommands:
@@ -13,43 +27,153 @@ class ComputeWheelCommands:
     def start(self):
         pass
     def update(self):
-        wheel_command = self.robot.kinematics.computeWheelCommand(self.robot.command)
-        limiting_speed = max(
-            abs(wheel_command.left_angular_vel),
-            abs(wheel_command.right_angular_vel))
-        speed_limit = min(
-            self.robot.left_wheel.max_angular_vel,
-            self.robot.right_wheel.max_angular_vel)
-        scale = speed_limit / limiting_speed if limiting_speed > speed_limit else 1.0
-        self.robot.left_wheel.angular_vel_sp = wheel_command.left_angular_vel * scale
-        self.robot.right_wheel.angular_vel_sp = wheel_command.right_angular_vel * scale
+        wheel_command = limitWheelCommand(
+            self.robot.kinematics.computeWheelCommand(self.robot.command),
+            self.robot.left_wheel,
+            self.robot.right_wheel)
+        self.robot.left_wheel.angular_vel_sp = wheel_command.left_angular_vel
+        self.robot.right_wheel.angular_vel_sp = wheel_command.right_angular_vel
         return State.Running
 
 class ComputeOdometry:
-    def __init__(self, robot, output = None, max_dt = 2.0):
+    """Dead reckoning from the wheel positions.
+If 'history' is a PoseHistory, every pose is also stored in it
+with the time it was computed at."""
+    def __init__(self, robot, output = None, max_dt = 2.0, history = None):
         self.robot = robot
         self.output = output or robot
         self.max_dt = max_dt
+        self.history = history
     def start(self):
+        self.reset(time.time())
+    def update(self):
+        self.step(time.time())
+        return State.Running
+    def reset(self, now):
+        """Restart the odometry from identity at time 'now'"""
         self.old_left_pos = self.robot.left_wheel.position
         self.old_right_pos = self.robot.right_wheel.position
         self.output.travelled_distance = 0
         self.output.heading_rad = 0
         self.output.pose = utils.Transform.identity()
         self.output.movement = kine.Command(0,0)
-        self.last_time = time.time()
-    def update(self):
-        new_time = time.time()
-        dt = min(new_time - self.last_time, self.max_dt)
-        self.last_time = new_time
+        self.last_time = now
+        if self.history is not None:
+            self.history.clear()
+            self.history.append(now, self.output.pose)
+    def step(self, now):
+        """Integrate the wheel movement since the previous step at time 'now'"""
+        dt = min(now - self.last_time, self.max_dt)
+        if dt <= 0:
+            return
+        self.last_time = now
+        left_pos = self.robot.left_wheel.position
+        right_pos = self.robot.right_wheel.position
         wheel_command = kine.WheelCommand(
-            (self.robot.left_wheel.position - self.old_left_pos) / dt,
-            (self.robot.right_wheel.position - self.old_right_pos) / dt)
-        self.old_left_pos = self.robot.left_wheel.position
-        self.old_right_pos = self.robot.right_wheel.position
+            (left_pos - self.old_left_pos) / dt,
+            (right_pos - self.old_right_pos) / dt)
+        self.old_left_pos = left_pos
+        self.old_right_pos = right_pos
         estimated_movement = self.robot.kinematics.computeCommand(wheel_command)
         self.output.travelled_distance += estimated_movement.velocity * dt
         self.output.heading_rad += estimated_movement.angularVelocity * dt
         self.output.pose = kine.predictPose(self.output.pose, estimated_movement, dt)
         self.output.movement = estimated_movement
-        return State.Running
\ No newline at end of file
+        if self.history is not None:
+            self.history.append(now, self.output.pose)
+
+class PipelineStats:
+    """Per stage latencies and deadline misses of a DrivePipeline, in seconds"""
+    __slots__ = ("stages", "deadline", "ticks", "deadline_misses",
+        "last", "max", "total", "last_tick", "max_tick")
+    def __init__(self, stages, deadline):
+        self.stages = stages
+        self.deadline = deadline
+        self.reset()
+    def reset(self):
+        self.ticks = 0
+        self.deadline_misses = 0
+        self.last = [0.0] * len(self.stages)
+        self.max = [0.0] * len(self.stages)
+        self.total = [0.0] * len(self.stages)
+        self.last_tick = 0.0
+        self.max_tick = 0.0
+    def record(self, index, duration):
+        self.last[index] = duration
+        self.total[index] += duration
+        if duration > self.max[index]:
+            self.max[index] = duration
+    def record_tick(self, duration):
+        self.ticks += 1
+        self.last_tick = duration
+        if duration > self.max_tick:
+            self.max_tick = duration
+        if self.deadline is not None and duration > self.deadline:
+            self.deadline_misses += 1
+    def mean(self, stage):
+        if self.ticks == 0:
+            return 0.0
+        return self.total[self.stages.index(stage)] / self.ticks
+    def summary(self):
+        return {stage: (self.last[i], self.mean(stage), self.max[i])
+            for i, stage in enumerate(self.stages)}
+
+class DrivePipeline:
+    """Fused drive control loop: inverse kinematics, wheel limit scaling,
+motor I/O and odometry run in this order as one task.
+The time is sampled once per tick and shared by all the stages.
+'motor_io' is a task that moves the wheels, e.g. a SimulateDrive
+or the driver of the real motors. If it has an update_at(now), that is
+called with the time of the start and of every tick instead of update().
+The latency of each stage is recorded in 'stats', a tick taking longer
+than 'deadline' seconds is counted as a deadline miss."""
+    stages = ("kinematics", "motors", "odometry")
+    def __init__(self, robot, motor_io, output = None, max_dt = 2.0,
+            deadline = 0.03, clock = time.time, history = None):
+        self.robot = robot
+        self.motor_io = motor_io
+        self.motor_update_at = getattr(motor_io, "update_at", None)
+        self.odometry = ComputeOdometry(robot, output, max_dt, history)
+        self.clock = clock
+        self.stats = PipelineStats(self.stages, deadline)
+    def start(self):
+        now = self.clock()
+        self.motor_io.start()
+        if self.motor_update_at is not None:
+            self.motor_update_at(now)
+        self.odometry.reset(now)
+        self.command_key = None
+        self.stats.reset()
+    def update(self):
+        now = self.clock()
+        robot = self.robot
+        stats = self.stats
+        t0 = time.perf_counter()
+
+        left_wheel = robot.left_wheel
+        right_wheel = robot.right_wheel
+        command_key = (robot.velocity_command, robot.turn_command,
+            left_wheel.max_angular_vel, right_wheel.max_angular_vel)
+        if command_key != self.command_key:
+            self.command_key = command_key
+            self.wheel_command = limitWheelCommand(
+                robot.kinematics.computeWheelCommand(
+                    kine.Command(command_key[0], command_key[1])),
+                left_wheel, right_wheel)
+        left_wheel.angular_vel_sp = self.wheel_command.left_angular_vel
+        right_wheel.angular_vel_sp = self.wheel_command.right_angular_vel
+        t1 = time.perf_counter()
+        stats.record(0, t1 - t0)
+
+        if self.motor_update_at is not None:
+            self.motor_update_at(now)
+        else:
+            self.motor_io.update()
+        t2 = time.perf_counter()
+        stats.record(1, t2 - t1)
+
+        self.odometry.step(now)
+        t3 = time.perf_counter()
+        stats.record(2, t3 - t2)
+        stats.record_tick(t3 - t0)
+        return State.Running
@@ -0,0 +1,62 @@
+import pytest
+
+from roboutils import hal
+from roboutils.hal import simulation
+from roboutils.hal.differential_drive import DrivePipeline, limitWheelCommand
+from roboutils.utils import kinematics as kine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+    def __call__(self):
+        return self.now
+
+def test_limitWheelCommand_keeps_ratio():
+    left = hal.Motor()
+    right = hal.Motor()
+    left.max_angular_vel = 2.0
+    right.max_angular_vel = 4.0
+    limited = limitWheelCommand(kine.WheelCommand(-8.0, 4.0), left, right)
+    assert limited.left_angular_vel == pytest.approx(-2.0)
+    assert limited.right_angular_vel == pytest.approx(1.0)
+
+def test_DrivePipeline_odometry_follows_simulation():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    clock = FakeClock()
+    sim = simulation.SimulateDrive(robot, step = 0.001, substeps = 30,
+        time_constant = 0, max_acceleration = 1e9)
+    pipeline = DrivePipeline(robot, sim, clock = clock)
+    pipeline.start()
+    robot.command = kine.Command(0.1, 0.5)
+    for _ in range(50):
+        clock.now += 0.03
+        pipeline.update()
+    assert robot.pose.x == pytest.approx(robot.true_pose.x, abs = 1e-3)
+    assert robot.pose.y == pytest.approx(robot.true_pose.y, abs = 1e-3)
+    assert robot.heading_rad == pytest.approx(robot.true_pose.heading, abs = 1e-3)
+    assert pipeline.stats.ticks == 50
+
+def test_DrivePipeline_counts_deadline_misses():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    clock = FakeClock()
+    pipeline = DrivePipeline(robot, simulation.SimulateDrive(robot),
+        deadline = 0.0, clock = clock)
+    pipeline.start()
+    for _ in range(3):
+        clock.now += 0.03
+        pipeline.update()
+    assert pipeline.stats.deadline_misses == 3
+    assert set(pipeline.stats.summary()) == set(DrivePipeline.stages)
+
+def test_DrivePipeline_drives_simulation_at_tick_time():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    clock = FakeClock()
+    sim = simulation.SimulateDrive(robot, step = 0.005, substeps = 6)
+    pipeline = DrivePipeline(robot, sim, clock = clock)
+    pipeline.start()
+    for interval in (0.03, 0.05, 0.012, 0.018):
+        clock.now += interval
+        pipeline.update()
+    assert sim.time == pytest.approx(0.11)
+    assert sim.last_time == pipeline.odometry.last_time
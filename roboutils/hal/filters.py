@@ -0,0 +1,206 @@
+"""Streaming filters for sensor signals
+
+Every filter keeps a fixed amount of state, allocated up front or on the
+first sample, and takes one sample per update() call. The samples can be
+scalars or NumPy arrays, e.g. the same sensor of every robot of a fleet,
+in which case each element is filtered on its own.
+FilterField runs a filter as a task between a raw state and a RobotInterface.
+"""
+import math
+
+import numpy as np
+
+from ..behavior import State
+from ..behavior import time as behavior_time
+
+class Debounce:
+    """Boolean output that follows the input only after the input has
+differed from the output for 'samples' consecutive samples"""
+    __slots__ = ("samples", "output", "count")
+    def __init__(self, samples = 3, initial = False):
+        self.samples = samples
+        self.output = initial
+        self.count = 0
+    def reset(self, initial = False):
+        self.output = initial
+        self.count = 0
+    def update(self, value):
+        if isinstance(value, np.ndarray):
+            differs = value.astype(bool) != self.output
+            self.count = np.where(differs, self.count + 1, 0)
+            flip = self.count >= self.samples
+            self.output = np.where(flip, ~np.asarray(self.output, dtype = bool), self.output)
+            self.count = np.where(flip, 0, self.count)
+            return self.output
+        if bool(value) != self.output:
+            self.count += 1
+            if self.count >= self.samples:
+                self.output = bool(value)
+                self.count = 0
+        else:
+            self.count = 0
+        return self.output
+
+class Hysteresis:
+    """Boolean output that turns on above 'high' and off below 'low'
+and keeps its state in between"""
+    __slots__ = ("low", "high", "output")
+    def __init__(self, low, high, initial = False):
+        if low > high:
+            raise ValueError("Hysteresis low threshold must not exceed the high one")
+        self.low = low
+        self.high = high
+        self.output = initial
+    def reset(self, initial = False):
+        self.output = initial
+    def update(self, value):
+        if isinstance(value, np.ndarray):
+            self.output = np.where(value > self.high, True,
+                np.where(value < self.low, False, self.output))
+            return self.output
+        if value > self.high:
+            self.output = True
+        elif value < self.low:
+            self.output = False
+        return self.output
+
+class MovingAverage:
+    """Mean of the last 'window' samples, kept as a running sum
+over a ring of the samples. The sum is recomputed from the ring once per
+window, so its rounding errors do not accumulate over a long run."""
+    __slots__ = ("window", "ring", "index", "size", "total")
+    def __init__(self, window):
+        self.window = window
+        self.reset()
+    def reset(self):
+        self.ring = [0.0] * self.window
+        self.index = 0
+        self.size = 0
+        self.total = 0.0
+    def update(self, value):
+        if self.size < self.window:
+            self.size += 1
+        else:
+            self.total = self.total - self.ring[self.index]
+        self.ring[self.index] = value
+        self.total = self.total + value
+        self.index = (self.index + 1) % self.window
+        if self.index == 0:
+            self.total = sum(self.ring)
+        return self.total / self.size
+
+class MovingMedian:
+    """Median of the last 'window' samples, rejects spikes
+shorter than half the window. The ring is preallocated, the median is
+taken over the window, which is meant to be a handful of samples."""
+    __slots__ = ("window", "ring", "index", "size")
+    def __init__(self, window = 5):
+        self.window = window
+        self.reset()
+    def reset(self):
+        self.ring = None
+        self.index = 0
+        self.size = 0
+    def update(self, value):
+        if self.ring is None:
+            self.ring = np.zeros((self.window,) + np.shape(value))
+        self.ring[self.index] = value
+        self.index = (self.index + 1) % self.window
+        self.size = min(self.size + 1, self.window)
+        median = np.median(self.ring[:self.size], axis = 0)
+        return median if isinstance(value, np.ndarray) else float(median)
+
+class ExponentialFilter:
+    """First order low pass filter. With 'time_constant' the time step
+must be given to update(), and the smoothing does not depend on the sample
+rate. Otherwise 'alpha' is the weight of each new sample."""
+    __slots__ = ("alpha", "time_constant", "output")
+    # FilterField passes the time step to update()
+    uses_dt = True
+    def __init__(self, alpha = 0.2, time_constant = None):
+        self.alpha = alpha
+        self.time_constant = time_constant
+        self.output = None
+    def reset(self):
+        self.output = None
+    def update(self, value, dt = None):
+        if self.output is None:
+            self.output = value
+            return value
+        alpha = self.alpha
+        if self.time_constant is not None:
+            if dt is None:
+                raise ValueError("ExponentialFilter with a time_constant needs dt")
+            alpha = 1.0 - math.exp(-dt / self.time_constant)
+        self.output = self.output + alpha * (value - self.output)
+        return self.output
+
+class ComplementaryFilter:
+    """Fusion of a rate, e.g. a gyro or the odometry turn rate, that is
+smooth but drifts, with an absolute measurement, e.g. a compass or the
+localized heading, that is noisy but does not drift. The rate is trusted
+for changes faster than 'time_constant' seconds, the measurement for
+slower ones. 'angle' wraps the difference to the shorter arc."""
+    __slots__ = ("time_constant", "angle", "output")
+    def __init__(self, time_constant = 1.0, angle = False):
+        self.time_constant = time_constant
+        self.angle = angle
+        self.output = None
+    def reset(self):
+        self.output = None
+    def update(self, rate, measurement, dt):
+        if self.output is None:
+            self.output = measurement
+            return measurement
+        predicted = self.output + rate * dt
+        error = measurement - predicted
+        if self.angle:
+            error = (error + math.pi) % (2.0 * math.pi) - math.pi
+        alpha = dt / (self.time_constant + dt)
+        self.output = predicted + alpha * error
+        return self.output
+
+def _get(state, field):
+    if isinstance(state, dict):
+        return state.get(field)
+    return getattr(state, field)
+
+def _set(state, field, value):
+    if isinstance(state, dict):
+        state[field] = value
+    else:
+        setattr(state, field, value)
+
+class FilterField:
+    """Task that filters 'field' of the source, e.g. the dictionary a
+UDPReceive writes the raw sensors to, into 'output_field' of the output,
+e.g. the RobotInterface the behaviors read. The filter only sees new
+samples if the source and the output are different objects.
+The filter takes one signal, a filter with 'uses_dt' also gets the time
+since the previous sample from the clock of the timed behaviors, so an
+ExponentialFilter with a time_constant works as a stage. A
+ComplementaryFilter fuses two signals and is not accepted."""
+    def __init__(self, source, field, filter, output, output_field = None):
+        if isinstance(filter, ComplementaryFilter):
+            raise TypeError("FilterField runs filters of one signal, "
+                "call ComplementaryFilter.update with the rate and the measurement")
+        self.source = source
+        self.field = field
+        self.filter = filter
+        self.output = output
+        self.output_field = output_field or field
+    def start(self):
+        self.filter.reset()
+        self.last_time = None
+    def update(self):
+        value = _get(self.source, self.field)
+        if value is not None:
+            if getattr(self.filter, "uses_dt", False):
+                now = behavior_time.now()
+                dt = None if self.last_time is None else now - self.last_time
+                self.last_time = now
+                filtered = self.filter.update(value, dt)
+            else:
+                filtered = self.filter.update(value)
+            _set(self.output, self.output_field, filtered)
+        return State.Running
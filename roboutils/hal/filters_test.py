@@ -0,0 +1,87 @@
+import math
+import numpy as np
+import pytest
+
+from roboutils import hal
+from roboutils.behavior.replay import VirtualClock
+from roboutils.behavior.time import useClock
+from roboutils.hal.filters import Debounce, Hysteresis, MovingAverage, MovingMedian, \
+    ExponentialFilter, ComplementaryFilter, FilterField
+from roboutils.utils import kinematics as kine
+
+
+def test_debounce_ignores_short_flaps():
+    debounce = Debounce(samples = 3)
+    outputs = [debounce.update(value) for value in
+        [True, False, True, True, False, True, True, True, False]]
+    assert outputs == [False] * 7 + [True, True]
+
+def test_debounce_arrays():
+    debounce = Debounce(samples = 2)
+    debounce.update(np.array([True, False, True]))
+    assert debounce.update(np.array([True, False, False])).tolist() == [True, False, False]
+    assert debounce.update(np.array([False, True, False])).tolist() == [True, False, False]
+
+def test_hysteresis_keeps_state_between_thresholds():
+    hysteresis = Hysteresis(0.3, 0.7)
+    assert [hysteresis.update(v) for v in [0.5, 0.8, 0.5, 0.31, 0.2, 0.6]] == \
+        [False, True, True, True, False, False]
+    assert Hysteresis(0.3, 0.7).update(np.array([0.1, 0.5, 0.9])).tolist() == [False, False, True]
+
+def test_moving_average_and_median():
+    average = MovingAverage(3)
+    assert [average.update(v) for v in [3.0, 6.0, 9.0, 0.0]] == [3.0, 4.5, 6.0, 5.0]
+    median = MovingMedian(3)
+    assert [median.update(v) for v in [1.0, 100.0, 2.0, 3.0]] == [1.0, 50.5, 2.0, 3.0]
+    assert MovingMedian(3).update(np.array([1.0, 2.0])).tolist() == [1.0, 2.0]
+
+def test_exponential_filter_with_time_constant():
+    low_pass = ExponentialFilter(time_constant = 1.0)
+    low_pass.update(0.0)
+    assert low_pass.update(1.0, dt = 1.0) == pytest.approx(1.0 - math.exp(-1.0))
+    with pytest.raises(ValueError):
+        low_pass.update(1.0)
+
+def test_moving_average_does_not_drift():
+    average = MovingAverage(4)
+    for i in range(100000):
+        average.update(1e8 if i % 2 else 0.1)
+    for _ in range(4):
+        mean = average.update(0.1)
+    assert mean == 0.1
+
+def test_complementary_filter_removes_drift():
+    fusion = ComplementaryFilter(time_constant = 0.5, angle = True)
+    fusion.update(0.0, 0.0, 0.01)
+    # The rate is biased, the measurement is right at 0
+    for _ in range(1000):
+        heading = fusion.update(0.1, 0.0, 0.01)
+    assert abs(heading) < 0.06
+    fusion.reset()
+    fusion.update(0.0, math.pi - 0.01, 0.01)
+    assert fusion.update(0.0, -math.pi + 0.01, 0.01) == pytest.approx(math.pi - 0.01 + 0.02 * 0.01 / 0.51)
+
+def test_filter_field_feeds_robot_interface():
+    raw = {"line_sensor": True}
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    stage = FilterField(raw, "line_sensor", Debounce(samples = 2), robot)
+    stage.start()
+    stage.update()
+    assert robot.line_sensor is False
+    stage.update()
+    assert robot.line_sensor is True
+
+def test_filter_field_passes_time_step():
+    raw = {"heading_rad": 0.0}
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    stage = FilterField(raw, "heading_rad", ExponentialFilter(time_constant = 1.0), robot)
+    clock = VirtualClock(5.0)
+    with useClock(clock):
+        stage.start()
+        stage.update()
+        raw["heading_rad"] = 1.0
+        clock.now += 0.5
+        stage.update()
+    assert robot.heading_rad == pytest.approx(1.0 - math.exp(-0.5))
+    with pytest.raises(TypeError):
+        FilterField(raw, "heading_rad", ComplementaryFilter(), robot)
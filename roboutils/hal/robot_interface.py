@@ -2,26 +2,96 @@ from .. import utils
 from ..utils import math_utils
 
 class Motor:
+    __slots__ = ("angular_vel_sp", "angular_vel", "max_angular_vel", "position")
     def __init__(self):
         self.angular_vel_sp = 0
         self.angular_vel = 0
         self.max_angular_vel = math_utils.deg2rad(700)
         self.position = 0
 
+class Field:
+    """Descriptor of a tracked RobotInterface field.
+    Every write that changes the value stamps the field with a new version"""
+    __slots__ = ("index", "name")
+    def __init__(self, index, name):
+        self.index = index
+        self.name = name
+    def __get__(self, robot, owner = None):
+        if robot is None:
+            return self
+        return robot._values[self.index]
+    def __set__(self, robot, value):
+        index = self.index
+        if robot._values[index] != value:
+            robot._version += 1
+            robot._stamps[index] = robot._version
+        robot._values[index] = value
+
+class FieldCursor:
+    """Position of one consumer (telemetry, GUI, logging...) in the change
+history of a RobotInterface. Each consumer has its own cursor, so reading
+the changes through one cursor does not clear them for the others."""
+    __slots__ = ("robot", "indices", "seen")
+    def __init__(self, robot, indices):
+        self.robot = robot
+        self.indices = indices
+        self.seen = 0
+    @property
+    def dirty(self):
+        stamps = self.robot._stamps
+        seen = self.seen
+        for i in self.indices:
+            if stamps[i] > seen:
+                return True
+        return False
+    def changes(self):
+        """Return (name, value) pairs changed since the previous call"""
+        robot = self.robot
+        stamps = robot._stamps
+        values = robot._values
+        names = robot.fields
+        seen = self.seen
+        self.seen = robot._version
+        return [(names[i], values[i]) for i in self.indices if stamps[i] > seen]
+    def mark_all_dirty(self):
+        """Report every field as changed on the next call to changes()"""
+        self.seen = 0
+
 class RobotInterface:
+    """State of the robot with a fixed layout of tracked fields.
+The fields and their initial values are listed in 'defaults', they are
+stored in a list in the order of 'fields',
+consumers ask for the fields changed since they last read
+through a FieldCursor.
+'trace' holds the latency trace of the message that last updated
+the state, see roboutils.tracing."""
+    defaults = {
+        "travelled_distance": 0,
+        "heading_rad": 0,
+        "has_left_bumper": False,
+        "has_right_bumper": False,
+        "left_bumper_hit": False,
+        "right_bumper_hit": False,
+        "turn_command": 0,
+        "velocity_command": 0,
+        "line_sensor": False, #TODO: Replace this with proper light sensor
+        "pose": utils.Transform.identity(),
+        "movement": utils.Command(0, 0),
+        "true_pose": utils.Transform.identity(),
+        "localized_pose": utils.Transform.identity()}
+    fields = tuple(defaults)
+    field_index = {name: i for i, name in enumerate(fields)}
+    __slots__ = ("kinematics", "left_wheel", "right_wheel", "trace",
+        "_values", "_stamps", "_version")
+
     def __init__(self, kinematics):
         self.kinematics = kinematics
-        self.travelled_distance = 0
-        self.heading_rad = 0
-        self.has_left_bumper = False
-        self.has_right_bumper = False
-        self.left_bumper_hit = False
-        self.right_bumper_hit = False
-        self.turn_command = 0
-        self.velocity_command = 0
+        self._values = [self.defaults[name] for name in self.fields]
+        self._stamps = [1] * len(self.fields)
+        self._version = 1
         self.left_wheel = Motor()
         self.right_wheel = Motor()
-        self.line_sensor = False #TODO: Replace this with proper light sensor
+        self.trace = None
 
     @property
     def command(self):
@@ -30,3 +100,32 @@ class RobotInterface:
     def command(self, value):
         self.turn_command = value.angularVelocity
         self.velocity_command = value.velocity
+
+    @property
+    def version(self):
+        """Increases every time a tracked field changes"""
+        return self._version
+
+    def cursor(self, fields = None):
+        """Create a FieldCursor following the given fields, or all of them"""
+        if fields is None:
+            indices = tuple(range(len(self.fields)))
+        else:
+            indices = tuple(self.field_index[name] for name in fields)
+        return FieldCursor(self, indices)
+
+    def get(self, name, default = None):
+        index = self.field_index.get(name)
+        if index is None:
+            return default
+        return self._values[index]
+
+    def update(self, message):
+        """Set the fields from a mapping, names that are not fields are ignored"""
+        for name, value in message.items():
+            if name in self.field_index:
+                setattr(self, name, value)
+
+for _index, _name in enumerate(RobotInterface.fields):
+    setattr(RobotInterface, _name, Field(_index, _name))
+del _index, _name
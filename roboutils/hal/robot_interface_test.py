@@ -0,0 +1,44 @@
+import pytest
+
+from roboutils import hal
+from roboutils.utils import kinematics as kine
+
+
+def test_fields_are_slotted():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    with pytest.raises(AttributeError):
+        robot.no_such_field = 1
+
+def test_cursor_reports_every_field_first():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    cursor = robot.cursor()
+    assert [name for name, _ in cursor.changes()] == list(hal.RobotInterface.fields)
+    assert cursor.changes() == []
+    assert not cursor.dirty
+
+def test_cursors_are_cleared_per_consumer():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    telemetry = robot.cursor(("left_bumper_hit", "line_sensor"))
+    gui = robot.cursor()
+    telemetry.changes()
+    gui.changes()
+    robot.line_sensor = True
+    robot.heading_rad = 0.5
+    assert telemetry.changes() == [("line_sensor", True)]
+    assert telemetry.changes() == []
+    assert gui.changes() == [("heading_rad", 0.5), ("line_sensor", True)]
+
+def test_writing_same_value_is_not_a_change():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    cursor = robot.cursor()
+    cursor.changes()
+    version = robot.version
+    robot.command = kine.Command(0, 0)
+    assert robot.version == version
+    assert not cursor.dirty
+
+def test_update_ignores_unknown_fields():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    robot.update({"velocity_command": 0.2, "state": 3})
+    assert robot.velocity_command == 0.2
+    assert robot.get("state") is None
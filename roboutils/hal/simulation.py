@@ -1,5 +1,9 @@
+import math
 import time
+from .. import utils
 from ..behavior import State
+from ..utils import kinematics as kine
+from ..utils import math_utils
 
 class SimulateMotor:
     def __init__(self, motor, max_dt = 0.2):
@@ -10,10 +14,90 @@ class SimulateMotor:
         self.motor.position = 0
         self.last_time = time.time()
     def update(self):
-        new_time = time.time()
+        return self.update_at(time.time())
+    def update_at(self, new_time):
         dt = min(new_time - self.last_time, self.max_dt)
         self.last_time = new_time
         self.motor.position += self.motor.angular_vel * 0.5 * dt
         self.motor.angular_vel = self.motor.angular_vel_sp
         self.motor.position += self.motor.angular_vel * 0.5 * dt
-        return State.Running
\ No newline at end of file
+        return State.Running
+
+def stepMotor(motor, dt, time_constant, max_acceleration):
+    """Advance the motor by dt seconds with first order dynamics
+    towards angular_vel_sp, the change in velocity is limited
+    by max_acceleration"""
+    if time_constant > 0:
+        alpha = 1.0 - math.exp(-dt / time_constant)
+    else:
+        alpha = 1.0
+    change = (motor.angular_vel_sp - motor.angular_vel) * alpha
+    max_change = max_acceleration * dt
+    if change > max_change:
+        change = max_change
+    elif change < -max_change:
+        change = -max_change
+    old_vel = motor.angular_vel
+    motor.angular_vel = old_vel + change
+    motor.position += (old_vel + motor.angular_vel) * 0.5 * dt
+
+class SimulateDrive:
+    """Fixed step simulation of both wheels and the true pose of the robot
+
+Every update advances the simulation by 'substeps' steps of 'step' seconds,
+independent of the wall clock, so the behavior tree can run at a coarse
+rate while the physics is integrated at a fine one. Run by a DrivePipeline,
+update_at advances it by the steps that fit in the time since the previous
+tick instead, so the simulation keeps pace with the clock of the pipeline.
+The ground truth pose is written to 'true_pose' of the output, it starts
+from 'start_pose', the origin by default."""
+    def __init__(self, robot, step = 0.005, substeps = 6,
+            time_constant = 0.05, max_acceleration = math_utils.deg2rad(5000),
+            output = None, start_pose = None, max_dt = 0.2):
+        self.robot = robot
+        self.output = output or robot
+        self.start_pose = start_pose or utils.Transform.identity()
+        self.step = step
+        self.substeps = substeps
+        self.time_constant = time_constant
+        self.max_acceleration = max_acceleration
+        self.max_dt = max_dt
+    def start(self):
+        for motor in (self.robot.left_wheel, self.robot.right_wheel):
+            motor.angular_vel = 0
+            motor.position = 0
+        self.output.true_pose = self.start_pose
+        self.time = 0.0
+        self.last_time = None
+        # Time not yet simulated, less than a step
+        self.pending = 0.0
+    def advance(self, steps):
+        """Run 'steps' fixed steps of the simulation"""
+        left = self.robot.left_wheel
+        right = self.robot.right_wheel
+        kinematics = self.robot.kinematics
+        pose = self.output.true_pose
+        for _ in range(steps):
+            old_left_pos = left.position
+            old_right_pos = right.position
+            stepMotor(left, self.step, self.time_constant, self.max_acceleration)
+            stepMotor(right, self.step, self.time_constant, self.max_acceleration)
+            movement = kinematics.computeCommand(kine.WheelCommand(
+                (left.position - old_left_pos) / self.step,
+                (right.position - old_right_pos) / self.step))
+            pose = kine.predictPose(pose, movement, self.step)
+        self.output.true_pose = pose
+        self.time += steps * self.step
+    def update(self):
+        self.advance(self.substeps)
+        return State.Running
+    def update_at(self, now):
+        """Advance by the whole steps since the previous call at time 'now',
+        at most 'max_dt' seconds worth"""
+        if self.last_time is not None:
+            self.pending += min(now - self.last_time, self.max_dt)
+            steps = int(self.pending / self.step + 1e-9)
+            self.pending -= steps * self.step
+            self.advance(steps)
+        self.last_time = now
+        return State.Running
@@ -0,0 +1,46 @@
+import pytest
+
+from roboutils import hal
+from roboutils.hal import simulation
+from roboutils.utils import kinematics as kine
+
+
+def test_stepMotor_limits_acceleration():
+    motor = hal.Motor()
+    motor.angular_vel_sp = 10.0
+    simulation.stepMotor(motor, 0.01, time_constant = 0, max_acceleration = 100.0)
+    assert motor.angular_vel == pytest.approx(1.0)
+    assert motor.position == pytest.approx(0.005)
+
+def test_stepMotor_first_order_response():
+    motor = hal.Motor()
+    motor.angular_vel_sp = 1.0
+    for _ in range(1000):
+        simulation.stepMotor(motor, 0.001, time_constant = 0.05, max_acceleration = 1000.0)
+    assert motor.angular_vel == pytest.approx(1.0, abs = 1e-6)
+
+def test_SimulateDrive_straight():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    sim = simulation.SimulateDrive(robot, step = 0.001, substeps = 10,
+        time_constant = 0, max_acceleration = 1e9)
+    sim.start()
+    robot.left_wheel.angular_vel_sp = 10.0
+    robot.right_wheel.angular_vel_sp = 10.0
+    for _ in range(100):
+        sim.update()
+    assert sim.time == pytest.approx(1.0)
+    assert robot.true_pose.x == pytest.approx(0.3, rel = 1e-2)
+    assert robot.true_pose.y == pytest.approx(0.0)
+    assert robot.true_pose.heading == pytest.approx(0.0)
+
+def test_SimulateDrive_turn_on_spot():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    sim = simulation.SimulateDrive(robot, step = 0.001, substeps = 10,
+        time_constant = 0, max_acceleration = 1e9)
+    sim.start()
+    robot.left_wheel.angular_vel_sp = -1.0
+    robot.right_wheel.angular_vel_sp = 1.0
+    for _ in range(100):
+        sim.update()
+    assert robot.true_pose.heading == pytest.approx(0.3, rel = 1e-2)
+    assert robot.true_pose.offset.length == pytest.approx(0.0, abs = 1e-9)
@@ -0,0 +1,130 @@
+import time
+
+# Upper edges of the inter-arrival interval histogram buckets, in seconds
+INTERVAL_EDGES = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, float("inf"))
+
+LINK_STATS_FIELDS = (
+    "link_received",
+    "link_lost",
+    "link_duplicates",
+    "link_reordered",
+    "link_loss_rate",
+    "link_rtt",
+    "link_jitter",
+    "link_packet_rate",
+    "link_byte_rate")
+
+class LinkStats:
+    """Quality of the incoming side of a link, derived from sequence numbers,
+arrival times and echoed timestamps.
+
+A gap in the sequence numbers is counted as lost until the missing packet
+arrives late, then it is counted as reordered instead. Packets already
+seen within the last 'window' sequence numbers are duplicates.
+Jitter is the smoothed deviation of the inter-arrival time from its mean,
+arrival times are those of the reads, so with a polled socket they are
+quantized to the tick of the tree."""
+    window = 64
+    rate_period = 1.0
+    def __init__(self, clock = time.time):
+        self.clock = clock
+        self.reset()
+    def reset(self):
+        self.received = 0
+        self.received_bytes = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.restarts = 0
+        self.highest = None
+        # Sequence number of the first packet since the start or restart,
+        # gaps before it were never counted as lost
+        self.first = None
+        self.seen = 0 # bit i is set when highest - i has been received
+        self.last_arrival = None
+        self.mean_interval = None
+        self.jitter = 0.0
+        self.interval_histogram = [0] * len(INTERVAL_EDGES)
+        self.rtt = None
+        self.rate_start = None
+        self.rate_packets = 0
+        self.rate_bytes = 0
+        self.packet_rate = 0.0
+        self.byte_rate = 0.0
+    def record(self, seq_no, size, now = None):
+        """Account one received packet"""
+        if now is None:
+            now = self.clock()
+        self.received += 1
+        self.received_bytes += size
+        self.record_arrival(now, size)
+        highest = self.highest
+        if highest is None or (seq_no < 10 and highest - seq_no > self.window):
+            if highest is not None:
+                self.restarts += 1
+            self.highest = seq_no
+            self.first = seq_no
+            self.seen = 1
+            return
+        if seq_no > highest:
+            gap = seq_no - highest
+            self.lost += gap - 1
+            self.seen = ((self.seen << gap) | 1) & ((1 << self.window) - 1)
+            self.highest = seq_no
+            return
+        age = highest - seq_no
+        if age >= self.window:
+            self.reordered += 1
+            return
+        if self.seen & (1 << age):
+            self.duplicates += 1
+            return
+        self.seen |= 1 << age
+        self.reordered += 1
+        if seq_no > self.first and self.lost > 0:
+            self.lost -= 1
+    def record_arrival(self, now, size):
+        if self.last_arrival is not None:
+            interval = now - self.last_arrival
+            if self.mean_interval is None:
+                self.mean_interval = interval
+            else:
+                self.mean_interval += (interval - self.mean_interval) / 16.0
+                self.jitter += (abs(interval - self.mean_interval) - self.jitter) / 16.0
+            for i, edge in enumerate(INTERVAL_EDGES):
+                if interval <= edge:
+                    self.interval_histogram[i] += 1
+                    break
+        self.last_arrival = now
+        if self.rate_start is None:
+            self.rate_start = now
+        self.rate_packets += 1
+        self.rate_bytes += size
+        elapsed = now - self.rate_start
+        if elapsed >= self.rate_period:
+            self.packet_rate = self.rate_packets / elapsed
+            self.byte_rate = self.rate_bytes / elapsed
+            self.rate_start = now
+            self.rate_packets = 0
+            self.rate_bytes = 0
+    def record_rtt(self, rtt):
+        if self.rtt is None:
+            self.rtt = rtt
+        else:
+            self.rtt += (rtt - self.rtt) / 8.0
+    @property
+    def loss_rate(self):
+        expected = self.received - self.duplicates + self.lost
+        return self.lost / expected if expected > 0 else 0.0
+    def snapshot(self):
+        """The statistics as a dictionary with the LINK_STATS_FIELDS"""
+        return {
+            "link_received": self.received,
+            "link_lost": self.lost,
+            "link_duplicates": self.duplicates,
+            "link_reordered": self.reordered,
+            "link_loss_rate": self.loss_rate,
+            "link_rtt": self.rtt,
+            "link_jitter": self.jitter,
+            "link_packet_rate": self.packet_rate,
+            "link_byte_rate": self.byte_rate}
@@ -0,0 +1,55 @@
+import pytest
+
+from roboutils.link_stats import LinkStats
+
+
+def feed(stats, seq_nos, interval = 0.03):
+    for i, seq_no in enumerate(seq_nos):
+        stats.record(seq_no, 20, now = i * interval)
+
+def test_in_order_stream():
+    stats = LinkStats()
+    feed(stats, range(10, 110))
+    assert stats.received == 100
+    assert stats.lost == 0
+    assert stats.loss_rate == 0.0
+    assert stats.jitter == pytest.approx(0.0, abs = 1e-9)
+    assert stats.packet_rate == pytest.approx(1 / 0.03, rel = 0.05)
+
+def test_gaps_are_lost():
+    stats = LinkStats()
+    feed(stats, [10, 11, 14, 15])
+    assert stats.lost == 2
+    assert stats.loss_rate == pytest.approx(2 / 6)
+
+def test_late_packet_is_reordered_not_lost():
+    stats = LinkStats()
+    feed(stats, [10, 12, 11, 13])
+    assert stats.lost == 0
+    assert stats.reordered == 1
+
+def test_packet_from_before_the_first_is_not_lost():
+    stats = LinkStats()
+    feed(stats, [5, 4, 6])
+    assert stats.lost == 0
+    assert stats.reordered == 1
+    assert stats.loss_rate == 0.0
+
+def test_duplicates():
+    stats = LinkStats()
+    feed(stats, [10, 11, 11, 12, 10])
+    assert stats.duplicates == 2
+    assert stats.lost == 0
+
+def test_restart_of_the_sender():
+    stats = LinkStats()
+    feed(stats, [500, 501, 0, 1])
+    assert stats.restarts == 1
+    assert stats.lost == 0
+
+def test_interval_histogram_counts_intervals():
+    stats = LinkStats()
+    for i, now in enumerate([0.0, 0.03, 0.06, 0.16]):
+        stats.record(10 + i, 20, now = now)
+    assert sum(stats.interval_histogram) == 3
+    assert stats.jitter > 0
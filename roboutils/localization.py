@@ -0,0 +1,182 @@
+"""Monte Carlo localization against the line map
+
+The particles are kept as NumPy arrays and every step of the filter is
+vectorized over them, so thousands of particles fit in one tick of the tree.
+The odometry movement moves the particles, the line sensor weights them by
+whether they would see a line where they are, and they are resampled
+systematically when too few of them carry the weight.
+"""
+import math
+import time
+
+import numpy as np
+
+from .behavior import State
+from .utils import Transform, Vec2
+
+def lineSegmentArrays(world):
+    """The line segments of the world as arrays of begin points (S, 2),
+    unit directions (S, 2), lengths and half widths"""
+    segments = [segment for line in world.lines for segment in line.segmentList]
+    begins = np.array([(s.beg.x, s.beg.y) for s in segments], dtype = float).reshape(-1, 2)
+    ends = np.array([(s.end.x, s.end.y) for s in segments], dtype = float).reshape(-1, 2)
+    lengths = np.hypot(*(ends - begins).T)
+    directions = (ends - begins) / lengths[:, None]
+    half_widths = np.array([s.width / 2 for s in segments], dtype = float)
+    return begins, directions, lengths, half_widths
+
+def isOnLineArray(segments, x, y):
+    """World.isOnLine for arrays of points"""
+    begins, directions, lengths, half_widths = segments
+    on_line = np.zeros(np.shape(x), dtype = bool)
+    for begin, direction, length, half_width in zip(begins, directions, lengths, half_widths):
+        dx = x - begin[0]
+        dy = y - begin[1]
+        along = dx * direction[0] + dy * direction[1]
+        across = dy * direction[0] - dx * direction[1]
+        on_line |= (along > -half_width) & (along <= length + half_width) \
+            & (np.abs(across) < half_width)
+    return on_line
+
+def integrateArrays(velocity, angular_velocity, dt):
+    """Command.integrate for arrays of velocities,
+    returns the movement (dx, dy, dheading) in the frame of the start pose"""
+    heading_change = angular_velocity * dt
+    straight = np.abs(heading_change) < 1e-9
+    safe_change = np.where(straight, 1.0, heading_change)
+    # distance / heading change is the radius times the heading change
+    scale = np.where(straight, velocity * dt, velocity * dt / safe_change)
+    dx = np.where(straight, scale, scale * np.sin(heading_change))
+    dy = np.where(straight, 0.0, scale * (1.0 - np.cos(heading_change)))
+    return dx, dy, heading_change
+
+def systematicResample(weights, random):
+    """Indices of the particles to keep, each particle is kept
+    about count * weight times"""
+    count = len(weights)
+    positions = (random.random() + np.arange(count)) / count
+    cumulative = np.cumsum(weights)
+    cumulative[-1] = 1.0
+    return np.searchsorted(cumulative, positions)
+
+class ParticleFilter:
+    """Particle set of poses in the map frame.
+'velocity_noise' and 'turn_noise' are the standard deviations of the
+velocity and the angular velocity relative to their magnitude, plus the
+absolute 'min_noise' so that the particles spread even when turning on
+the spot. 'hit_probability' is the probability that the sensor reads what
+the map predicts. The sensor is only used after the robot has moved
+'update_distance' meters or turned 'update_angle' radians, so that a robot
+standing still does not collapse the particles on a single reading."""
+    velocity_noise = 0.1
+    turn_noise = 0.1
+    min_noise = 0.005
+    hit_probability = 0.9
+    update_distance = 0.01
+    update_angle = 0.05
+    def __init__(self, world, count = 5000, sensor_offset = Vec2(0.05, 0), seed = None):
+        self.segments = lineSegmentArrays(world)
+        self.count = count
+        self.sensor_offset = sensor_offset
+        self.random = np.random.default_rng(seed)
+        self.x = np.zeros(count)
+        self.y = np.zeros(count)
+        self.heading = np.zeros(count)
+        self.weights = np.full(count, 1.0 / count)
+        self.moved_distance = 0.0
+        self.moved_angle = 0.0
+
+    def initialize(self, pose, position_spread = 0.05, heading_spread = 0.1):
+        """Spread the particles normally around the pose"""
+        self.x = self.random.normal(pose.x, position_spread, self.count)
+        self.y = self.random.normal(pose.y, position_spread, self.count)
+        self.heading = self.random.normal(pose.heading, heading_spread, self.count)
+        self.weights.fill(1.0 / self.count)
+
+    def initializeUniform(self, x_range, y_range):
+        """Spread the particles evenly over the area, with any heading"""
+        self.x = self.random.uniform(x_range[0], x_range[1], self.count)
+        self.y = self.random.uniform(y_range[0], y_range[1], self.count)
+        self.heading = self.random.uniform(-math.pi, math.pi, self.count)
+        self.weights.fill(1.0 / self.count)
+
+    def predict(self, movement, dt):
+        """Move the particles by the odometry 'movement', a Command, for dt seconds"""
+        if dt <= 0:
+            return
+        count = self.count
+        random = self.random
+        velocity = movement.velocity + random.normal(0.0,
+            abs(movement.velocity) * self.velocity_noise + self.min_noise, count)
+        angular_velocity = movement.angularVelocity + random.normal(0.0,
+            abs(movement.angularVelocity) * self.turn_noise + self.min_noise, count)
+        dx, dy, heading_change = integrateArrays(velocity, angular_velocity, dt)
+        cos_heading = np.cos(self.heading)
+        sin_heading = np.sin(self.heading)
+        self.x += cos_heading * dx - sin_heading * dy
+        self.y += sin_heading * dx + cos_heading * dy
+        self.heading += heading_change
+        self.moved_distance += abs(movement.velocity) * dt
+        self.moved_angle += abs(movement.angularVelocity) * dt
+
+    def predicted_readings(self):
+        """Whether the line sensor of each particle would see a line"""
+        offset = self.sensor_offset
+        cos_heading = np.cos(self.heading)
+        sin_heading = np.sin(self.heading)
+        return isOnLineArray(self.segments,
+            self.x + cos_heading * offset.x - sin_heading * offset.y,
+            self.y + sin_heading * offset.x + cos_heading * offset.y)
+
+    def correct(self, line_sensor):
+        """Weight the particles by the line sensor reading,
+        returns False if the robot has not moved enough since the last one"""
+        if self.moved_distance < self.update_distance and self.moved_angle < self.update_angle:
+            return False
+        self.moved_distance = 0.0
+        self.moved_angle = 0.0
+        agrees = self.predicted_readings() == bool(line_sensor)
+        self.weights *= np.where(agrees, self.hit_probability, 1.0 - self.hit_probability)
+        total = self.weights.sum()
+        if total <= 0 or not np.isfinite(total):
+            self.weights.fill(1.0 / self.count)
+        else:
+            self.weights /= total
+        if self.effective_count() < self.count / 2:
+            self.resample()
+        return True
+
+    def effective_count(self):
+        return 1.0 / np.dot(self.weights, self.weights)
+
+    def resample(self):
+        indices = systematicResample(self.weights, self.random)
+        self.x = self.x[indices]
+        self.y = self.y[indices]
+        self.heading = self.heading[indices]
+        self.weights.fill(1.0 / self.count)
+
+    def estimate(self):
+        """Weighted mean pose of the particles"""
+        weights = self.weights
+        heading = math.atan2(np.dot(weights, np.sin(self.heading)),
+            np.dot(weights, np.cos(self.heading)))
+        return Transform(heading, Vec2(float(np.dot(weights, self.x)), float(np.dot(weights, self.y))))
+
+class Localize:
+    """Task that runs the particle filter on the odometry movement and the
+line sensor of the robot and writes the estimate to 'localized_pose'"""
+    def __init__(self, robot, particle_filter, output = None, clock = time.time):
+        self.robot = robot
+        self.filter = particle_filter
+        self.output = output or robot
+        self.clock = clock
+    def start(self):
+        self.last_time = self.clock()
+    def update(self):
+        now = self.clock()
+        self.filter.predict(self.robot.movement, now - self.last_time)
+        self.last_time = now
+        self.filter.correct(self.robot.line_sensor)
+        self.output.localized_pose = self.filter.estimate()
+        return State.Running
@@ -0,0 +1,51 @@
+import math
+import numpy as np
+import pytest
+
+from roboutils.localization import ParticleFilter, isOnLineArray, lineSegmentArrays, \
+    integrateArrays, systematicResample
+from roboutils.utils import kinematics as kine, Transform, Vec2
+from roboutils.worldsimulator import World, Line
+
+
+def makeWorld():
+    return World([Line([Vec2(-0.7, 0), Vec2(0,0), Vec2(0.0, 0.7), Vec2(0.7, 0.7)], 0.10)])
+
+def test_line_check_matches_world():
+    world = makeWorld()
+    rng = np.random.default_rng(1)
+    x = rng.uniform(-1, 1, 500)
+    y = rng.uniform(-1, 1, 500)
+    on_line = isOnLineArray(lineSegmentArrays(world), x, y)
+    assert on_line.tolist() == [world.isOnLine(Vec2(a, b)) for a, b in zip(x, y)]
+
+@pytest.mark.parametrize("command", [
+    kine.Command(0.2, 0.0), kine.Command(0.2, 1.5), kine.Command(0.0, -1.0)])
+def test_integrate_matches_command(command):
+    dx, dy, heading = integrateArrays(np.array([command.velocity]),
+        np.array([command.angularVelocity]), 0.3)
+    expected = command.integrate(0.3)
+    assert dx[0] == pytest.approx(expected.x, abs = 1e-9)
+    assert dy[0] == pytest.approx(expected.y, abs = 1e-9)
+    assert heading[0] == pytest.approx(expected.heading, abs = 1e-9)
+
+def test_systematic_resample_follows_weights():
+    rng = np.random.default_rng(2)
+    indices = systematicResample(np.array([0.5, 0.0, 0.25, 0.25]), rng)
+    assert sorted(np.bincount(indices, minlength = 4).tolist()) == [0, 1, 1, 2]
+    assert np.bincount(indices, minlength = 4)[1] == 0
+
+def test_tracks_robot_along_the_line():
+    world = makeWorld()
+    particles = ParticleFilter(world, count = 2000, seed = 3)
+    true_pose = Transform(0.0, Vec2(-0.6, 0.0))
+    particles.initialize(Transform(0.0, Vec2(-0.6, 0.03)), 0.05, 0.05)
+    command = kine.Command(0.2, 0.0)
+    for _ in range(20):
+        true_pose = kine.predictPose(true_pose, command, 0.1)
+        particles.predict(command, 0.1)
+        particles.correct(world.isOnLine(true_pose.applyTo(Vec2(0.05, 0))))
+    estimate = particles.estimate()
+    assert estimate.x == pytest.approx(true_pose.x, abs = 0.05)
+    assert estimate.y == pytest.approx(true_pose.y, abs = 0.05)
+    assert estimate.heading == pytest.approx(true_pose.heading, abs = 0.1)
@@ -0,0 +1,193 @@
+"""Occupancy map of the walls the robot has bumped into
+
+The map is a sparse grid of square tiles that are allocated when first
+written to. Each cell holds the log-odds of being occupied as a signed
+byte: a bumper contact raises the cell it was at, driving over a cell
+lowers it. When a new tile is needed and there are 'max_tiles' tiles
+already, the least recently used tile without walls is dropped first. If
+all of them hold walls, a contact drops the least recently used tile and
+driving over an unseen cell is not mapped, so memory stays bounded on long
+exploration runs.
+"""
+import math
+from array import array
+from collections import OrderedDict
+
+from .behavior import State, condition
+from .utils import Vec2
+
+MIN_LOG_ODDS = -127
+MAX_LOG_ODDS = 127
+
+class Tile:
+    __slots__ = ("cells", "occupied")
+    def __init__(self, size):
+        self.cells = array("b", bytes(size * size))
+        # Number of cells above the occupied threshold
+        self.occupied = 0
+
+class OccupancyMap:
+    """Sparse tiled occupancy grid with cells of 'resolution' meters.
+A single contact makes a cell occupied, it takes a few passes over it
+to clear it again."""
+    hit_log_odds = 60
+    free_log_odds = -8
+    occupied_threshold = 50
+    def __init__(self, resolution = 0.02, tile_size = 32, max_tiles = 4096):
+        self.resolution = resolution
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+
+    def cell(self, point):
+        """Indices of the cell containing the point"""
+        return (int(math.floor(point.x / self.resolution)),
+            int(math.floor(point.y / self.resolution)))
+
+    def cell_center(self, cx, cy):
+        return Vec2((cx + 0.5) * self.resolution, (cy + 0.5) * self.resolution)
+
+    def get(self, cx, cy):
+        """Log-odds of the cell, 0 if it has not been observed"""
+        size = self.tile_size
+        key = (cx // size, cy // size)
+        tile = self.tiles.get(key)
+        if tile is None:
+            return 0
+        self.tiles.move_to_end(key)
+        return tile.cells[(cy % size) * size + cx % size]
+
+    def add(self, cx, cy, log_odds):
+        size = self.tile_size
+        key = (cx // size, cy // size)
+        tile = self.tiles.get(key)
+        if tile is None:
+            if len(self.tiles) >= self.max_tiles and not self.evict(spare_walls = log_odds <= 0):
+                return
+            tile = Tile(size)
+            self.tiles[key] = tile
+        else:
+            self.tiles.move_to_end(key)
+        index = (cy % size) * size + cx % size
+        old = tile.cells[index]
+        new = min(max(old + log_odds, MIN_LOG_ODDS), MAX_LOG_ODDS)
+        tile.cells[index] = new
+        threshold = self.occupied_threshold
+        tile.occupied += (new > threshold) - (old > threshold)
+
+    def evict(self, spare_walls = False):
+        """Drop the least recently used tile, sparing the ones with walls.
+        Returns False if every tile holds walls and 'spare_walls' is set"""
+        for key, tile in self.tiles.items():
+            if tile.occupied == 0:
+                del self.tiles[key]
+                return True
+        if spare_walls:
+            return False
+        self.tiles.popitem(last = False)
+        return True
+
+    def mark_occupied(self, point):
+        self.add(*self.cell(point), self.hit_log_odds)
+
+    def mark_free(self, point):
+        self.add(*self.cell(point), self.free_log_odds)
+
+    def mark_free_line(self, begin, end):
+        """Lower every cell on the straight line from 'begin' to 'end',
+        except the last one, which is lowered by the next line"""
+        x0, y0 = self.cell(begin)
+        x1, y1 = self.cell(end)
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        step_x = 1 if x0 < x1 else -1
+        step_y = 1 if y0 < y1 else -1
+        error = dx + dy
+        while (x0, y0) != (x1, y1):
+            self.add(x0, y0, self.free_log_odds)
+            double_error = 2 * error
+            if double_error >= dy:
+                error += dy
+                x0 += step_x
+            if double_error <= dx:
+                error += dx
+                y0 += step_y
+
+    def is_occupied(self, point):
+        return self.get(*self.cell(point)) > self.occupied_threshold
+
+    def nearest_obstacle(self, point, max_distance):
+        """Center of the nearest occupied cell within 'max_distance' of the
+        point, returns (distance, Vec2) or None.
+        Only the tiles in reach that hold occupied cells are searched."""
+        size = self.tile_size
+        resolution = self.resolution
+        threshold = self.occupied_threshold
+        min_cx = int(math.floor((point.x - max_distance) / resolution))
+        max_cx = int(math.floor((point.x + max_distance) / resolution))
+        min_cy = int(math.floor((point.y - max_distance) / resolution))
+        max_cy = int(math.floor((point.y + max_distance) / resolution))
+        best_sq = max_distance * max_distance
+        best = None
+        px = point.x / resolution - 0.5
+        py = point.y / resolution - 0.5
+        for tx in range(min_cx // size, max_cx // size + 1):
+            for ty in range(min_cy // size, max_cy // size + 1):
+                tile = self.tiles.get((tx, ty))
+                if tile is None or tile.occupied == 0:
+                    continue
+                self.tiles.move_to_end((tx, ty))
+                # Only the cells of the tile within the reach are scanned
+                base_x = tx * size
+                base_y = ty * size
+                cells = tile.cells
+                x_range = range(max(min_cx, base_x), min(max_cx, base_x + size - 1) + 1)
+                for cy in range(max(min_cy, base_y), min(max_cy, base_y + size - 1) + 1):
+                    row = (cy - base_y) * size - base_x
+                    dy_sq = (cy - py) ** 2
+                    for cx in x_range:
+                        if cells[row + cx] > threshold:
+                            distance_sq = ((cx - px) ** 2 + dy_sq) * resolution * resolution
+                            if distance_sq <= best_sq:
+                                best_sq = distance_sq
+                                best = (cx, cy)
+        if best is None:
+            return None
+        return math.sqrt(best_sq), self.cell_center(*best)
+
+class MapBumperContacts:
+    """Task that maps the bumper contacts and the driven path of the robot.
+The bumpers are at 'left_bumper' and 'right_bumper' in the robot frame,
+a contact is mapped when the bumper gets hit."""
+    def __init__(self, robot, occupancy_map, left_bumper = Vec2(0.1, 0.05),
+            right_bumper = Vec2(0.1, -0.05), pose_field = "pose"):
+        self.robot = robot
+        self.map = occupancy_map
+        self.left_bumper = left_bumper
+        self.right_bumper = right_bumper
+        self.pose_field = pose_field
+    def start(self):
+        self.last_position = None
+        self.left_was_hit = False
+        self.right_was_hit = False
+    def update(self):
+        robot = self.robot
+        pose = getattr(robot, self.pose_field)
+        position = pose.offset
+        if self.last_position is not None:
+            self.map.mark_free_line(self.last_position, position)
+        self.last_position = position
+        if robot.left_bumper_hit and not self.left_was_hit:
+            self.map.mark_occupied(pose.applyTo(self.left_bumper))
+        if robot.right_bumper_hit and not self.right_was_hit:
+            self.map.mark_occupied(pose.applyTo(self.right_bumper))
+        self.left_was_hit = robot.left_bumper_hit
+        self.right_was_hit = robot.right_bumper_hit
+        return State.Running
+
+@condition
+def IsNearKnownWall(robot, occupancy_map, distance = 0.15, pose_field = "pose"):
+    """True if a mapped wall is within 'distance' in front of the robot"""
+    pose = getattr(robot, pose_field)
+    nearest = occupancy_map.nearest_obstacle(pose.offset, distance)
+    return nearest is not None and pose.inverse().applyTo(nearest[1]).x > 0
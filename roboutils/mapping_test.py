@@ -0,0 +1,76 @@
+import pytest
+
+from roboutils import hal
+from roboutils.behavior import State
+from roboutils.mapping import OccupancyMap, MapBumperContacts, IsNearKnownWall
+from roboutils.utils import kinematics as kine, Transform, Vec2
+
+
+def test_contacts_raise_and_driving_lowers_occupancy():
+    grid = OccupancyMap(resolution = 0.1, tile_size = 4)
+    grid.mark_occupied(Vec2(0.25, -0.35))
+    assert grid.is_occupied(Vec2(0.21, -0.31))
+    assert grid.get(2, -4) == OccupancyMap.hit_log_odds
+    grid.mark_free_line(Vec2(0.05, -0.35), Vec2(0.55, -0.35))
+    assert grid.get(2, -4) == OccupancyMap.hit_log_odds + OccupancyMap.free_log_odds
+    assert grid.get(5, -4) == 0
+    assert grid.get(9, 9) == 0
+
+def test_log_odds_saturate():
+    grid = OccupancyMap()
+    for _ in range(10):
+        grid.mark_occupied(Vec2(0, 0))
+    assert grid.get(0, 0) == 127
+
+def test_nearest_obstacle_across_tiles():
+    grid = OccupancyMap(resolution = 0.1, tile_size = 4)
+    grid.mark_occupied(Vec2(1.05, 0.05))
+    grid.mark_occupied(Vec2(-0.55, 0.05))
+    distance, point = grid.nearest_obstacle(Vec2(0.05, 0.05), 2.0)
+    assert distance == pytest.approx(0.6)
+    assert (point.x, point.y) == pytest.approx((-0.55, 0.05))
+    assert grid.nearest_obstacle(Vec2(0.05, 0.05), 0.5) is None
+
+def test_tiles_are_bounded():
+    grid = OccupancyMap(resolution = 0.1, tile_size = 4, max_tiles = 3)
+    for i in range(10):
+        grid.mark_free(Vec2(i * 1.0, 0.0))
+    assert len(grid.tiles) == 3
+
+def test_tiles_with_walls_outlive_empty_ones():
+    grid = OccupancyMap(resolution = 0.1, tile_size = 4, max_tiles = 3)
+    grid.mark_occupied(Vec2(0.05, 0.05))
+    for i in range(1, 10):
+        grid.mark_free(Vec2(i * 1.0, 0.0))
+    assert len(grid.tiles) == 3
+    assert grid.is_occupied(Vec2(0.05, 0.05))
+
+def test_new_walls_are_mapped_when_every_tile_holds_walls():
+    grid = OccupancyMap(resolution = 0.1, tile_size = 4, max_tiles = 3)
+    for i in range(3):
+        grid.mark_occupied(Vec2(i * 1.0 + 0.05, 0.05))
+    grid.mark_free(Vec2(5.05, 0.05))
+    assert len(grid.tiles) == 3
+    assert grid.is_occupied(Vec2(0.05, 0.05))
+    grid.mark_occupied(Vec2(10.05, 0.05))
+    assert len(grid.tiles) == 3
+    assert grid.is_occupied(Vec2(10.05, 0.05))
+    # The check above made the first wall the most recently used one
+    assert grid.is_occupied(Vec2(0.05, 0.05))
+    assert not grid.is_occupied(Vec2(1.05, 0.05))
+
+def test_maps_bumper_hits_along_the_path():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    grid = OccupancyMap(resolution = 0.02)
+    mapper = MapBumperContacts(robot, grid)
+    mapper.start()
+    for i in range(10):
+        robot.pose = Transform(0.0, Vec2(i * 0.05, 0.0))
+        robot.left_bumper_hit = i >= 8
+        mapper.update()
+    assert grid.get(*grid.cell(Vec2(0.2, 0.0))) < 0
+    assert grid.get(*grid.cell(Vec2(0.5, 0.05))) == OccupancyMap.hit_log_odds
+    # The single contact is a wall
+    assert IsNearKnownWall(robot, grid).update() == State.Success
+    robot.pose = Transform(3.14, Vec2(0.4, 0.0))
+    assert IsNearKnownWall(robot, grid).update() == State.Failure
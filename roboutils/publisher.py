@@ -0,0 +1,171 @@
+"""Telemetry fan-out to many observers of one robot
+
+Observers subscribe by sending a message with SUBSCRIBE_KEY listing topic
+names, and/or FIELDS_KEY listing field names, and optionally INTERVAL_KEY
+for the shortest time between two packets. The subscription has to be
+repeated (see Subscribe) or it expires after subscriber_timeout seconds.
+The topics and fields of a subscriber are merged into one packet per
+publish, as the receiving end keeps only the newest packet of a burst.
+Each distinct set of fields is encoded once per publish and the same
+packet is sent to every subscriber that is due for it.
+The publisher is standalone, the point to point links of test_robot.py and
+simulator_gui.py do not use it. A script that wants any number of
+observers, e.g. loggers and dashboards, adds Publish(state, publisher) to
+its tree.
+"""
+import socket
+import time
+
+from .behavior import State, task
+from .remote import RemoteEndpoint, SENSOR_SCHEMA, COMMAND_SCHEMA, RECEIVED, SENT
+
+SUBSCRIBE_KEY = "_subscribe"
+FIELDS_KEY = "_fields"
+INTERVAL_KEY = "_interval"
+UNSUBSCRIBE_KEY = "_unsubscribe"
+
+DEFAULT_TOPICS = {
+    "sensors": SENSOR_SCHEMA.fields,
+    "command": COMMAND_SCHEMA.fields}
+
+def isNameList(names):
+    return isinstance(names, (list, tuple)) and all(isinstance(name, str) for name in names)
+
+def validInterval(interval):
+    """The requested interval, or 0.0 if it is not a non-negative number"""
+    if isinstance(interval, bool) or not isinstance(interval, (int, float)):
+        return 0.0
+    if not interval >= 0.0: # Also false for NaN
+        return 0.0
+    return float(interval)
+
+class Subscriber:
+    __slots__ = ("address", "fields", "interval", "last_seen", "next_send")
+    def __init__(self, address):
+        self.address = address
+        self.fields = None
+        self.interval = 0.0
+        self.last_seen = 0.0
+        self.next_send = 0.0
+
+class TelemetryPublisher(RemoteEndpoint):
+    """Publishes the state of the robot to all its subscribers from one socket"""
+    subscriber_timeout = 5.0
+    buffer_size = 1024
+    def __init__(self, port, topics = DEFAULT_TOPICS, schemas = (), recorder = None,
+            clock = time.time):
+        super().__init__(None, schemas, recorder)
+        self.topics = topics
+        self.clock = clock
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("", port))
+        self.sock.setblocking(0)
+        self.buffer = memoryview(bytearray(self.buffer_size))
+        self.subscribers = {}
+        # fields -> subscribers of exactly those fields, in this order
+        self.groups = {}
+    def poll(self):
+        """Handle the waiting subscription requests and expire stale subscribers"""
+        now = self.clock()
+        buffer = self.buffer
+        try:
+            while True:
+                size, client = self.sock.recvfrom_into(buffer)
+                if self.recorder is not None:
+                    self.recorder.record(RECEIVED, buffer[:size])
+                header = self.decoder.peek(buffer, size)
+                if header is not None:
+                    self.handle(self.decoder.decode(buffer, header[1], size, header[2]), client, now)
+        except BlockingIOError:
+            pass
+        for address, subscriber in list(self.subscribers.items()):
+            if now - subscriber.last_seen > self.subscriber_timeout:
+                self.unsubscribe(address)
+    def handle(self, message, client, now):
+        if not isinstance(message, dict):
+            return
+        if message.get(UNSUBSCRIBE_KEY):
+            self.unsubscribe(client)
+            return
+        if SUBSCRIBE_KEY not in message and FIELDS_KEY not in message:
+            return
+        topics = message.get(SUBSCRIBE_KEY, ())
+        fields = message.get(FIELDS_KEY, ())
+        if not isNameList(topics) or not isNameList(fields):
+            return
+        field_sets = [self.topics[name] for name in topics if name in self.topics]
+        if fields:
+            field_sets.append(tuple(fields))
+        self.subscribe(client, field_sets, validInterval(message.get(INTERVAL_KEY)), now)
+    def subscribe(self, address, field_sets, interval = 0.0, now = None):
+        subscriber = self.subscribers.get(address)
+        if subscriber is None:
+            subscriber = Subscriber(address)
+            self.subscribers[address] = subscriber
+        fields = tuple(dict.fromkeys(name for names in field_sets for name in names))
+        if fields != subscriber.fields:
+            self.leave_group(subscriber)
+            subscriber.fields = fields
+            if fields:
+                self.groups.setdefault(fields, []).append(subscriber)
+        subscriber.interval = interval
+        subscriber.last_seen = self.clock() if now is None else now
+    def unsubscribe(self, address):
+        subscriber = self.subscribers.pop(address, None)
+        if subscriber is not None:
+            self.leave_group(subscriber)
+    def leave_group(self, subscriber):
+        group = self.groups.get(subscriber.fields)
+        if group is not None:
+            group.remove(subscriber)
+            if not group:
+                del self.groups[subscriber.fields]
+        subscriber.fields = None
+        subscriber.next_send = 0.0
+    def publish(self, state):
+        """Send the subscribed fields of 'state' to the subscribers that are due"""
+        now = self.clock()
+        for fields, group in self.groups.items():
+            data = None
+            for subscriber in group:
+                if subscriber.next_send > now:
+                    continue
+                if data is None:
+                    schema = self.schemas_by_fields.get(fields)
+                    if schema is not None:
+                        data = self.encode_schema(schema, state)
+                    else:
+                        data = self.encode({k: state.get(k, None) for k in fields})
+                    if self.recorder is not None:
+                        self.recorder.record(SENT, data)
+                subscriber.next_send = now + subscriber.interval
+                self.sock.sendto(data, subscriber.address)
+    def send_packet(self, data):
+        for subscriber in self.subscribers.values():
+            self.sock.sendto(data, subscriber.address)
+    def close(self):
+        self.sock.close()
+
+@task
+def Publish(state, publisher):
+    publisher.poll()
+    publisher.publish(state)
+    return False #Never complete
+
+class Subscribe:
+    """Task that keeps a subscription of 'socket' to the publisher at its
+remote_address alive by repeating it every 'refresh' seconds"""
+    def __init__(self, socket, topics = (), fields = (), interval = 0.0, refresh = 1.0):
+        self.socket = socket
+        self.message = {SUBSCRIBE_KEY: list(topics), INTERVAL_KEY: interval}
+        if fields:
+            self.message[FIELDS_KEY] = list(fields)
+        self.refresh = refresh
+    def start(self):
+        self.last_sent = None
+    def update(self):
+        now = time.time()
+        if self.last_sent is None or now - self.last_sent >= self.refresh:
+            self.last_sent = now
+            self.socket.send(self.message)
+        return State.Running
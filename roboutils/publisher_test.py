@@ -0,0 +1,110 @@
+import time
+
+from roboutils import remote
+from roboutils.publisher import TelemetryPublisher, SUBSCRIBE_KEY, FIELDS_KEY, INTERVAL_KEY
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+    def sendto(self, data, address):
+        self.sent.append(address)
+    def recvfrom_into(self, buffer):
+        raise BlockingIOError()
+    def close(self):
+        pass
+
+sensors = {
+    "left_bumper_hit": False,
+    "right_bumper_hit": True,
+    "travelled_distance": 2.0,
+    "heading_rad": 0.5,
+    "line_sensor": False,
+    "velocity_command": 0.1,
+    "turn_command": 0.0}
+
+def make_subscriber(publisher):
+    sock = remote.RemoteControlSocket(port = 0, schemas = (remote.SENSOR_SCHEMA,),
+        remote_address = ("127.0.0.1", publisher.sock.getsockname()[1]))
+    return sock
+
+def test_every_subscriber_gets_its_fields():
+    clock = Clock()
+    publisher = TelemetryPublisher(0, schemas = (remote.SENSOR_SCHEMA,), clock = clock)
+    gui = make_subscriber(publisher)
+    console = make_subscriber(publisher)
+    gui.send({SUBSCRIBE_KEY: ["sensors"]})
+    console.send({SUBSCRIBE_KEY: [], FIELDS_KEY: ["velocity_command"]})
+    time.sleep(0.05)
+    publisher.poll()
+    assert len(publisher.subscribers) == 2
+    publisher.publish(sensors)
+    time.sleep(0.05)
+    assert gui.receive() == {name: sensors[name] for name in remote.SENSOR_SCHEMA.fields}
+    assert console.receive() == {"velocity_command": 0.1}
+    for sock in (publisher, gui, console):
+        sock.sock.close()
+
+def test_topics_of_a_subscriber_arrive_in_one_packet():
+    publisher = TelemetryPublisher(0, schemas = (remote.SENSOR_SCHEMA,))
+    client = make_subscriber(publisher)
+    client.send({SUBSCRIBE_KEY: ["sensors", "command"], FIELDS_KEY: ["line_sensor"]})
+    time.sleep(0.05)
+    publisher.poll()
+    for _ in range(5):
+        publisher.publish(sensors)
+    time.sleep(0.05)
+    result = client.drain()
+    assert result.received == 5
+    assert result.message == sensors
+    for sock in (publisher, client):
+        sock.sock.close()
+
+def test_rate_limit_and_expiry():
+    clock = Clock()
+    publisher = TelemetryPublisher(0, clock = clock)
+    publisher.sock.close()
+    publisher.sock = FakeSocket()
+    sent = publisher.sock.sent
+    publisher.subscribe(("a", 1), [("line_sensor",)], interval = 1.0)
+    publisher.subscribe(("b", 1), [("line_sensor",)])
+    publisher.publish(sensors)
+    clock.now = 0.5
+    publisher.publish(sensors)
+    assert sent == [("a", 1), ("b", 1), ("b", 1)]
+    assert publisher.tx_seq_no == 2
+    clock.now = 10.0
+    publisher.poll()
+    assert publisher.subscribers == {}
+    assert publisher.groups == {}
+    publisher.close()
+
+def test_invalid_interval_is_ignored():
+    clock = Clock()
+    publisher = TelemetryPublisher(0, clock = clock)
+    publisher.sock.close()
+    publisher.sock = FakeSocket()
+    for i, interval in enumerate((None, "1", -1.0, float("nan"), True)):
+        publisher.handle({FIELDS_KEY: ["line_sensor"], INTERVAL_KEY: interval}, ("a", i), 0.0)
+    publisher.handle({FIELDS_KEY: ["line_sensor"], INTERVAL_KEY: 2}, ("b", 1), 0.0)
+    assert [s.interval for s in publisher.subscribers.values()] == [0.0] * 5 + [2.0]
+    publisher.publish(sensors)
+    assert len(publisher.sock.sent) == 6
+    publisher.close()
+
+def test_malformed_subscriptions_are_ignored():
+    publisher = TelemetryPublisher(0)
+    publisher.sock.close()
+    publisher.sock = FakeSocket()
+    for i, message in enumerate(({SUBSCRIBE_KEY: 5}, {FIELDS_KEY: 5},
+            {FIELDS_KEY: [["line_sensor"]]}, {SUBSCRIBE_KEY: [{}]}, {FIELDS_KEY: "line_sensor"})):
+        publisher.handle(message, ("a", i), 0.0)
+    assert publisher.subscribers == {}
+    assert publisher.groups == {}
+    publisher.close()
@@ -0,0 +1,183 @@
+"""Recording of the packets of a RemoteControlSocket and their replay
+
+The log is a header followed by records of a timestamp, a direction,
+the length of the packet and the packet itself. Records are appended
+through a buffered file without syncing, a crash can lose the tail of
+the log but never corrupt what was written before.
+
+    python -m roboutils.recorder robot.log
+    python -m roboutils.recorder robot.log --to localhost:8001 --speed 4
+"""
+import argparse
+import mmap
+import os
+import socket
+import struct
+import time
+
+from .remote import RemoteEndpoint, RECEIVED, SENT
+
+MAGIC = b"RBLOG\x00\x01\x00"
+RECORD = struct.Struct("<dBH")
+
+class TelemetryRecorder:
+    """Appends timestamped packets to a binary log.
+Set as the 'recorder' of a RemoteControlSocket to log what it sends and receives"""
+    def __init__(self, path, buffer_size = 1 << 16, clock = time.time):
+        self.file = open(path, "ab", buffering = buffer_size)
+        self.clock = clock
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+    def record(self, direction, data):
+        self.file.write(RECORD.pack(self.clock(), direction, len(data)))
+        self.file.write(data)
+    def flush(self):
+        self.file.flush()
+    def close(self):
+        self.file.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TelemetryLog:
+    """Memory mapped log written by a TelemetryRecorder.
+Iterating gives (timestamp, direction, packet) tuples, the packets are
+memoryviews into the map, copy them with bytes() to keep them after
+close(). A record cut short at the end is ignored.
+close() raises BufferError while packets of the log are still referenced,
+the log stays open and can be closed once they are released."""
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size < len(MAGIC):
+            self.file.close()
+            raise ValueError("%s is too short to be a telemetry log, "
+                "it is empty or its recorder has not been flushed" % path)
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("%s is not a telemetry log" % path)
+        self.view = memoryview(self.map)
+    def __iter__(self):
+        view = self.view
+        offset = len(MAGIC)
+        end = len(view)
+        while offset + RECORD.size <= end:
+            timestamp, direction, size = RECORD.unpack_from(view, offset)
+            offset += RECORD.size
+            if offset + size > end:
+                break
+            yield (timestamp, direction, view[offset:offset + size])
+            offset += size
+    def packets(self, direction = RECEIVED):
+        for timestamp, packet_direction, packet in self:
+            if packet_direction == direction:
+                yield (timestamp, packet)
+    def close(self):
+        if hasattr(self, "view"):
+            self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            raise BufferError("Packets of the telemetry log are still referenced, "
+                "release them or copy them with bytes() before closing it") from None
+        self.file.close()
+
+class ReplaySocket(RemoteEndpoint):
+    """Stands in for a RemoteControlSocket, e.g. in UDPReceive, and plays back
+the received packets of a TelemetryLog with the usual sequence number rules.
+With 'speed' the packets are released at that multiple of the recorded
+pace, with speed None every call to receive() takes the next packet,
+which runs the tree as fast as possible. Sent messages are dropped."""
+    client = ("replay", 0)
+    def __init__(self, log, speed = 1.0, direction = RECEIVED, schemas = (), clock = time.time):
+        super().__init__(None, schemas)
+        self.packets = log.packets(direction)
+        self.speed = speed
+        self.clock = clock
+        self.next_packet = next(self.packets, None)
+        self.start_time = None
+    @property
+    def finished(self):
+        return self.next_packet is None
+    def due(self):
+        """Packets to release by now"""
+        if self.next_packet is None:
+            return []
+        if self.speed is None:
+            packet = self.next_packet
+            self.next_packet = next(self.packets, None)
+            return [packet[1]]
+        now = self.clock()
+        if self.start_time is None:
+            self.start_time = now
+            self.log_start_time = self.next_packet[0]
+        log_now = self.log_start_time + (now - self.start_time) * self.speed
+        packets = []
+        while self.next_packet is not None and self.next_packet[0] <= log_now:
+            packets.append(self.next_packet[1])
+            self.next_packet = next(self.packets, None)
+        return packets
+    def accepted(self):
+        for packet in self.due():
+            header = self.decoder.peek(packet, len(packet))
+            if header is not None and self.accept(header[0], self.client, len(packet)):
+                yield packet, header
+    def receive_all(self):
+        return [self.decode(packet, header[1], len(packet), header[2])
+            for packet, header in self.accepted()]
+    def receive(self):
+        last = None
+        for last in self.accepted():
+            pass
+        if last is None:
+            return {}
+        packet, header = last
+        return self.decode(packet, header[1], len(packet), header[2])
+    def send_packet(self, data):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description = "Summarize or replay a telemetry log")
+    parser.add_argument("log")
+    parser.add_argument("--to", help = "send the received packets to host:port")
+    parser.add_argument("--speed", type = float, default = 1.0,
+        help = "multiple of the recorded pace, 0 for as fast as possible")
+    parser.add_argument("--sent", action = "store_true",
+        help = "replay the sent packets instead of the received ones")
+    args = parser.parse_args()
+    log = TelemetryLog(args.log)
+    if args.to is None:
+        counts = [0, 0]
+        sizes = [0, 0]
+        first = None
+        last = None
+        for timestamp, direction, packet in log:
+            counts[direction] += 1
+            sizes[direction] += len(packet)
+            first = timestamp if first is None else first
+            last = timestamp
+            del packet
+        duration = (last - first) if first is not None else 0.0
+        print("%.1f s, received %d packets (%d bytes), sent %d packets (%d bytes)"
+            % (duration, counts[RECEIVED], sizes[RECEIVED], counts[SENT], sizes[SENT]))
+    else:
+        host, port = args.to.rsplit(":", 1)
+        address = (host, int(port))
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        start_time = time.time()
+        log_start_time = None
+        for timestamp, packet in log.packets(SENT if args.sent else RECEIVED):
+            if log_start_time is None:
+                log_start_time = timestamp
+            if args.speed > 0:
+                delay = (timestamp - log_start_time) / args.speed - (time.time() - start_time)
+                if delay > 0:
+                    time.sleep(delay)
+            sock.sendto(packet, address)
+            del packet
+        sock.close()
+    log.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from roboutils import remote
+from roboutils.recorder import TelemetryRecorder, TelemetryLog, ReplaySocket, RECEIVED, SENT
+
+
+def record_session(path):
+    sender = remote.RemoteControlSocket(port = 0)
+    receiver = remote.RemoteControlSocket(port = 0, recorder = TelemetryRecorder(path))
+    sender.remote_address = ("127.0.0.1", receiver.sock.getsockname()[1])
+    for i in range(5):
+        sender.send({"value": i})
+    time.sleep(0.05)
+    assert receiver.receive() == {"value": 4}
+    receiver.send({"reply": True})
+    receiver.recorder.close()
+    sender.sock.close()
+    receiver.sock.close()
+
+def test_recorded_packets_are_read_back(tmp_path):
+    path = str(tmp_path / "session.log")
+    record_session(path)
+    log = TelemetryLog(path)
+    directions = [direction for _, direction, _ in log]
+    assert directions == [RECEIVED] * 5 + [SENT]
+    log.close()
+
+def test_replay_as_fast_as_possible(tmp_path):
+    path = str(tmp_path / "session.log")
+    record_session(path)
+    log = TelemetryLog(path)
+    replay = ReplaySocket(log, speed = None)
+    messages = []
+    while not replay.finished:
+        messages.append(replay.receive())
+    assert messages == [{"value": i} for i in range(5)]
+    assert replay.receive() == {}
+    log.close()
+
+def test_replay_follows_recorded_pace(tmp_path):
+    path = str(tmp_path / "paced.log")
+    now = [0.0]
+    recorder = TelemetryRecorder(path, clock = lambda: now[0])
+    endpoint = remote.RemoteEndpoint()
+    for i in range(4):
+        now[0] = i * 1.0
+        recorder.record(RECEIVED, endpoint.encode({"value": i}))
+    recorder.close()
+    log = TelemetryLog(path)
+    replay = ReplaySocket(log, speed = 2.0, clock = lambda: now[0])
+    now[0] = 100.0
+    assert replay.receive_all() == [{"value": 0}]
+    now[0] = 101.0
+    assert replay.receive_all() == [{"value": 1}, {"value": 2}]
+    now[0] = 110.0
+    assert replay.receive() == {"value": 3}
+    assert replay.finished
+    log.close()
+
+def test_truncated_record_is_ignored(tmp_path):
+    path = str(tmp_path / "cut.log")
+    recorder = TelemetryRecorder(path)
+    recorder.record(RECEIVED, b"abcd")
+    recorder.record(RECEIVED, b"efgh")
+    recorder.close()
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 2)
+    log = TelemetryLog(path)
+    assert [bytes(packet) for _, _, packet in log] == [b"abcd"]
+    log.close()
+
+def test_close_with_packets_alive(tmp_path):
+    path = str(tmp_path / "alive.log")
+    record_session(path)
+    log = TelemetryLog(path)
+    packets = [packet for _, _, packet in log]
+    with pytest.raises(BufferError, match = "still referenced"):
+        log.close()
+    assert len(packets[0]) > 0
+    del packets
+    log.close()
+
+def test_empty_log_is_reported(tmp_path):
+    path = str(tmp_path / "empty.log")
+    recorder = TelemetryRecorder(path)
+    with pytest.raises(ValueError, match = "flushed"):
+        TelemetryLog(path)
+    recorder.close()
+
+def test_command_line_summary_and_replay(tmp_path):
+    path = str(tmp_path / "session.log")
+    record_session(path)
+    summary = subprocess.run([sys.executable, "-m", "roboutils.recorder", path],
+        stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+    assert summary.returncode == 0, summary.stderr
+    assert b"received 5 packets" in summary.stdout
+    target = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target.bind(("127.0.0.1", 0))
+    target.settimeout(5)
+    replay = subprocess.run([sys.executable, "-m", "roboutils.recorder", path,
+        "--to", "127.0.0.1:%d" % target.getsockname()[1], "--speed", "0"],
+        stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+    assert replay.returncode == 0, replay.stderr
+    assert len([target.recv(1024) for _ in range(5)]) == 5
+    target.close()
+
+def test_protocol_records_received_packets(tmp_path):
+    path = str(tmp_path / "protocol.log")
+    state = {}
+    recorder = TelemetryRecorder(path)
+    protocol = remote.RemoteControlProtocol(state, recorder = recorder)
+    protocol.datagram_received(remote.RemoteEndpoint().encode({"value": 1}), ("127.0.0.1", 1))
+    recorder.close()
+    assert state == {"value": 1}
+    log = TelemetryLog(path)
+    assert [direction for _, direction, _ in log] == [RECEIVED]
+    log.close()
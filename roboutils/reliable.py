@@ -0,0 +1,85 @@
+"""Reliable delivery of discrete commands over the lossy remote stream
+
+Commands posted to a ReliableChannel ride along in the ordinary messages
+under RELIABLE_KEY until the other end acknowledges them under ACK_KEY.
+Each command is retransmitted on its own until it is acknowledged, and the
+receiving end delivers every command once and in the order they were
+posted, however many copies arrive.
+Set the channel as the 'reliable' of both endpoints of a link.
+"""
+import random
+import time
+from collections import OrderedDict
+
+RELIABLE_KEY = "_rel"
+ACK_KEY = "_ack"
+
+class ReliableChannel:
+    min_retransmit_time = 0.1
+    max_batch = 8
+    def __init__(self, clock = time.time):
+        self.clock = clock
+        # Commands from an earlier run of the sender must not be taken
+        # as duplicates, so every run has its own session
+        self.session = random.getrandbits(31)
+        self.next_id = 1
+        self.pending = OrderedDict()
+        self.acks = []
+        self.remote_session = None
+        self.delivered_below = 1
+        self.held = {}
+    def post(self, command):
+        """Queue a command, a dictionary of fields, for reliable delivery"""
+        self.pending[self.next_id] = [command, None]
+        self.next_id += 1
+    @property
+    def has_outgoing(self):
+        return bool(self.pending) or bool(self.acks)
+    def attach(self, message, rtt = None):
+        """The outgoing message with the due commands and the
+        acknowledgements added, the message itself is not modified"""
+        extra = {}
+        if self.acks:
+            extra[ACK_KEY] = self.acks
+            self.acks = []
+        if self.pending:
+            now = self.clock()
+            retransmit_time = self.min_retransmit_time
+            if rtt is not None:
+                retransmit_time = max(retransmit_time, 2.0 * rtt)
+            entries = []
+            for command_id, entry in self.pending.items():
+                if entry[1] is None or now - entry[1] >= retransmit_time:
+                    entry[1] = now
+                    entries.append([command_id, entry[0]])
+                    if len(entries) >= self.max_batch:
+                        break
+            if entries:
+                extra[RELIABLE_KEY] = [self.session, entries]
+        if not extra:
+            return message
+        extra.update(message)
+        return extra
+    def handle(self, message):
+        """Take the reliable parts out of a received message,
+        returns the new commands in the order they were posted"""
+        for command_id in message.pop(ACK_KEY, ()):
+            self.pending.pop(command_id, None)
+        reliable = message.pop(RELIABLE_KEY, None)
+        if reliable is None:
+            return []
+        session, entries = reliable
+        if session != self.remote_session:
+            self.remote_session = session
+            self.delivered_below = 1
+            self.held = {}
+        for command_id, command in entries:
+            self.acks.append(command_id)
+            if command_id >= self.delivered_below:
+                self.held[command_id] = command
+        # Commands after a missing one wait for it
+        commands = []
+        while self.delivered_below in self.held:
+            commands.append(self.held.pop(self.delivered_below))
+            self.delivered_below += 1
+        return commands
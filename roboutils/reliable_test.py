@@ -0,0 +1,54 @@
+import msgpack
+
+from roboutils.reliable import ReliableChannel, RELIABLE_KEY, ACK_KEY
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def transfer(message):
+    return msgpack.loads(msgpack.dumps(message, encoding = "UTF-8"), encoding = "UTF-8")
+
+def test_commands_are_delivered_once_in_order_despite_loss():
+    clock = Clock()
+    console = ReliableChannel(clock = clock)
+    robot = ReliableChannel(clock = clock)
+    console.post({"state": 2})
+    lost = console.attach({"velocity_command": 0.1})
+    assert lost[RELIABLE_KEY][1] == [[1, {"state": 2}]]
+    clock.now = 0.05
+    console.post({"state": 3})
+    first = transfer(console.attach({}))
+    assert robot.handle(first) == []
+    clock.now = 0.2
+    second = console.attach({})
+    assert robot.handle(transfer(second)) == [{"state": 2}, {"state": 3}]
+    assert robot.handle(transfer(second)) == []
+
+    ack = transfer(robot.attach({}))
+    assert sorted(ack[ACK_KEY]) == [1, 1, 2, 2, 2]
+    console.handle(ack)
+    assert not console.pending
+    clock.now = 1.0
+    assert console.attach({"velocity_command": 0.1}) == {"velocity_command": 0.1}
+
+def test_new_session_is_not_a_duplicate():
+    robot = ReliableChannel()
+    first = ReliableChannel()
+    first.post({"state": 1})
+    assert robot.handle(transfer(first.attach({}))) == [{"state": 1}]
+    restarted = ReliableChannel()
+    restarted.session = first.session + 1
+    restarted.post({"state": 4})
+    assert robot.handle(transfer(restarted.attach({}))) == [{"state": 4}]
+
+def test_attach_does_not_modify_message():
+    channel = ReliableChannel()
+    channel.post({"state": 1})
+    message = {"velocity_command": 0}
+    sent = channel.attach(message)
+    assert message == {"velocity_command": 0}
+    assert RELIABLE_KEY in sent
@@ -1,48 +1,457 @@
+import asyncio
 import socket
+import struct
 import time
+from collections import namedtuple
 import msgpack
 from .behavior import task
+from .hal import RobotInterface
+from .link_stats import LinkStats
+from . import tracing
 
-class RemoteControlSocket:
+_int_formats = {
+    0xcc: struct.Struct(">B"),
+    0xcd: struct.Struct(">H"),
+    0xce: struct.Struct(">I"),
+    0xcf: struct.Struct(">Q"),
+    0xd0: struct.Struct(">b"),
+    0xd1: struct.Struct(">h"),
+    0xd2: struct.Struct(">i"),
+    0xd3: struct.Struct(">q")}
+_array_formats = {
+    0xdc: struct.Struct(">H"),
+    0xdd: struct.Struct(">I")}
+
+def peekHeader(data, size):
+    """Read the sequence number of a [seq_no, message, ...] packet without
+    decoding the message. Returns (seq_no, message_offset, element_count)
+    or None if the packet is not one."""
+    if size < 2:
+        return None
+    kind = data[0]
+    if 0x90 <= kind <= 0x9f:
+        count = kind & 0x0f
+        offset = 1
+    elif kind in _array_formats:
+        fmt = _array_formats[kind]
+        if size < 1 + fmt.size:
+            return None
+        count = fmt.unpack_from(data, 1)[0]
+        offset = 1 + fmt.size
+    else:
+        return None
+    if count < 2 or offset >= size:
+        return None
+    kind = data[offset]
+    if kind <= 0x7f:
+        return (kind, offset + 1, count)
+    if kind >= 0xe0:
+        return (kind - 0x100, offset + 1, count)
+    fmt = _int_formats.get(kind)
+    if fmt is None or size < offset + 1 + fmt.size:
+        return None
+    return (fmt.unpack_from(data, offset + 1)[0], offset + 1 + fmt.size, count)
+
+SCHEMA_MARKER = 0xc1 # Never used by msgpack
+
+# Directions of recorded packets
+RECEIVED = 0
+SENT = 1
+
+_MISSING = object()
+
+class Schema:
+    """Fixed layout of fields agreed on by both ends of a link.
+'fields' is a sequence of (name, struct format character) pairs.
+Packets of a schema hold a header with the marker byte, the schema id and
+the sequence number followed by the packed values, no field names.
+Every field must have a value when packed, pack() raises KeyError for a
+missing field and ValueError for a None.
+A float field packed with 'f' is a float32 and keeps about 7 significant
+digits, e.g. a distance of 1000 m is rounded to 0.06 mm. Use 'd' for
+fields that need more, like timestamps."""
+    header = struct.Struct("<BBI")
+    def __init__(self, schema_id, fields):
+        self.schema_id = schema_id
+        self.fields = tuple(name for name, _ in fields)
+        self.values = struct.Struct("<" + "".join(fmt for _, fmt in fields))
+        self.packet = struct.Struct(self.header.format + self.values.format[1:])
+    def pack(self, seq_no, state):
+        values = [state.get(name, _MISSING) for name in self.fields]
+        for name, value in zip(self.fields, values):
+            if value is _MISSING:
+                raise KeyError("Field %r of schema %d is missing" % (name, self.schema_id))
+            if value is None:
+                raise ValueError("Field %r of schema %d is None" % (name, self.schema_id))
+        return self.packet.pack(SCHEMA_MARKER, self.schema_id, seq_no, *values)
+    def unpack(self, data, offset):
+        return dict(zip(self.fields, self.values.unpack_from(data, offset)))
+
+class MessageDecoder:
+    """Streaming decoder for received packets.
+peek() reads the header, decode() the message. Msgpack messages are
+decoded with one reused msgpack.Unpacker, schema packets with the
+registered Schema. Elements after the message, like the timestamps,
+are left in 'extra'."""
+    def __init__(self, schemas = None):
+        self.schemas = {} if schemas is None else schemas
+        self.reset()
+    def peek(self, data, size):
+        """Returns (seq_no, message_offset, layout) or None,
+        'layout' is a Schema or the element count of a msgpack packet"""
+        if size > 0 and data[0] == SCHEMA_MARKER:
+            if size < Schema.header.size:
+                return None
+            _, schema_id, seq_no = Schema.header.unpack_from(data)
+            schema = self.schemas.get(schema_id)
+            if schema is None or size < schema.packet.size:
+                return None
+            return (seq_no, Schema.header.size, schema)
+        return peekHeader(data, size)
+    def decode(self, data, offset, size, layout):
+        self.extra = ()
+        if isinstance(layout, Schema):
+            return layout.unpack(data, offset)
+        # The unpacker is empty here, so the packet ends at 'end'
+        end = self.unpacker.tell() + size - offset
+        self.unpacker.feed(data[offset:size])
+        try:
+            message = self.unpacker.unpack()
+            if layout > 2:
+                self.extra = tuple(self.unpacker.unpack() for _ in range(layout - 2))
+        except (msgpack.UnpackException, ValueError):
+            # Truncated or malformed packet, throw away what was buffered from it
+            self.reset()
+            return {}
+        if self.unpacker.tell() != end:
+            # Trailing bytes would be decoded as the next packet
+            self.reset()
+        return message
+    def reset(self):
+        self.unpacker = msgpack.Unpacker(encoding = "UTF-8")
+        self.extra = ()
+
+DrainResult = namedtuple("DrainResult", ["message", "received", "dropped", "superseded"])
+
+class RemoteEndpoint:
+    """Sequence numbering and timeout rules shared by the transports.
+Fields sent with send_fields that match a registered Schema are sent
+in its compact form, everything else as a msgpack dictionary.
+If 'recorder' is set, e.g. to a recorder.TelemetryRecorder, every packet
+sent and received is passed to its record(direction, data).
+If 'reliable' is set to a reliable.ReliableChannel, its commands and
+acknowledgements ride along in the msgpack messages and the commands it
+delivers are merged into the received message.
+The quality of the incoming link is kept in 'stats'. With send_timestamps
+set, msgpack packets also carry the send time and echo the send time of
+the last packet from the other end, which gives the round trip time when
+both ends do it."""
     safety_time = 3.0
-    def __init__(self, port, remote_address = None):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        server_address = ("", port)
-        self.sock.bind(server_address)
-        self.sock.setblocking(0)
+    send_timestamps = False
+    def __init__(self, remote_address = None, schemas = (), recorder = None):
+        self.recorder = recorder
+        self.reliable = None
+        self.stats = LinkStats()
+        self.peer_time = None
+        self.peer_time_received = 0.0
         self.last_received = time.time()
         self.tx_seq_no = 0
         self.rx_seq_no = 0 
         self.remote_address = remote_address
-    def receive(self):
-        message = {}
-        try:
-            while True:
-                data, client = self.sock.recvfrom(1024)
-                new_message = msgpack.loads(data, encoding = "UTF-8")
-                if new_message[0] < 10:
-                    self.tx_seq_no = 0
-                if new_message[0] < 10 or new_message[0] > self.rx_seq_no:
-                    self.rx_seq_no = new_message[0]
-                    self.remote_address = client
-                    self.last_received = time.time()
-                    message = new_message[1]
-        except BlockingIOError:
-            pass
+        self.schemas = {}
+        self.schemas_by_fields = {}
+        self.decoder = MessageDecoder(self.schemas)
+        for schema in schemas:
+            self.register_schema(schema)
+    def register_schema(self, schema):
+        self.schemas[schema.schema_id] = schema
+        self.schemas_by_fields[schema.fields] = schema
+    def accept(self, seq_no, client, size = 0):
+        """Check the sequence number of a received packet,
+        returns True if the packet is newer than the previous one"""
+        self.stats.record(seq_no, size)
+        if seq_no < 10:
+            self.tx_seq_no = 0
+        if seq_no < 10 or seq_no > self.rx_seq_no:
+            self.rx_seq_no = seq_no
+            self.remote_address = client
+            self.last_received = time.time()
+            return True
+        return False
+    def decode(self, data, offset, size, layout, arrived = None):
+        """Decode an accepted packet, a trace it carries is stamped with
+        "receive" at 'arrived', the time the datagram was read"""
+        message = self.decoder.decode(data, offset, size, layout)
+        if isinstance(message, dict) and tracing.TRACE_KEY in message:
+            tracing.stamp(message[tracing.TRACE_KEY], "receive", arrived)
+        extra = self.decoder.extra
+        if len(extra) >= 3:
+            now = time.time()
+            sent_time, echo_time, hold_time = extra[:3]
+            self.peer_time = sent_time
+            self.peer_time_received = now
+            if echo_time is not None:
+                self.stats.record_rtt(now - echo_time - hold_time)
+        if self.reliable is not None and isinstance(message, dict):
+            for command in self.reliable.handle(message):
+                message.update(command)
         return message
+    def encode(self, message):
+        if self.send_timestamps:
+            now = time.time()
+            hold_time = now - self.peer_time_received if self.peer_time is not None else 0.0
+            packet = [self.tx_seq_no, message, now, self.peer_time, hold_time]
+        else:
+            packet = [self.tx_seq_no, message]
+        data = msgpack.dumps(packet, encoding = "UTF-8")
+        self.tx_seq_no += 1
+        return data
+    def encode_schema(self, schema, state):
+        data = schema.pack(self.tx_seq_no, state)
+        self.tx_seq_no += 1
+        return data
     def send(self, message):
         if self.remote_address:
-            data = msgpack.dumps([self.tx_seq_no, message], encoding = "UTF-8")
-            self.sock.sendto(data, self.remote_address)
-            self.tx_seq_no += 1
-
+            if self.reliable is not None:
+                message = self.reliable.attach(message, self.stats.rtt)
+            self.send_packet(self.encode(message))
     def send_fields(self, state, fields):
-        """Send selected fields from the state dictionary"""
+        """Send selected fields from the state dictionary or RobotInterface,
+        a pending trace of the state is sent along"""
+        trace = tracing.popTrace(state)
+        schema = self.schemas_by_fields.get(tuple(fields))
+        reliable = self.reliable is not None and self.reliable.has_outgoing
+        if schema is not None and trace is None and not reliable:
+            if self.remote_address:
+                self.send_packet(self.encode_schema(schema, state))
+            return
         message = {k: state.get(k, None) for k in fields}
+        if trace is not None:
+            message[tracing.TRACE_KEY] = tracing.stamp(trace, "send")
         self.send(message)
     def is_timeout(self):
         return time.time() - self.last_received > self.safety_time
 
+class RemoteControlSocket(RemoteEndpoint):
+    buffer_size = 1024
+    def __init__(self, port, remote_address = None, schemas = (), recorder = None):
+        super().__init__(remote_address, schemas, recorder)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server_address = ("", port)
+        self.sock.bind(server_address)
+        self.sock.setblocking(0)
+        # Packets are received into one buffer, the newest accepted one is
+        # kept in the other until it is decoded
+        self.buffers = [memoryview(bytearray(self.buffer_size)) for _ in range(2)]
+    def drain(self):
+        """Read every waiting packet and decode only the newest accepted one.
+        Returns a DrainResult with the message and how many packets were
+        received, dropped as stale and superseded by a newer one.
+        With a reliable channel the reliable parts of the superseded packets
+        are handled too, their commands are merged into the message before
+        the fields of the newest one"""
+        received = 0
+        dropped = 0
+        superseded = 0
+        commands = []
+        kept = None
+        buffers = self.buffers
+        try:
+            while True:
+                size, client = self.sock.recvfrom_into(buffers[0])
+                arrived = time.time()
+                received += 1
+                if self.recorder is not None:
+                    self.recorder.record(RECEIVED, buffers[0][:size])
+                header = self.decoder.peek(buffers[0], size)
+                if header is None or not self.accept(header[0], client, size):
+                    dropped += 1
+                    continue
+                if kept is not None:
+                    superseded += 1
+                    if self.reliable is not None:
+                        commands.extend(self.handle_reliable(buffers[1], *kept[:3]))
+                kept = (header[1], size, header[2], arrived)
+                buffers.reverse()
+        except BlockingIOError:
+            pass
+        message = {}
+        if kept is not None:
+            message = self.decode(buffers[1], *kept)
+        if commands:
+            merged = {}
+            for command in commands:
+                merged.update(command)
+            merged.update(message)
+            message = merged
+        return DrainResult(message, received, dropped, superseded)
+    def handle_reliable(self, data, offset, size, layout):
+        """The reliable commands of a packet that is otherwise skipped"""
+        if isinstance(layout, Schema):
+            return []
+        message = self.decoder.decode(data, offset, size, layout)
+        if not isinstance(message, dict):
+            return []
+        return self.reliable.handle(message)
+    def receive(self):
+        return self.drain().message
+    def receive_all(self):
+        """Read every waiting packet and decode all the accepted ones,
+        oldest first"""
+        messages = []
+        buffer = self.buffers[0]
+        try:
+            while True:
+                size, client = self.sock.recvfrom_into(buffer)
+                arrived = time.time()
+                if self.recorder is not None:
+                    self.recorder.record(RECEIVED, buffer[:size])
+                header = self.decoder.peek(buffer, size)
+                if header is not None and self.accept(header[0], client, size):
+                    messages.append(self.decode(buffer, header[1], size, header[2], arrived))
+        except BlockingIOError:
+            pass
+        return messages
+    def send_packet(self, data):
+        if self.recorder is not None:
+            self.recorder.record(SENT, data)
+        self.sock.sendto(data, self.remote_address)
+
+class RemoteControlProtocol(RemoteEndpoint, asyncio.DatagramProtocol):
+    """Event driven counterpart of RemoteControlSocket for asyncio.
+Messages are written to 'state' as soon as they arrive and the
+'received' event is set, so a tree run with behavior.run_async
+can wake up on it instead of polling the socket.
+If 'delta' is a DeltaDecoder, the messages are passed through it."""
+    def __init__(self, state, remote_address = None, schemas = (), delta = None, recorder = None):
+        super().__init__(remote_address, schemas, recorder)
+        self.state = state
+        self.delta = delta
+        self.transport = None
+        self.received = asyncio.Event()
+    def connection_made(self, transport):
+        self.transport = transport
+    def datagram_received(self, data, client):
+        arrived = time.time()
+        if self.recorder is not None:
+            self.recorder.record(RECEIVED, data)
+        header = self.decoder.peek(data, len(data))
+        if header is not None and self.accept(header[0], client, len(data)):
+            message = self.decode(data, header[1], len(data), header[2], arrived)
+            if self.delta is not None:
+                message = self.delta.decode(message)
+            applyMessage(self.state, message)
+            self.received.set()
+    def send_packet(self, data):
+        if self.recorder is not None:
+            self.recorder.record(SENT, data)
+        if self.transport:
+            self.transport.sendto(data, self.remote_address)
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+async def open_remote_control(port, state, remote_address = None, schemas = (), delta = None,
+        recorder = None):
+    """Bind a RemoteControlProtocol to 'port' in the running event loop"""
+    loop = asyncio.get_running_loop()
+    _, protocol = await loop.create_datagram_endpoint(
+        lambda: RemoteControlProtocol(state, remote_address, schemas, delta, recorder),
+        local_addr = ("0.0.0.0", port))
+    return protocol
+
+KEYFRAME_KEY = "_key"
+DELTA_BASE_KEY = "_base"
+
+class DeltaEncoder:
+    """Change only telemetry. Every 'keyframe_interval' messages a keyframe
+with all the fields is sent, the messages in between only hold the fields
+that differ from the last keyframe. Every message depends only on its
+keyframe, so a lost packet loses nothing but its own update.
+For a RobotInterface only the fields its FieldCursor reports as changed
+are compared."""
+    def __init__(self, fields, keyframe_interval = 30):
+        self.fields = tuple(fields)
+        self.keyframe_interval = keyframe_interval
+        self.keyframe_no = 0
+        self.count = 0
+        self.cursor = None
+        self.base = {}
+        self.delta = {}
+    def encode(self, state):
+        if self.count % self.keyframe_interval == 0:
+            message = self.keyframe(state)
+        else:
+            message = self.changes(state)
+        self.count += 1
+        return message
+    def keyframe(self, state):
+        self.keyframe_no += 1
+        self.base = {name: state.get(name) for name in self.fields}
+        self.delta = {}
+        if isinstance(state, RobotInterface):
+            if self.cursor is None or self.cursor.robot is not state:
+                self.cursor = state.cursor(self.fields)
+            self.cursor.changes()
+        message = dict(self.base)
+        message[KEYFRAME_KEY] = self.keyframe_no
+        return message
+    def changes(self, state):
+        base = self.base
+        delta = self.delta
+        if self.cursor is not None and self.cursor.robot is state:
+            for name, value in self.cursor.changes():
+                if value != base[name]:
+                    delta[name] = value
+                else:
+                    delta.pop(name, None)
+        else:
+            delta.clear()
+            for name in self.fields:
+                value = state.get(name)
+                if value != base[name]:
+                    delta[name] = value
+        message = dict(delta)
+        message[DELTA_BASE_KEY] = self.keyframe_no
+        return message
+
+class DeltaDecoder:
+    """Rebuilds the state from the messages of a DeltaEncoder.
+Returns the fields to update for each message. Deltas of a keyframe that
+was lost are skipped until the next keyframe arrives, other messages are
+passed through unchanged."""
+    def __init__(self):
+        self.keyframe_no = None
+        self.base = {}
+        self.overridden = ()
+    def decode(self, message):
+        if KEYFRAME_KEY in message:
+            self.keyframe_no = message.pop(KEYFRAME_KEY)
+            self.base = message
+            self.overridden = ()
+            return message
+        if DELTA_BASE_KEY in message:
+            if message.pop(DELTA_BASE_KEY) != self.keyframe_no:
+                return {}
+            # Fields that were in the previous delta but not in this one
+            # are back at their keyframe value
+            for name in self.overridden:
+                if name not in message:
+                    message[name] = self.base[name]
+            self.overridden = tuple(name for name in message
+                if message[name] != self.base.get(name))
+            return message
+        return message
+
+def applyMessage(state, message):
+    trace = message.pop(tracing.TRACE_KEY, None)
+    if trace is not None:
+        tracing.setTrace(state, tracing.stamp(trace, "apply"))
+    if isinstance(state, (dict, RobotInterface)):
+        state.update(message)
+    else:
+        state.__dict__.update(message)
+
 @task
 def UDPSend(message, socket):
     socket.send(message)
@@ -56,22 +465,62 @@ def UDPSendFields(message, socket, fields):
 
 @task
 def UDPReceive(state, socket):
-    message = socket.receive()
-    if isinstance(state, dict):
-        state.update(message)
-    else:
-        state.__dict__.update(message)
+    applyMessage(state, socket.receive())
     return False #Never complete
 
+@task
+def SendAcks(socket):
+    """Acknowledge the reliable commands received on a socket that does
+    not otherwise send anything back"""
+    if socket.reliable is not None and socket.reliable.acks:
+        socket.send({})
+    return False #Never complete
+
+@task
+def SampleLinkStats(state, socket):
+    """Copy the link statistics of the socket into 'state', a dictionary
+    of their own that is sent next to the robot state, e.g. with
+    UDPSendFields(state, socket, link_stats.LINK_STATS_FIELDS)"""
+    if isinstance(state, RobotInterface):
+        raise TypeError("The link statistics are not fields of RobotInterface, "
+            "sample them into a dictionary")
+    state.update(socket.stats.snapshot())
+    return False #Never complete
+
+@task
+def UDPSendDelta(state, socket, encoder):
+    socket.send(encoder.encode(state))
+    return False #Never complete
+
+@task
+def UDPReceiveDelta(state, socket, decoder):
+    for message in socket.receive_all():
+        applyMessage(state, decoder.decode(message))
+    return False #Never complete
+
+COMMAND_SCHEMA = Schema(1, (
+    ("velocity_command", "f"),
+    ("turn_command", "f")))
+
+SENSOR_SCHEMA = Schema(2, (
+    ("left_bumper_hit", "?"),
+    ("right_bumper_hit", "?"),
+    ("travelled_distance", "f"),
+    ("heading_rad", "f"),
+    ("line_sensor", "?")))
+
 def SendCommand(robot, socket):
-    fields_to_send = ("velocity_command", "turn_command")
-    return UDPSendFields(robot.__dict__, socket, fields_to_send)
+    """Sent compactly if both ends registered COMMAND_SCHEMA"""
+    return UDPSendFields(robot, socket, COMMAND_SCHEMA.fields)
 
 def SendSensors(robot, socket):
-    fields_to_send = (
-            "left_bumper_hit",
-            "right_bumper_hit",
-            "travelled_distance",
-            "heading_rad",
-            "line_sensor")
-    return UDPSendFields(robot.__dict__, socket, fields_to_send )
\ No newline at end of file
+    """Sent compactly if both ends registered SENSOR_SCHEMA"""
+    return UDPSendFields(robot, socket, SENSOR_SCHEMA.fields)
+
+def SendSensorsDelta(robot, socket, keyframe_interval = 30):
+    """Send only the sensors that changed, receive with ReceiveDelta"""
+    return UDPSendDelta(robot, socket,
+        DeltaEncoder(SENSOR_SCHEMA.fields, keyframe_interval))
+
+def ReceiveDelta(state, socket):
+    return UDPReceiveDelta(state, socket, DeltaDecoder())
\ No newline at end of file
@@ -0,0 +1,222 @@
+import asyncio
+import socket
+import time
+
+import msgpack
+import pytest
+
+from roboutils import hal, remote
+from roboutils.behavior import State
+from roboutils.link_stats import LINK_STATS_FIELDS
+from roboutils.reliable import ReliableChannel
+from roboutils.utils import kinematics as kine
+
+
+def send_packet(port, seq_no, message):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.sendto(msgpack.dumps([seq_no, message], encoding = "UTF-8"), ("127.0.0.1", port))
+    sock.close()
+
+def test_protocol_pushes_messages_into_state():
+    async def scenario():
+        state = {"velocity_command": 0}
+        protocol = await remote.open_remote_control(0, state)
+        port = protocol.transport.get_extra_info("sockname")[1]
+        send_packet(port, 20, {"velocity_command": 0.1})
+        await asyncio.wait_for(protocol.received.wait(), 1.0)
+        protocol.received.clear()
+        assert state["velocity_command"] == 0.1
+        send_packet(port, 15, {"velocity_command": 0.5})
+        send_packet(port, 21, {"velocity_command": 0.2})
+        await asyncio.wait_for(protocol.received.wait(), 1.0)
+        await asyncio.sleep(0.05)
+        protocol.close()
+        assert state["velocity_command"] == 0.2
+        assert protocol.rx_seq_no == 21
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize("seq_no", [0, 5, 127, 128, 255, 256, 70000, 2**40, -1, -100])
+def test_peekHeader_reads_sequence_number(seq_no):
+    data = msgpack.dumps([seq_no, {"a": 1}, 3], encoding = "UTF-8")
+    header = remote.peekHeader(data, len(data))
+    assert header[0] == seq_no
+    assert header[2] == 3
+    decoder = remote.MessageDecoder()
+    assert decoder.decode(data, header[1], len(data), header[2]) == {"a": 1}
+    assert decoder.decode(data, header[1], len(data), header[2]) == {"a": 1}
+
+def test_decoder_drops_trailing_bytes_of_a_packet():
+    decoder = remote.MessageDecoder()
+    packets = [
+        b"\x92" + b"".join(msgpack.dumps(item) for item in (1, {"a": 1}, 99)),
+        b"\x92\x02\xc1",
+        msgpack.dumps([3, {"b": 2}], encoding = "UTF-8"),
+        msgpack.dumps([4, {"c": 3}], encoding = "UTF-8")]
+    messages = []
+    for data in packets:
+        header = decoder.peek(data, len(data))
+        messages.append(decoder.decode(data, header[1], len(data), header[2]))
+    assert messages == [{"a": 1}, {}, {"b": 2}, {"c": 3}]
+
+def test_peekHeader_rejects_other_packets():
+    data = msgpack.dumps({"a": 1}, encoding = "UTF-8")
+    assert remote.peekHeader(data, len(data)) is None
+    assert remote.peekHeader(b"", 0) is None
+
+def test_drain_decodes_newest_and_counts_the_rest():
+    sock = remote.RemoteControlSocket(port = 0)
+    port = sock.sock.getsockname()[1]
+    for seq_no, value in ((20, 1), (21, 2), (15, 3), (22, 4)):
+        send_packet(port, seq_no, {"value": value})
+    time.sleep(0.05)
+    result = sock.drain()
+    sock.sock.close()
+    assert result.message == {"value": 4}
+    assert result.received == 4
+    assert result.dropped == 1
+    assert result.superseded == 2
+
+def test_drain_handles_reliable_commands_of_superseded_packets():
+    sock = remote.RemoteControlSocket(port = 0)
+    sock.reliable = ReliableChannel()
+    port = sock.sock.getsockname()[1]
+    console = ReliableChannel()
+    console.post({"state": 2})
+    send_packet(port, 20, console.attach({"velocity_command": 0.1}))
+    send_packet(port, 21, {"velocity_command": 0.2})
+    time.sleep(0.05)
+    result = sock.drain()
+    sock.sock.close()
+    assert result.superseded == 1
+    assert result.message == {"state": 2, "velocity_command": 0.2}
+    assert sock.reliable.acks == [1]
+
+def test_schema_packets_round_trip_and_fall_back():
+    sender = remote.RemoteControlSocket(port = 0, schemas = (remote.SENSOR_SCHEMA,))
+    receiver = remote.RemoteControlSocket(port = 0, schemas = (remote.SENSOR_SCHEMA,))
+    sender.remote_address = ("127.0.0.1", receiver.sock.getsockname()[1])
+    sensors = {
+        "left_bumper_hit": True,
+        "right_bumper_hit": False,
+        "travelled_distance": 1.5,
+        "heading_rad": -0.25,
+        "line_sensor": True}
+    sender.send_fields(sensors, remote.SENSOR_SCHEMA.fields)
+    time.sleep(0.05)
+    assert receiver.receive() == sensors
+    sender.send_fields(sensors, ("line_sensor",))
+    time.sleep(0.05)
+    assert receiver.receive() == {"line_sensor": True}
+    assert receiver.rx_seq_no == 1
+    sender.sock.close()
+    receiver.sock.close()
+
+def test_schema_packet_is_compact():
+    sensors = {
+        "left_bumper_hit": True,
+        "right_bumper_hit": False,
+        "travelled_distance": 1.5,
+        "heading_rad": -0.25,
+        "line_sensor": True}
+    compact = remote.SENSOR_SCHEMA.pack(100, sensors)
+    full = msgpack.dumps([100, sensors], encoding = "UTF-8")
+    assert len(compact) * 4 < len(full)
+
+def test_schema_pack_names_missing_field():
+    with pytest.raises(KeyError, match = "turn_command"):
+        remote.COMMAND_SCHEMA.pack(1, {"velocity_command": 0.1})
+    with pytest.raises(ValueError, match = "turn_command"):
+        remote.COMMAND_SCHEMA.pack(1, {"velocity_command": 0.1, "turn_command": None})
+
+def test_unknown_schema_is_dropped():
+    decoder = remote.MessageDecoder()
+    data = remote.SENSOR_SCHEMA.pack(5, {
+        "left_bumper_hit": True,
+        "right_bumper_hit": False,
+        "travelled_distance": 1.5,
+        "heading_rad": -0.25,
+        "line_sensor": True})
+    assert decoder.peek(data, len(data)) is None
+
+def run_delta_link(states, encoder, delivered):
+    decoder = remote.DeltaDecoder()
+    received = {}
+    for i, state in enumerate(states):
+        message = encoder.encode(state)
+        if i in delivered:
+            received.update(decoder.decode(msgpack.loads(
+                msgpack.dumps(message, encoding = "UTF-8"), encoding = "UTF-8")))
+    return received
+
+def test_delta_messages_rebuild_state_despite_loss():
+    fields = ("left_bumper_hit", "line_sensor")
+    states = [
+        {"left_bumper_hit": False, "line_sensor": False},
+        {"left_bumper_hit": True, "line_sensor": False},
+        {"left_bumper_hit": True, "line_sensor": True},
+        {"left_bumper_hit": False, "line_sensor": True},
+        {"left_bumper_hit": False, "line_sensor": False}]
+    for delivered in ({0, 1, 2, 3, 4}, {0, 2, 4}, {0, 1, 4}, {0, 3}):
+        encoder = remote.DeltaEncoder(fields, keyframe_interval = 10)
+        received = run_delta_link(states, encoder, delivered)
+        assert received == states[max(delivered)]
+
+def test_delta_skips_until_keyframe():
+    fields = ("line_sensor",)
+    states = [{"line_sensor": i % 2 == 0} for i in range(6)]
+    encoder = remote.DeltaEncoder(fields, keyframe_interval = 3)
+    assert run_delta_link(states, encoder, {1, 2}) == {}
+    encoder = remote.DeltaEncoder(fields, keyframe_interval = 3)
+    assert run_delta_link(states, encoder, {1, 3, 4}) == states[4]
+
+def test_delta_only_holds_changed_fields():
+    from roboutils import hal
+    from roboutils.utils import kinematics as kine
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    encoder = remote.DeltaEncoder(remote.SENSOR_SCHEMA.fields)
+    assert len(encoder.encode(robot)) == len(remote.SENSOR_SCHEMA.fields) + 1
+    assert encoder.encode(robot) == {remote.DELTA_BASE_KEY: 1}
+    robot.line_sensor = True
+    assert encoder.encode(robot) == {"line_sensor": True, remote.DELTA_BASE_KEY: 1}
+    robot.line_sensor = False
+    assert encoder.encode(robot) == {remote.DELTA_BASE_KEY: 1}
+
+def test_round_trip_time_from_echoed_timestamps():
+    a = remote.RemoteControlSocket(port = 0)
+    b = remote.RemoteControlSocket(port = 0)
+    a.send_timestamps = True
+    b.send_timestamps = True
+    a.remote_address = ("127.0.0.1", b.sock.getsockname()[1])
+    a.send({"ping": 1})
+    time.sleep(0.02)
+    b.receive()
+    b.send({"pong": 1})
+    time.sleep(0.02)
+    assert a.receive() == {"pong": 1}
+    assert 0 <= a.stats.rtt < 0.1
+    assert a.stats.received == 1
+    a.sock.close()
+    b.sock.close()
+
+def test_link_stats_are_sent_next_to_robot_state():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    sock = remote.RemoteControlSocket(port = 0)
+    port = sock.sock.getsockname()[1]
+    peer = remote.RemoteControlSocket(port = 0, remote_address = ("127.0.0.1", port))
+    for seq_no in (20, 21, 23):
+        send_packet(port, seq_no, {})
+    time.sleep(0.02)
+    sock.receive()
+    link = {}
+    remote.SampleLinkStats(link, sock).update()
+    assert link == sock.stats.snapshot()
+    assert link["link_received"] == 3
+    assert link["link_lost"] == 1
+    # The task fails instead of dropping the values
+    assert remote.SampleLinkStats(robot, sock).update() == State.Failure
+    sock.remote_address = peer.sock.getsockname()
+    sock.send_fields(link, LINK_STATS_FIELDS)
+    time.sleep(0.02)
+    assert peer.receive() == link
+    sock.sock.close()
+    peer.sock.close()
@@ -0,0 +1,107 @@
+"""Shared memory link between processes on the same host
+
+A block of shared memory holds one channel per direction. A channel is a
+sequence counter followed by the values of a Schema, guarded as a seqlock:
+the writer makes the counter odd, writes the values and makes it even
+again, the reader retries if the counter was odd or changed while it
+copied the values. There is a single writer and a single reader per
+channel, so no locks or system calls are needed to exchange a snapshot.
+"""
+import struct
+from multiprocessing import shared_memory
+
+from .remote import RemoteEndpoint
+
+COUNTER = struct.Struct("<Q")
+
+# Names of the blocks created by this process
+_created = set()
+
+class SharedMemorySocket(RemoteEndpoint):
+    """Same interface as RemoteControlSocket over shared memory.
+One end creates the block with create = True, the other attaches to it by
+name with the send and receive schemas swapped. Each receive() returns the
+newest snapshot if it has not been returned yet, intermediate snapshots
+are overwritten like superseded packets."""
+    max_retries = 100
+    def __init__(self, name, send_schema, receive_schema, create = False):
+        super().__init__(remote_address = name)
+        self.name = name
+        self.send_schema = send_schema
+        self.receive_schema = receive_schema
+        self.created = create
+        channel_size = COUNTER.size + max(send_schema.values.size, receive_schema.values.size)
+        channel_size = (channel_size + 7) // 8 * 8
+        if create:
+            self.memory = shared_memory.SharedMemory(name, create = True, size = 2 * channel_size)
+            self.memory.buf[:2 * channel_size] = bytes(2 * channel_size)
+            _created.add(name)
+            self.tx_offset = 0
+            self.rx_offset = channel_size
+        else:
+            self.memory = shared_memory.SharedMemory(name)
+            if name not in _created:
+                _untrack(self.memory)
+            self.tx_offset = channel_size
+            self.rx_offset = 0
+        self.buf = self.memory.buf
+        self.tx_counter = COUNTER.unpack_from(self.buf, self.tx_offset)[0]
+        self.rx_counter = None
+    def read(self):
+        """Consistent copy of the values in the receive channel,
+        returns (counter, values) or None if nothing new was written"""
+        buf = self.buf
+        offset = self.rx_offset
+        values = self.receive_schema.values
+        for _ in range(self.max_retries):
+            counter = COUNTER.unpack_from(buf, offset)[0]
+            if counter == self.rx_counter or counter == 0:
+                return None
+            if counter & 1:
+                continue
+            snapshot = values.unpack_from(buf, offset + COUNTER.size)
+            if COUNTER.unpack_from(buf, offset)[0] == counter:
+                self.rx_counter = counter
+                return counter, snapshot
+        return None
+    def receive(self):
+        read = self.read()
+        if read is None:
+            return {}
+        counter, snapshot = read
+        if not self.accept(counter // 2, self.name, self.receive_schema.values.size):
+            return {}
+        return dict(zip(self.receive_schema.fields, snapshot))
+    def receive_all(self):
+        message = self.receive()
+        return [message] if message else []
+    def write(self, values):
+        buf = self.buf
+        offset = self.tx_offset
+        self.tx_counter += 1
+        COUNTER.pack_into(buf, offset, self.tx_counter)
+        self.send_schema.values.pack_into(buf, offset + COUNTER.size, *values)
+        self.tx_counter += 1
+        COUNTER.pack_into(buf, offset, self.tx_counter)
+        self.tx_seq_no = self.tx_counter // 2
+    def send(self, message):
+        self.write([message.get(name) for name in self.send_schema.fields])
+    def send_fields(self, state, fields):
+        """A snapshot always holds every field of the send schema,
+        so all of them are written whatever 'fields' lists"""
+        self.write([state.get(name) for name in self.send_schema.fields])
+    def close(self):
+        self.buf = None
+        self.memory.close()
+        if self.created:
+            self.memory.unlink()
+            _created.discard(self.name)
+
+def _untrack(memory):
+    # The resource tracker of an attaching process would unlink the block
+    # when the process exits, even though the creator still uses it
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, "shared_memory")
+    except (ImportError, AttributeError, KeyError):
+        pass
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from roboutils import remote
+from roboutils.shm import SharedMemorySocket
+
+
+sensors = {
+    "left_bumper_hit": True,
+    "right_bumper_hit": False,
+    "travelled_distance": 1.5,
+    "heading_rad": -0.25,
+    "line_sensor": True}
+
+@pytest.fixture
+def link():
+    name = "roboutils_test_%d" % os.getpid()
+    simulator = SharedMemorySocket(name, remote.SENSOR_SCHEMA, remote.COMMAND_SCHEMA, create = True)
+    robot = SharedMemorySocket(name, remote.COMMAND_SCHEMA, remote.SENSOR_SCHEMA)
+    yield simulator, robot
+    robot.close()
+    simulator.close()
+
+def test_snapshots_in_both_directions(link):
+    simulator, robot = link
+    assert robot.receive() == {}
+    simulator.send(sensors)
+    assert robot.receive() == sensors
+    assert robot.receive() == {}
+    robot.send_fields({"velocity_command": 0.5, "turn_command": 0.25}, remote.COMMAND_SCHEMA.fields)
+    assert simulator.receive() == {"velocity_command": 0.5, "turn_command": 0.25}
+
+def test_newest_snapshot_wins(link):
+    simulator, robot = link
+    for i in range(3):
+        simulator.send(dict(sensors, travelled_distance = float(i)))
+    assert robot.receive()["travelled_distance"] == 2.0
+    assert robot.rx_seq_no == 3
+    assert not robot.is_timeout()
@@ -0,0 +1,236 @@
+"""Snapshot and restore of the runtime state of trees and simulations
+
+A StateLayout walks a behavior tree and the objects it works on once and
+lists every attribute that holds runtime state: the current child of a
+Sequence, the start time of a Delay, the fields and the change versions of
+a RobotInterface, the positions and velocities of its Motors, the odometry
+and the simulated pose. A Snapshot stores those attributes in flat buffers,
+a kind code, three doubles and a 64 bit integer per attribute, so forking
+a checkpoint into many branches is a copy of the buffers:
+
+    layout = StateLayout(tree, clock)
+    checkpoint = layout.snapshot()
+    for branch in checkpoint.fork(50):
+        layout.restore(branch)
+        ...run the tree...
+
+Generator tasks (from_generator), e.g. PavelFollowLine, can not be copied,
+they are started again from the beginning on restore. A branch of a
+snapshot taken while one was running does not repeat the original run,
+which its 'exact' tells, and snapshot(exact = True) refuses to take one.
+Attributes of other types, e.g. caches, are left as they are.
+Integers are kept in the integer buffer, as a double holds them exactly
+only up to 2**53, and snapshot() raises ValueError for one that does not
+fit in 64 bits. Restoring a RobotInterface also restores its versions, so
+a FieldCursor that is not part of the layout should mark_all_dirty().
+"""
+from array import array
+
+from .behavior import State
+from .hal import RobotInterface, Motor
+from .utils import Transform, Vec2, Command
+
+UNSET = 0
+NONE = 1
+BOOL = 2
+INT = 3
+FLOAT = 4
+TRANSFORM = 5
+COMMAND = 6
+VEC2 = 7
+STATE = 8
+OPAQUE = 9
+
+# Doubles stored per attribute
+WIDTH = 3
+
+_SUPPORTED = (type(None), bool, int, float, Transform, Command, Vec2, State)
+
+class Snapshot:
+    """The kind and the value of every attribute of a StateLayout"""
+    __slots__ = ("kinds", "values", "ints", "restart")
+    def __init__(self, kinds, values, ints, restart):
+        self.kinds = kinds
+        self.values = values
+        self.ints = ints
+        # Indices of the generator tasks of the layout to start again
+        self.restart = restart
+
+    @property
+    def exact(self):
+        """False if generator tasks are restarted on restore,
+        so that a branch does not repeat the original run"""
+        return not self.restart
+
+    def copy(self):
+        return Snapshot(bytearray(self.kinds), array("d", self.values),
+            array("q", self.ints), self.restart)
+
+    def fork(self, count):
+        """'count' independent copies"""
+        return [self.copy() for _ in range(count)]
+
+    def tobytes(self):
+        return bytes(self.kinds) + self.values.tobytes() + self.ints.tobytes()
+
+# An entry is (object, attribute name) or (list, index), the latter for the
+# change stamps of a RobotInterface
+def _get(obj, name):
+    if isinstance(name, int):
+        return obj[name]
+    return getattr(obj, name)
+
+def _set(obj, name, value):
+    if isinstance(name, int):
+        obj[name] = value
+    else:
+        setattr(obj, name, value)
+
+def _isNode(value):
+    return callable(getattr(value, "start", None)) and callable(getattr(value, "update", None)) \
+        and not isinstance(value, RobotInterface)
+
+def _isTraversed(value):
+    return _isNode(value) or isinstance(value, (RobotInterface, Motor))
+
+def _attributeNames(obj):
+    names = []
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        names.extend(slots)
+    names.extend(getattr(obj, "__dict__", ()))
+    seen = set()
+    return [name for name in names if not name.startswith("_")
+        and not (name in seen or seen.add(name))]
+
+class StateLayout:
+    """The stateful attributes reachable from the roots, found by walking
+the children of the behaviors, the behavior-like objects they hold, e.g.
+the odometry and the motor I/O of a DrivePipeline, and the RobotInterfaces
+and Motors they refer to, also through the arguments of tasks.
+Build the layout after the tree has been started, so that the attributes
+set in start() are found."""
+    def __init__(self, *roots):
+        self.entries = []
+        self.generators = []
+        visited = set()
+        pending = list(reversed(roots))
+        while pending:
+            obj = pending.pop()
+            if id(obj) in visited:
+                continue
+            visited.add(id(obj))
+            if isinstance(obj, RobotInterface):
+                # The versions go after the fields, as restoring a field
+                # stamps it with a new version
+                self.entries.extend((obj, name) for name in obj.fields)
+                self.entries.append((obj, "_version"))
+                self.entries.extend((obj._stamps, i) for i in range(len(obj.fields)))
+                pending.extend((obj.right_wheel, obj.left_wheel))
+                continue
+            if hasattr(obj, "generator") and hasattr(obj, "iteration"):
+                self.generators.append(obj)
+            children = []
+            for name in _attributeNames(obj):
+                try:
+                    value = getattr(obj, name)
+                except AttributeError:
+                    self.entries.append((obj, name))
+                    continue
+                if _isTraversed(value):
+                    children.append(value)
+                elif isinstance(value, (tuple, list)) and not isinstance(value, _SUPPORTED):
+                    children.extend(item for item in value if _isTraversed(item))
+                elif isinstance(value, _SUPPORTED):
+                    self.entries.append((obj, name))
+            pending.extend(reversed(children))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def snapshot(self, exact = False):
+        """Take a Snapshot of the attributes. With 'exact' a ValueError is
+        raised instead if generator tasks are running"""
+        restart = tuple(i for i, node in enumerate(self.generators)
+            if getattr(node, "iteration", None) is not None)
+        if exact and restart:
+            raise ValueError("Generator tasks are running and would restart on restore: %s"
+                % ", ".join(self.generators[i].generator.__name__ for i in restart))
+        kinds = bytearray(len(self.entries))
+        values = array("d", bytes(8 * WIDTH * len(self.entries)))
+        ints = array("q", bytes(8 * len(self.entries)))
+        for i, (obj, name) in enumerate(self.entries):
+            offset = WIDTH * i
+            try:
+                value = _get(obj, name)
+            except AttributeError:
+                kinds[i] = UNSET
+                continue
+            if value is None:
+                kinds[i] = NONE
+            elif isinstance(value, bool):
+                kinds[i] = BOOL
+                values[offset] = value
+            elif isinstance(value, int):
+                kinds[i] = INT
+                try:
+                    ints[i] = value
+                except OverflowError:
+                    raise ValueError("%s of %r does not fit in 64 bits" % (name, obj))
+            elif isinstance(value, float):
+                kinds[i] = FLOAT
+                values[offset] = value
+            elif isinstance(value, Transform):
+                kinds[i] = TRANSFORM
+                values[offset] = value.heading
+                values[offset + 1] = value.offset.x
+                values[offset + 2] = value.offset.y
+            elif isinstance(value, Command):
+                kinds[i] = COMMAND
+                values[offset] = value.velocity
+                values[offset + 1] = value.angularVelocity
+            elif isinstance(value, Vec2):
+                kinds[i] = VEC2
+                values[offset] = value.x
+                values[offset + 1] = value.y
+            elif isinstance(value, State):
+                kinds[i] = STATE
+                values[offset] = value.value
+            else:
+                kinds[i] = OPAQUE
+        return Snapshot(kinds, values, ints, restart)
+
+    def restore(self, snapshot):
+        values = snapshot.values
+        for i, (obj, name) in enumerate(self.entries):
+            kind = snapshot.kinds[i]
+            offset = WIDTH * i
+            if kind == UNSET:
+                try:
+                    delattr(obj, name)
+                except AttributeError:
+                    pass
+                continue
+            if kind == OPAQUE:
+                continue
+            if kind == NONE:
+                value = None
+            elif kind == BOOL:
+                value = values[offset] != 0.0
+            elif kind == INT:
+                value = snapshot.ints[i]
+            elif kind == FLOAT:
+                value = values[offset]
+            elif kind == TRANSFORM:
+                value = Transform(values[offset], Vec2(values[offset + 1], values[offset + 2]))
+            elif kind == COMMAND:
+                value = Command(values[offset], values[offset + 1])
+            elif kind == VEC2:
+                value = Vec2(values[offset], values[offset + 1])
+            else:
+                value = State(int(values[offset]))
+            _set(obj, name, value)
+        for i in snapshot.restart:
+            self.generators[i].start()
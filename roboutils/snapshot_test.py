@@ -0,0 +1,125 @@
+import pytest
+
+from roboutils import hal
+from roboutils.behavior import ParallelAll, Sequence, from_generator, State
+from roboutils.behavior.decorator import Repeat
+from roboutils.behavior.replay import VirtualClock
+from roboutils.behavior.robot import DriveWithVelocity, DriveWithVelocityAndRotation
+from roboutils.behavior.time import Delay, useClock
+from roboutils.hal import simulation
+from roboutils.hal.differential_drive import DrivePipeline
+from roboutils.snapshot import StateLayout
+from roboutils.utils import kinematics as kine
+
+
+def makeSimulation(clock):
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    tree = ParallelAll(
+        Repeat(Sequence(
+            Sequence(DriveWithVelocity(robot, 0.2), Delay(0.5)),
+            Sequence(DriveWithVelocityAndRotation(robot, 0.1, 1.5), Delay(0.3)))),
+        DrivePipeline(robot, simulation.SimulateDrive(robot), clock = clock))
+    return robot, tree
+
+def run(tree, clock, ticks):
+    poses = []
+    for _ in range(ticks):
+        clock.now += 0.03
+        tree.update()
+        poses.append(tree.children[1].robot.true_pose)
+    return poses
+
+def test_branches_from_a_checkpoint_repeat_the_original_run():
+    clock = VirtualClock(10.0)
+    with useClock(clock):
+        robot, tree = makeSimulation(clock)
+        tree.start()
+        run(tree, clock, 37)
+        layout = StateLayout(tree, clock)
+        checkpoint = layout.snapshot()
+        original = run(tree, clock, 60)
+        branches = checkpoint.fork(3)
+        for branch in branches:
+            layout.restore(branch)
+            assert run(tree, clock, 60) == original
+    assert robot.left_wheel in [obj for obj, _ in layout.entries]
+
+def test_unset_attributes_are_restored_unset():
+    sequence = Sequence(Delay(1.0))
+    layout = StateLayout(sequence)
+    empty = layout.snapshot()
+    with useClock(VirtualClock(0.0)):
+        sequence.start()
+    assert sequence.currentChild == 0
+    layout.restore(empty)
+    with pytest.raises(AttributeError):
+        sequence.currentChild
+
+@from_generator
+def Count(counter):
+    counter.append(0)
+    yield
+    while True:
+        counter.append(len(counter))
+        yield State.Running
+
+def test_generators_are_restarted():
+    counter = []
+    task = Count(counter)
+    task.start()
+    task.update()
+    layout = StateLayout(task)
+    checkpoint = layout.snapshot()
+    assert not checkpoint.exact
+    assert not checkpoint.copy().exact
+    with pytest.raises(ValueError, match = "running and would restart on restore: Count"):
+        layout.snapshot(exact = True)
+    task.update()
+    layout.restore(checkpoint)
+    assert counter == [0, 1, 2, 0]
+
+def test_snapshot_without_running_generators_is_exact():
+    robot, tree = makeSimulation(VirtualClock(0.0))
+    assert StateLayout(tree).snapshot(exact = True).exact
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+    def start(self):
+        pass
+    def update(self):
+        self.count += 1
+        return State.Running
+
+def test_large_integers_are_restored_exactly():
+    counter = Counter()
+    counter.count = 2 ** 60 + 1
+    layout = StateLayout(counter)
+    checkpoint = layout.snapshot()
+    counter.count = 0
+    layout.restore(checkpoint)
+    assert counter.count == 2 ** 60 + 1
+    counter.count = 2 ** 64
+    with pytest.raises(ValueError, match = "count"):
+        layout.snapshot()
+
+def test_robot_interface_versions_are_restored():
+    robot = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    robot.line_sensor = True
+    layout = StateLayout(robot)
+    checkpoint = layout.snapshot()
+    version = robot.version
+    stamps = list(robot._stamps)
+    cursor = robot.cursor(("line_sensor", "velocity_command"))
+    cursor.changes()
+    robot.velocity_command = 0.5
+    robot.line_sensor = False
+    layout.restore(checkpoint)
+    assert robot.version == version
+    assert robot._stamps == stamps
+    assert robot.line_sensor
+    assert robot.velocity_command == 0
+    cursor.mark_all_dirty()
+    assert cursor.changes() == [("line_sensor", True), ("velocity_command", 0)]
+    robot.velocity_command = 0.1
+    assert robot.version == version + 1
@@ -0,0 +1,111 @@
+"""End to end latency tracing through the remote links
+
+A trace is a list [trace_id, [stage, timestamp], ...]. It is started where
+something happens, e.g. when the simulated line sensor changes, and is kept
+in the 'trace' of a RobotInterface or under TRACE_KEY of a dictionary state.
+send_fields takes the pending trace along in the next message, stamped with
+"send" just before encoding. The receiving end stamps it with "receive"
+when the datagram is read from the socket and with "apply" when the state
+is updated and tagged with it, so the time a packet waits for the next tick
+is a hop of its own. A StampTrace in between, e.g. "decision" after the
+behavior, splits the time spent on the robot. When the trace has made the
+round trip, CollectTraces hands it to a LatencyCollector, which gives the
+percentiles of each hop. The timestamps come from time.time() of each
+process, so the hops between hosts are only as good as their clock sync.
+"""
+import itertools
+import time
+from collections import deque
+
+from .behavior import task
+
+TRACE_KEY = "_trace"
+
+_trace_ids = itertools.count(1)
+
+def begin(state, stage, now = None):
+    """Start a new trace at 'stage' and leave it pending on the state"""
+    trace = [next(_trace_ids), [stage, time.time() if now is None else now]]
+    setTrace(state, trace)
+    return trace
+
+def stamp(trace, stage, now = None):
+    trace.append([stage, time.time() if now is None else now])
+    return trace
+
+def getTrace(state):
+    if isinstance(state, dict):
+        return state.get(TRACE_KEY)
+    return getattr(state, "trace", None)
+
+def setTrace(state, trace):
+    if isinstance(state, dict):
+        state[TRACE_KEY] = trace
+    else:
+        state.trace = trace
+
+def popTrace(state):
+    trace = getTrace(state)
+    if trace is not None:
+        setTrace(state, None)
+    return trace
+
+class LatencyCollector:
+    """Per hop latencies of completed traces.
+A hop is named by its position and the stages at its ends, e.g.
+"2 send->receive", the last 'capacity' samples of each hop are kept."""
+    def __init__(self, capacity = 1000):
+        self.capacity = capacity
+        self.hops = {}
+        self.traces = 0
+    def add(self, trace):
+        stages = trace[1:]
+        if len(stages) < 2:
+            return
+        self.traces += 1
+        for i in range(1, len(stages)):
+            hop = "%d %s->%s" % (i, stages[i - 1][0], stages[i][0])
+            self.sample(hop, stages[i][1] - stages[i - 1][1])
+        self.sample("total", stages[-1][1] - stages[0][1])
+    def sample(self, hop, latency):
+        samples = self.hops.get(hop)
+        if samples is None:
+            samples = deque(maxlen = self.capacity)
+            self.hops[hop] = samples
+        samples.append(latency)
+    def percentiles(self, percents = (50, 90, 99)):
+        """{hop: [latency at each percent]}, in seconds"""
+        result = {}
+        for hop, samples in self.hops.items():
+            ordered = sorted(samples)
+            last = len(ordered) - 1
+            result[hop] = [ordered[min(last, int(round(last * percent / 100.0)))]
+                for percent in percents]
+        return result
+    def report(self, percents = (50, 90, 99)):
+        lines = ["%-32s" % ("%d traces" % self.traces) +
+            "".join("%10s" % ("p%d ms" % percent) for percent in percents)]
+        for hop, values in sorted(self.percentiles(percents).items(),
+                key = lambda item: (item[0] == "total", item[0])):
+            lines.append("%-32s" % hop + "".join("%10.2f" % (value * 1000.0) for value in values))
+        return "\n".join(lines)
+
+@task
+def StampTrace(state, stage):
+    """Stamp the pending trace of the state with 'stage', once"""
+    trace = getTrace(state)
+    if trace is not None and trace[-1][0] != stage:
+        stamp(trace, stage)
+    return False #Never complete
+
+@task
+def CollectTraces(state, collector, stage = None):
+    """Hand the pending trace that has come back to the state to the
+    collector, stamped with 'stage' if given"""
+    trace = getTrace(state)
+    if trace is not None and trace[-1][0] == "apply":
+        setTrace(state, None)
+        if stage is not None:
+            stamp(trace, stage)
+        collector.add(trace)
+    return False #Never complete
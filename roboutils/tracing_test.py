@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from roboutils import hal, remote, tracing
+from roboutils.utils import kinematics as kine
+
+
+def test_trace_makes_round_trip_through_sockets():
+    simulator_state = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    robot_state = hal.RobotInterface(kine.KinematicModel(0.2, 0.03, 0.03))
+    simulator = remote.RemoteControlSocket(port = 0, schemas = (remote.SENSOR_SCHEMA,))
+    robot = remote.RemoteControlSocket(port = 0, schemas = (remote.SENSOR_SCHEMA,),
+        remote_address = ("127.0.0.1", simulator.sock.getsockname()[1]))
+    robot.send({})
+    time.sleep(0.02)
+    simulator.receive()
+
+    simulator_state.line_sensor = True
+    tracing.begin(simulator_state, "sensed")
+    simulator.send_fields(simulator_state, remote.SENSOR_SCHEMA.fields)
+    assert simulator_state.trace is None
+    time.sleep(0.02)
+    remote.applyMessage(robot_state, robot.receive())
+    assert robot_state.line_sensor
+    assert [stage for stage, _ in robot_state.trace[-2:]] == ["receive", "apply"]
+    tracing.StampTrace(robot_state, "decision").update()
+    robot.send_fields(robot_state, remote.COMMAND_SCHEMA.fields)
+    time.sleep(0.02)
+    remote.applyMessage(simulator_state, simulator.receive())
+
+    collector = tracing.LatencyCollector()
+    tracing.CollectTraces(simulator_state, collector, "actuate").update()
+    assert simulator_state.trace is None
+    assert collector.traces == 1
+    assert set(collector.hops) == {
+        "1 sensed->send", "2 send->receive", "3 receive->apply",
+        "4 apply->decision", "5 decision->send", "6 send->receive",
+        "7 receive->apply", "8 apply->actuate", "total"}
+    assert "total" in collector.report()
+    simulator.sock.close()
+    robot.sock.close()
+
+def test_percentiles():
+    collector = tracing.LatencyCollector()
+    for i in range(101):
+        collector.add([i, ["a", 0.0], ["b", i / 1000.0]])
+    p50, p99 = collector.percentiles((50, 99))["1 a->b"]
+    assert p50 == pytest.approx(0.050)
+    assert p99 == pytest.approx(0.099)
+
+def test_receive_is_stamped_on_arrival_not_on_apply():
+    simulator = remote.RemoteControlSocket(port = 0)
+    robot = remote.RemoteControlSocket(port = 0,
+        remote_address = ("127.0.0.1", simulator.sock.getsockname()[1]))
+    state = {}
+    tracing.begin(state, "sensed")
+    robot.send_fields(state, ("line_sensor",))
+    time.sleep(0.02)
+    message = simulator.receive()
+    time.sleep(0.05)
+    remote.applyMessage(state, message)
+    trace = tracing.getTrace(state)
+    assert [stage for stage, _ in trace[1:]] == ["sensed", "send", "receive", "apply"]
+    assert trace[-1][1] - trace[-2][1] >= 0.04
+    simulator.sock.close()
+    robot.sock.close()
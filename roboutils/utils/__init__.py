@@ -1,2 +1,4 @@
 from .vec2 import *
-from .kinematics import *
\ No newline at end of file
+from .kinematics import *
+from .pose_history import PoseHistory
+from .time_series import TimeSeries
@@ -17,7 +17,11 @@ class Command(namedtuple("command", ["velocity", "angularVelocity"])):
 
     @staticmethod
     def arc_to(from_pose, to_vec, speed):
+        """Arc from the pose through the point, straight ahead if the point
+        is at the pose"""
         vec_in_local = from_pose.inverse().applyTo(to_vec)
+        if vec_in_local.lengthSq == 0:
+            return Command.arc(velocity = speed, curvature = 0.0)
         behind = vec_in_local.x < 0
         return Command.arc( velocity = speed if not behind else -speed,
             curvature = 2.0 * vec_in_local.y / vec_in_local.lengthSq)
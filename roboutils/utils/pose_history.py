@@ -0,0 +1,93 @@
+from .vec2 import Vec2, Transform
+from .math_utils import normalizeAngle
+
+class PoseHistory:
+    """Fixed capacity ring buffer of timestamped poses.
+The oldest pose is overwritten when the buffer is full.
+Timestamps must not decrease, lookups by time are binary searches
+and poses between two samples are interpolated."""
+    __slots__ = ("capacity", "times", "poses", "start", "size")
+    def __init__(self, capacity = 256):
+        self.capacity = capacity
+        self.times = [0.0] * capacity
+        self.poses = [Transform.identity()] * capacity
+        self.clear()
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, time: float, pose: Transform) -> None:
+        if self.size > 0:
+            last = (self.start + self.size - 1) % self.capacity
+            if time < self.times[last]:
+                raise ValueError("Pose history timestamps must not decrease")
+            if time == self.times[last]:
+                self.poses[last] = pose
+                return
+        if self.size < self.capacity:
+            index = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.times[index] = time
+        self.poses[index] = pose
+
+    @property
+    def oldest_time(self) -> float:
+        return self.times[self.start]
+
+    @property
+    def newest_time(self) -> float:
+        return self.times[(self.start + self.size - 1) % self.capacity]
+
+    def _upper_bound(self, time: float) -> int:
+        """Number of samples with timestamp <= time"""
+        low = 0
+        high = self.size
+        times = self.times
+        start = self.start
+        capacity = self.capacity
+        while low < high:
+            middle = (low + high) // 2
+            if times[(start + middle) % capacity] <= time:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def at(self, time: float) -> Transform:
+        """Pose at the given time, or None if it is outside the history"""
+        if self.size == 0 or time < self.oldest_time or time > self.newest_time:
+            return None
+        after = self._upper_bound(time)
+        if after == self.size:
+            return self.poses[(self.start + self.size - 1) % self.capacity]
+        before_index = (self.start + after - 1) % self.capacity
+        after_index = (self.start + after) % self.capacity
+        return interpolatePose(
+            self.poses[before_index], self.poses[after_index],
+            (time - self.times[before_index]) /
+            (self.times[after_index] - self.times[before_index]))
+
+    def between(self, from_time: float, to_time: float) -> Transform:
+        """Movement from the pose at 'from_time' to the pose at 'to_time'
+        in the coordinates of the first one, or None if either is outside
+        the history"""
+        from_pose = self.at(from_time)
+        to_pose = self.at(to_time)
+        if from_pose is None or to_pose is None:
+            return None
+        return from_pose.inverse().after(to_pose)
+
+def interpolatePose(a: Transform, b: Transform, fraction: float) -> Transform:
+    """Linear interpolation from pose a to pose b, heading along the shorter arc"""
+    return Transform(
+        heading = a.heading + normalizeAngle(b.heading - a.heading) * fraction,
+        offset = Vec2(
+            x = a.offset.x + (b.offset.x - a.offset.x) * fraction,
+            y = a.offset.y + (b.offset.y - a.offset.y) * fraction))
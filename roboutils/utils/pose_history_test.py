@@ -0,0 +1,53 @@
+import math
+import pytest
+
+from roboutils.utils import PoseHistory, Transform, Vec2
+
+
+def test_interpolates_between_samples():
+    history = PoseHistory(capacity = 4)
+    history.append(1.0, Transform(0.0, Vec2(0.0, 0.0)))
+    history.append(2.0, Transform(1.0, Vec2(2.0, 4.0)))
+    pose = history.at(1.25)
+    assert pose.heading == pytest.approx(0.25)
+    assert pose.x == pytest.approx(0.5)
+    assert pose.y == pytest.approx(1.0)
+    assert history.at(2.0) == Transform(1.0, Vec2(2.0, 4.0))
+
+def test_outside_history_is_none():
+    history = PoseHistory(capacity = 4)
+    assert history.at(1.0) is None
+    history.append(1.0, Transform.identity())
+    assert history.at(0.5) is None
+    assert history.at(1.5) is None
+
+def test_oldest_samples_are_overwritten():
+    history = PoseHistory(capacity = 3)
+    for i in range(10):
+        history.append(float(i), Transform.translation(Vec2(float(i), 0.0)))
+    assert len(history) == 3
+    assert history.oldest_time == 7.0
+    assert history.newest_time == 9.0
+    assert history.at(6.5) is None
+    assert history.at(8.5).x == pytest.approx(8.5)
+
+def test_heading_interpolates_along_shorter_arc():
+    history = PoseHistory()
+    history.append(0.0, Transform.rotation(math.pi - 0.1))
+    history.append(1.0, Transform.rotation(-math.pi + 0.1))
+    assert history.at(0.5).heading == pytest.approx(math.pi)
+
+def test_between_gives_relative_movement():
+    history = PoseHistory()
+    history.append(0.0, Transform(math.pi / 2, Vec2(1.0, 1.0)))
+    history.append(1.0, Transform(math.pi / 2, Vec2(1.0, 3.0)))
+    movement = history.between(0.0, 1.0)
+    assert movement.heading == pytest.approx(0.0)
+    assert movement.x == pytest.approx(2.0)
+    assert movement.y == pytest.approx(0.0)
+
+def test_decreasing_time_is_rejected():
+    history = PoseHistory()
+    history.append(1.0, Transform.identity())
+    with pytest.raises(ValueError):
+        history.append(0.5, Transform.identity())
@@ -0,0 +1,103 @@
+from array import array
+
+class TimeSeries:
+    """Fixed capacity ring buffer of timestamped values of one signal.
+The oldest sample is overwritten when the buffer is full, so memory stays
+constant however long the signal is recorded. Timestamps must not decrease.
+decimate() reduces a time window to at most two points per bucket, e.g. per
+pixel of a plot, keeping the extremes so spikes remain visible."""
+    __slots__ = ("capacity", "times", "values", "start", "size")
+    def __init__(self, capacity = 4096):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.clear()
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, time: float, value: float) -> None:
+        if self.size > 0:
+            last = (self.start + self.size - 1) % self.capacity
+            if time < self.times[last]:
+                raise ValueError("Time series timestamps must not decrease")
+        if self.size < self.capacity:
+            index = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.times[index] = time
+        self.values[index] = value
+
+    @property
+    def oldest_time(self) -> float:
+        return self.times[self.start]
+
+    @property
+    def newest_time(self) -> float:
+        return self.times[(self.start + self.size - 1) % self.capacity]
+
+    def _lower_bound(self, time: float) -> int:
+        """Number of samples with timestamp < time"""
+        low = 0
+        high = self.size
+        times = self.times
+        start = self.start
+        capacity = self.capacity
+        while low < high:
+            middle = (low + high) // 2
+            if times[(start + middle) % capacity] < time:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def window(self, from_time: float, to_time: float):
+        """The samples from 'from_time' to 'to_time' as (time, value) pairs"""
+        times = self.times
+        values = self.values
+        start = self.start
+        capacity = self.capacity
+        for i in range(self._lower_bound(from_time), self.size):
+            index = (start + i) % capacity
+            if times[index] > to_time:
+                break
+            yield times[index], values[index]
+
+    def decimate(self, from_time: float, to_time: float, buckets: int):
+        """The samples from 'from_time' to 'to_time' reduced to the minimum
+        and the maximum of each of 'buckets' equal time slices, in time order"""
+        points = []
+        if buckets <= 0 or to_time <= from_time:
+            return points
+        scale = buckets / (to_time - from_time)
+        bucket = None
+        for time, value in self.window(from_time, to_time):
+            current = min(int((time - from_time) * scale), buckets - 1)
+            if current != bucket:
+                if bucket is not None:
+                    _flush(points, low, high)
+                bucket = current
+                low = high = (time, value)
+            elif value < low[1]:
+                low = (time, value)
+            elif value > high[1]:
+                high = (time, value)
+        if bucket is not None:
+            _flush(points, low, high)
+        return points
+
+def _flush(points, low, high):
+    if low is high:
+        points.append(low)
+    elif low[0] <= high[0]:
+        points.append(low)
+        points.append(high)
+    else:
+        points.append(high)
+        points.append(low)
@@ -0,0 +1,36 @@
+import pytest
+
+from roboutils.utils import TimeSeries
+
+
+def test_oldest_samples_are_overwritten():
+    series = TimeSeries(capacity = 3)
+    for i in range(10):
+        series.append(float(i), float(i * i))
+    assert len(series) == 3
+    assert series.oldest_time == 7.0
+    assert series.newest_time == 9.0
+    assert list(series.window(0.0, 100.0)) == [(7.0, 49.0), (8.0, 64.0), (9.0, 81.0)]
+
+def test_window_is_inclusive():
+    series = TimeSeries(capacity = 8)
+    for i in range(6):
+        series.append(float(i), 0.0)
+    assert [time for time, _ in series.window(1.0, 3.0)] == [1.0, 2.0, 3.0]
+
+def test_decimate_keeps_extremes_of_each_bucket():
+    series = TimeSeries(capacity = 1000)
+    for i in range(100):
+        value = 5.0 if i == 42 else -5.0 if i == 77 else float(i % 2)
+        series.append(i * 0.01, value)
+    points = series.decimate(0.0, 1.0, 10)
+    assert len(points) <= 20
+    assert (0.42, 5.0) in points
+    assert (0.77, -5.0) in points
+    assert [time for time, _ in points] == sorted(time for time, _ in points)
+
+def test_decreasing_time_is_rejected():
+    series = TimeSeries()
+    series.append(1.0, 0.0)
+    with pytest.raises(ValueError):
+        series.append(0.5, 0.0)
@@ -1,119 +1,147 @@
 import sys
+import threading
+import time
+from collections import deque, namedtuple
 
 from PyQt5 import QtCore
 from PyQt5.QtCore import QObject, QUrl, pyqtSignal, pyqtSlot, pyqtProperty, QTimer, QPointF
 from PyQt5.QtQml import QQmlApplicationEngine, QQmlListProperty
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtChart import QAbstractSeries
 
-from roboutils.utils import Transform, Vec2
+from roboutils.utils import Transform, Vec2, TimeSeries
 import roboutils.utils.kinematics as kine
 from roboutils import hal
 from roboutils.hal import simulation
-from roboutils.hal.differential_drive import ComputeWheelCommands, ComputeOdometry
+from roboutils.hal.differential_drive import DrivePipeline
 from roboutils import remote
 from roboutils import behavior
+from roboutils import tracing
 
 from roboutils.worldsimulator import World, Line
 
+RobotSnapshot = namedtuple("RobotSnapshot", ("x", "y", "heading",
+    "left_wheel_vel", "right_wheel_vel", "left_bumper", "right_bumper", "line_sensor"))
 
 class GuiRobot(QObject):
-    _xChanged = pyqtSignal()
-    _yChanged = pyqtSignal()
-    _headingChanged = pyqtSignal()
-    _leftVelChanged = pyqtSignal()
-    _rightVelChanged = pyqtSignal()
-    _left_bumper_changed = pyqtSignal()
-    _right_bumper_changed = pyqtSignal()
-    _line_sensor_changed = pyqtSignal()
+    """View of the simulated robot for QML.
+
+The simulation runs on a thread of its own and publishes an immutable
+snapshot of the robot after every update. sample() is called from a GUI
+timer and, when there is a new snapshot, takes it and notifies QML once for
+all the properties. Inputs from QML are queued and applied by ApplyInputs
+on the simulation thread."""
+    changed = pyqtSignal()
     def __init__(self, robot_state, parent=None):
         super().__init__(parent)
-        self._x = 0
-        self._y = 0
-        self._heading = 0
-        self._left_wheel_vel = 0
-        self._right_wheel_vel = 0
-        self._left_bumper = False
-        self._right_bumper = False
         self.robot_state = robot_state
-    @pyqtProperty('QVariant', notify=_xChanged)
+        self.snapshot = None
+        self._snapshot = RobotSnapshot(0, 0, 0, 0, 0, False, False, False)
+        self.inputs = deque()
+
+    def publish(self):
+        """Called on the simulation thread"""
+        state = self.robot_state
+        pose = state.true_pose
+        self.snapshot = RobotSnapshot(pose.x, pose.y, pose.heading,
+            state.left_wheel.angular_vel, state.right_wheel.angular_vel,
+            state.left_bumper_hit, state.right_bumper_hit, state.line_sensor)
+
+    def sample(self):
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot is not self._snapshot:
+            self._snapshot = snapshot
+            self.changed.emit()
+
+    @pyqtProperty('QVariant', notify=changed)
     def x(self):
-        return self._x
+        return self._snapshot.x
 
-    @x.setter
-    def x(self, value):
-        self._x = value
-        self._xChanged.emit()
-
-    @pyqtProperty('QVariant', notify=_yChanged)
+    @pyqtProperty('QVariant', notify=changed)
     def y(self):
-        return self._y
-
-    @y.setter
-    def y(self, value):
-        self._y = value
-        self._yChanged.emit()
+        return self._snapshot.y
 
-    @pyqtProperty('QVariant', notify=_headingChanged)
+    @pyqtProperty('QVariant', notify=changed)
     def heading(self):
-        return self._heading
+        return self._snapshot.heading
 
-    @heading.setter
-    def heading(self, value):
-        self._heading = value
-        self._headingChanged.emit()
-
-    @pyqtProperty('QVariant', notify=_leftVelChanged)
+    @pyqtProperty('QVariant', notify=changed)
     def leftWheelVel(self):
-        return self._left_wheel_vel
+        return self._snapshot.left_wheel_vel
 
-    @pyqtProperty('QVariant', notify=_rightVelChanged)
+    @pyqtProperty('QVariant', notify=changed)
     def rightWheelVel(self):
-        return self._right_wheel_vel
+        return self._snapshot.right_wheel_vel
 
-    @pyqtProperty('QVariant', notify=_left_bumper_changed)
+    @pyqtProperty('QVariant', notify=changed)
     def left_bumper(self):
-        return self.robot_state.left_bumper_hit
+        return self._snapshot.left_bumper
 
     @left_bumper.setter
     def left_bumper(self, value):
-        self.robot_state.left_bumper_hit = value
-        self._left_bumper_changed.emit()
+        self.inputs.append(("left_bumper_hit", value))
 
-    @pyqtProperty('QVariant', notify=_right_bumper_changed)
+    @pyqtProperty('QVariant', notify=changed)
     def right_bumper(self):
-        return self.robot_state.right_bumper_hit
+        return self._snapshot.right_bumper
 
     @right_bumper.setter
     def right_bumper(self, value):
-        self.robot_state.right_bumper_hit = value
-        self._right_bumper_changed.emit()
+        self.inputs.append(("right_bumper_hit", value))
 
-    @pyqtProperty('QVariant', notify=_line_sensor_changed)
+    @pyqtProperty('QVariant', notify=changed)
     def line_sensor(self):
-        return self.robot_state.line_sensor
+        return self._snapshot.line_sensor
 
     @line_sensor.setter
     def line_sensor(self, value):
-        self.robot_state.line_sensor = value
-        self._line_sensor_changed.emit()
+        self.inputs.append(("line_sensor", value))
 
     @property
     def pose(self):
         return Transform(self.heading, Vec2(self.x, self.y))
-    
-    @pose.setter
-    def pose(self, pose):
-        self.x = pose.x
-        self.y = pose.y
-        self.heading = pose.heading
-        self._headingChanged.emit()
-    
-
-    def setWheelCommand(self, command):
-        self._left_wheel_vel = command.left_angular_vel
-        self._right_wheel_vel = command.right_angular_vel
-        self._leftVelChanged.emit()
-        self._rightVelChanged.emit()
+
+class GuiSignals(QObject):
+    """Recent history of selected fields of the robot for SignalPlot.
+
+Each field is kept in a fixed capacity TimeSeries, so memory stays flat
+however long the session runs. fill() hands a plot only the decimated
+points of its time window, at most two per pixel of its width."""
+    def __init__(self, robot_state, fields, capacity = 1 << 14, parent=None):
+        super().__init__(parent)
+        self.robot_state = robot_state
+        self.series = {name: TimeSeries(capacity) for name in fields}
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+
+    def record(self):
+        """Called on the simulation thread"""
+        now = time.time() - self.start_time
+        with self.lock:
+            for name, series in self.series.items():
+                series.append(now, float(self.robot_state.get(name, 0.0) or 0.0))
+
+    @pyqtSlot(QAbstractSeries, str, float, int, result='QVariantList')
+    def fill(self, chart_series, name, time_window, pixels):
+        """Replace the points of the chart series with the last 'time_window'
+        seconds of the field, returns [min time, max time, min value, max value], the value range
+        is 0 to 1 when there are no samples in the window"""
+        series = self.series.get(name)
+        points = []
+        from_time = 0.0
+        to_time = max(time_window, 0.0)
+        if series is not None:
+            with self.lock:
+                if len(series) > 0:
+                    to_time = series.newest_time
+                    from_time = to_time - time_window
+                    points = series.decimate(from_time, to_time, max(pixels, 1))
+        if not points:
+            chart_series.clear()
+            return [from_time, to_time, 0.0, 1.0]
+        chart_series.replace([QPointF(t, v) for t, v in points])
+        values = [v for _, v in points]
+        return [from_time, to_time, min(values), max(values)]
 
 class GuiLineSegment(QObject):
     def __init__(self, beg, end, width, parent=None):
@@ -144,7 +172,8 @@ class GuiWorld(QObject):
         return QQmlListProperty(GuiLineSegment, self, self._lines)
 
 app = QApplication(sys.argv)
-sock = remote.RemoteControlSocket(port = 8000)
+sock = remote.RemoteControlSocket(port = 8000,
+    schemas = (remote.SENSOR_SCHEMA, remote.COMMAND_SCHEMA))
 
 kinematics = kine.KinematicModel(axel_width = 0.2, left_wheel_r = 0.03, right_wheel_r = 0.03)
 robot_state = hal.RobotInterface(kinematics)
@@ -152,38 +181,67 @@ robot = GuiRobot(robot_state)
 
 world = World([Line([Vec2(-0.7, 0), Vec2(0,0), Vec2(0.0, 0.7), Vec2(0.7, 0.7), Vec2(0.6, -0.7), Vec2(-0.8, -0.9)], 0.10)])
 gui_world = GuiWorld(world)
+signals = GuiSignals(robot_state, ("velocity_command", "turn_command"))
 
 @behavior.task
-def UpdateGui(state):
-    robot.pose = state.pose
-    robot._line_sensor_changed.emit()
+def ApplyInputs(state, gui):
+    while gui.inputs:
+        name, value = gui.inputs.popleft()
+        setattr(state, name, value)
+    return False #Never complete
+
+@behavior.task
+def PublishSnapshot(gui):
+    gui.publish()
+    return False #Never complete
+
+@behavior.task
+def RecordSignals(signals):
+    signals.record()
+    return False #Never complete
 
 @behavior.task
 def SimulateLineSensor(state, world:World):
-    state.line_sensor = world.isOnLine(robot.pose.applyTo(Vec2(0.05, 0)))
+    line_sensor = world.isOnLine(state.true_pose.applyTo(Vec2(0.05, 0)))
+    if line_sensor != state.line_sensor:
+        tracing.begin(state, "sensed")
+    state.line_sensor = line_sensor
+
+latency = tracing.LatencyCollector()
 
 simulation_tree = behavior.ParallelAll(
     remote.UDPReceive(robot_state, sock),
-    ComputeWheelCommands(robot_state),
-    simulation.SimulateMotor(robot_state.left_wheel),
-    simulation.SimulateMotor(robot_state.right_wheel),
+    ApplyInputs(robot_state, robot),
+    DrivePipeline(robot_state,
+        simulation.SimulateDrive(robot_state, step = 0.005, substeps = 6)),
+    tracing.CollectTraces(robot_state, latency, "actuate"),
     SimulateLineSensor(robot_state, world),
-    ComputeOdometry(robot_state),
-    UpdateGui(robot_state),
-    remote.SendSensors(robot_state, sock)) 
+    remote.SendSensors(robot_state, sock),
+    RecordSignals(signals),
+    PublishSnapshot(robot))
 
 engine = QQmlApplicationEngine()
 engine.rootContext().setContextProperty("robot", robot)
 engine.rootContext().setContextProperty("world", gui_world)
+engine.rootContext().setContextProperty("signalHistory", signals)
 engine.load('qml/SimulatorWindow.qml')
 
 win = engine.rootObjects()[0]
 win.show()
 
+# The simulation keeps its own rate, one update per 30 ms of simulated
+# time, however busy the window is
+stop = threading.Event()
+simulation_thread = threading.Thread(target = behavior.run_periodic,
+    args = (simulation_tree, 0.03, stop), daemon = True)
+simulation_thread.start()
+
 timer = QTimer()
-timer.timeout.connect(lambda: simulation_tree.update())
+timer.timeout.connect(robot.sample)
 timer.setSingleShot(False)
-simulation_tree.start()
-timer.start(30)
+timer.start(16)
 
 app.exec_()
+stop.set()
+simulation_thread.join()
+print(latency.report())
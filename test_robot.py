@@ -1,13 +1,16 @@
 from roboutils.behavior.robot import FeelTheWayWithBumpers, PavelFollowLine, ValheFollowLine
-from roboutils.remote import RemoteControlSocket, SendCommand, UDPReceive
-from roboutils import hal
+from roboutils.remote import RemoteControlSocket, SendCommand, SendAcks, UDPReceive, SENSOR_SCHEMA, COMMAND_SCHEMA
+from roboutils.reliable import ReliableChannel
+from roboutils import hal, tracing
 from roboutils.utils import kinematics as kine
 from roboutils.behavior import task, guard, run, Selector, ParallelAll
 from roboutils.behavior.decorator import Repeat
 from roboutils.behavior.time import RateLimit
 
-simulator_sock = RemoteControlSocket(port = 8001, remote_address = ('localhost', 8000))
+simulator_sock = RemoteControlSocket(port = 8001, remote_address = ('localhost', 8000),
+    schemas = (SENSOR_SCHEMA, COMMAND_SCHEMA))
 control_sock = RemoteControlSocket(port = 8002)
+control_sock.reliable = ReliableChannel()
 
 remote_command = {
     "velocity_command": 0,
@@ -54,7 +57,9 @@ tree = \
     ParallelAll(
         UDPReceive(robot_state, simulator_sock),
         UDPReceive(remote_command, control_sock),
+        SendAcks(control_sock),
         robot_behavior,
+        tracing.StampTrace(robot_state, "decision"),
         RateLimit(0.03, SendCommand(robot_state, simulator_sock)))
 
 run(tree)